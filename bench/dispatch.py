@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+""" Measures the per-node dispatch overhead of the tree walkers.
+
+For the parser (keyed by cursor kind), the transformer and the renderer
+(keyed by node class) the lookup of the handler is timed twice: the way
+it was done before, by building the method name and calling getattr, and
+with the dispatch table of the walker. The handlers are looked up but
+not called, so the numbers are the pure dispatch cost.
+
+usage: python bench/dispatch.py [nodes-per-round]
+
+libclang isn't needed, no header is parsed.
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from cwrap.backend import cw_ast
+from cwrap.backend.renderer import ASTRenderer
+from cwrap.frontends.clang import c_ast
+from cwrap.frontends.clang.ast_transforms import CAstTransformer
+from cwrap.frontends.clang.clang.cindex import CursorKind
+from cwrap.frontends.clang.clang_parser import ClangParser
+
+
+def node_classes(module, base):
+    return [cls for cls in vars(module).values()
+            if isinstance(cls, type) and issubclass(cls, base)]
+
+
+def repeat(keys, count):
+    return (keys * (count // len(keys) + 1))[:count]
+
+
+def parser_cases(count):
+    parser = ClangParser()
+    kind_ids = repeat([kind.value for kind in CursorKind.get_all_kinds()],
+                      count)
+
+    def before():
+        for kind_id in kind_ids:
+            getattr(parser, 'visit_' + CursorKind.from_id(kind_id).name,
+                    None)
+
+    def after():
+        visitors = parser.visitors
+        for kind_id in kind_ids:
+            visitors[kind_id]
+
+    return before, after
+
+
+def transformer_cases(count):
+    transformer = CAstTransformer([])
+    nodes = repeat([cls.__new__(cls)
+                    for cls in node_classes(c_ast, c_ast.C_ASTNode)], count)
+
+    def before():
+        for node in nodes:
+            getattr(transformer, 'visit_' + node.__class__.__name__,
+                    transformer.generic_visit)
+
+    def after():
+        visitors = transformer._visitors
+        for node in nodes:
+            visitors[node.__class__]
+
+    return before, after
+
+
+def renderer_cases(count):
+    renderer = ASTRenderer()
+    nodes = repeat([cls.__new__(cls)
+                    for cls in node_classes(cw_ast, cw_ast.CWAN)], count)
+
+    def before():
+        for node in nodes:
+            getattr(renderer, 'visit_' + node.__class__.__name__,
+                    renderer.unhandled_visitor)
+
+    def after():
+        visitors = renderer._visitors
+        for node in nodes:
+            visitors[node.__class__]
+
+    return before, after
+
+
+def best_time(func, rounds=5):
+    func()  # resolve the handlers of the dispatch tables
+    return min(timeit.repeat(func, number=1, repeat=rounds))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('%-12s %12s %12s %8s' % ('walker', 'getattr', 'table', 'speedup'))
+    for name, cases in [('parser', parser_cases),
+                        ('transformer', transformer_cases),
+                        ('renderer', renderer_cases)]:
+        before, after = cases(count)
+        t_before = best_time(before) / count * 1e9
+        t_after = best_time(after) / count * 1e9
+        print('%-12s %9.1f ns %9.1f ns %7.1fx' % (name, t_before, t_after,
+                                                  t_before / t_after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+""" Measures the memory used by the c_ast and cw_ast trees of a large
+synthetic header, generated by synthetic.py with flat structs.
+
+The header is parsed with the clang frontend and transformed into a
+cw_ast, both trees are kept alive like they are while a batch of headers
+is processed. The peak RSS of the process, the RSS after the translation
+unit has been disposed and the number of nodes are printed. Run it on
+two revisions to compare them:
+
+    python bench/memory.py [declarations]
+
+With --traced the Python heap held by the trees is measured with
+tracemalloc as well (which increases the RSS itself).
+
+"""
+import gc
+import os
+import resource
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+from cwrap.backend import cw_ast
+from cwrap.frontends.clang import ast_transforms, c_ast, clang_parser
+
+from synthetic import HeaderShape, synthetic_header
+
+
+def header_shape(declarations):
+    """ Returns the HeaderShape of `declarations` flat structs, each with
+    a typedef and a function, and an enum for every tenth struct.
+
+    """
+    return HeaderShape(structs=declarations, depth=0, unions=0, fnptrs=0,
+                       enum_values=3, chain_every=0)
+
+
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() // 1024
+
+
+def count_nodes():
+    counts = {'c_ast': 0, 'cw_ast': 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, c_ast.C_ASTNode):
+            counts['c_ast'] += 1
+        elif isinstance(obj, cw_ast.CWAN):
+            counts['cw_ast'] += 1
+    return counts
+
+
+def build_trees(path):
+    items = clang_parser.parse(path, [], '')
+    trans_items = ast_transforms.apply_c_ast_transformations(items)
+    container = ast_transforms.CAstContainer(trans_items, 'synthetic.h',
+                                             'synthetic', 'synthetic')
+    modules = list(ast_transforms.CAstTransformer([container]).transform())
+    return items, modules
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--traced']
+    traced = '--traced' in sys.argv[1:]
+    declarations = int(args[0]) if args else 20000
+
+    fd, path = tempfile.mkstemp(suffix='.h')
+    with os.fdopen(fd, 'w') as f:
+        f.write(synthetic_header(header_shape(declarations)))
+    try:
+        if traced:
+            import tracemalloc
+            tracemalloc.start()
+        trees = build_trees(path)
+        gc.collect()
+        if traced:
+            heap = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+    finally:
+        os.remove(path)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    counts = count_nodes()
+    print('declarations    %10d' % declarations)
+    print('c_ast nodes     %10d' % counts['c_ast'])
+    print('cw_ast nodes    %10d' % counts['cw_ast'])
+    print('peak RSS        %10d KB' % peak)
+    print('RSS with trees  %10d KB' % rss_kb())
+    if traced:
+        print('traced heap     %10d KB' % (heap // 1024))
+    del trees
+
+
+if __name__ == '__main__':
+    main()
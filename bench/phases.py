@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+""" Times every phase of the pipeline on synthetic headers of growing
+size and prints the results as json.
+
+The headers are generated by synthetic.py. For every number of structs a
+header is generated and processed in a fresh process, so the peak RSS is
+that of the header alone. The phases are timed separately, every one
+`--repeat` times, and the best wall and cpu time is reported:
+
+    libclang_parse      Index.parse of the header
+    cursor_table        extraction of the cursors (CursorTable)
+    parse_element       the walk of ClangParser.parse_element
+    c_ast_transforms    apply_c_ast_transformations
+    cw_ast_transform    CAstTransformer.transform
+    render              ASTRenderer.render
+
+usage: python bench/phases.py [--structs 100,1000,5000] [--depth 1]
+                              [--repeat 3] [-o results.json] ...
+
+Run it on two revisions and compare the json files to track the scaling
+of time and memory with the size of the header. The shape options are
+those of synthetic.HeaderShape.
+
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+from cwrap.backend import cw_ast
+from cwrap.backend.renderer import ASTRenderer
+from cwrap.frontends.clang import ast_transforms, c_ast, clang_parser
+from cwrap.frontends.clang.cursor_table import CursorTable
+
+from synthetic import HeaderShape, synthetic_header
+
+
+# Bump when the phases or the fields of the results change
+RESULTS_VERSION = 1
+
+PHASES = ['libclang_parse', 'cursor_table', 'parse_element',
+          'c_ast_transforms', 'cw_ast_transform', 'render']
+
+
+class PhaseTimer(object):
+    """ Keeps the best wall and cpu time of every phase.
+
+    """
+    def __init__(self):
+        self.times = {}
+
+    def run(self, phase, func, *args):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = func(*args)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        best = self.times.get(phase)
+        if best is None or wall < best['wall']:
+            self.times[phase] = {'wall': wall, 'cpu': cpu}
+        return result
+
+
+def count_nodes():
+    counts = {'c_ast_nodes': 0, 'cw_ast_nodes': 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, c_ast.C_ASTNode):
+            counts['c_ast_nodes'] += 1
+        elif isinstance(obj, cw_ast.CWAN):
+            counts['cw_ast_nodes'] += 1
+    return counts
+
+
+def process(path, timer):
+    """ Runs all phases on the header at `path` once. Returns the trees
+    and the counts of the run.
+
+    """
+    index = clang_parser.get_index()
+    tu = timer.run('libclang_parse', index.parse, path,
+                   clang_parser.clang_args([], ''), None,
+                   clang_parser.PARSE_OPTIONS)
+
+    # ClangParser.parse_tu, with the extraction and the walk timed
+    # separately
+    parser = clang_parser.ClangParser()
+    parser.diagnostics.add_tu(tu)
+    parent_kinds = set(kind.value for kind in parser.parent_kinds)
+    skipped_kinds = set(kind.value for kind in parser.skipped_kinds)
+    parser.table = timer.run('cursor_table', CursorTable, tu, parser.scope,
+                             parent_kinds, skipped_kinds, None)
+    timer.run('parse_element', parser.parse_element,
+              parser.table.cursors[0])
+    items = parser.get_result()
+
+    trans_items = timer.run('c_ast_transforms',
+                            ast_transforms.apply_c_ast_transformations,
+                            items)
+    container = ast_transforms.CAstContainer(trans_items, 'synthetic.h',
+                                             'synthetic', 'synthetic')
+    transformer = ast_transforms.CAstTransformer([container])
+    modules = timer.run('cw_ast_transform', list, transformer.transform())
+    code = timer.run('render', ASTRenderer().render, modules[0].module)
+
+    counts = {'cursors': len(parser.table.cursors),
+              'declarations': len(trans_items), 'bytes': len(code)}
+    return (tu, items, modules), counts
+
+
+def run_point(shape, repeat):
+    """ Measures the header of the HeaderShape `shape` in this process.
+    Returns the result dict.
+
+    """
+    source = synthetic_header(shape)
+    fd, path = tempfile.mkstemp(suffix='.h')
+    with os.fdopen(fd, 'w') as f:
+        f.write(source)
+    timer = PhaseTimer()
+    try:
+        for i in range(repeat):
+            # the trees of the previous run are freed first
+            trees = None
+            gc.collect()
+            trees, counts = process(path, timer)
+    finally:
+        os.remove(path)
+
+    counts.update(count_nodes())
+    counts['header_bytes'] = len(source)
+    return {'shape': shape.to_dict(), 'counts': counts,
+            'phases': dict((phase, timer.times[phase]) for phase in PHASES),
+            'total': {'wall': sum(t['wall'] for t in timer.times.values()),
+                      'cpu': sum(t['cpu'] for t in timer.times.values())},
+            'peak_rss_kb':
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def parse_args(argv):
+    defaults = HeaderShape()
+    parser = argparse.ArgumentParser(
+        description='Times the phases of cwrap on synthetic headers.')
+    parser.add_argument('--structs', default='100,1000,5000',
+                        help='comma separated numbers of structs, one '
+                        'header each')
+    for name in ['fields', 'depth', 'unions', 'fnptrs', 'enums',
+                 'enum_values', 'typedef_chain', 'chain_every']:
+        parser.add_argument('--' + name.replace('_', '-'), type=int,
+                            default=getattr(defaults, name))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', help='json file, default stdout')
+    # internal: measure a single shape given as json in this process
+    parser.add_argument('--point', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.point:
+        shape = HeaderShape(**json.loads(args.point))
+        json.dump(run_point(shape, args.repeat), sys.stdout)
+        return
+
+    results = []
+    for structs in args.structs.split(','):
+        shape = HeaderShape(
+            int(structs), args.fields, args.depth, args.unions, args.fnptrs,
+            args.enums, args.enum_values, args.typedef_chain,
+            args.chain_every)
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__),
+             '--repeat', str(args.repeat),
+             '--point', json.dumps(shape.to_dict())])
+        result = json.loads(output.decode('utf-8'))
+        results.append(result)
+        sys.stderr.write('%6s structs: %8.3f s, %8d KB peak RSS\n' % (
+            structs, result['total']['wall'], result['peak_rss_kb']))
+
+    report = {'version': RESULTS_VERSION, 'time': time.time(),
+              'python': platform.python_version(),
+              'platform': platform.platform(), 'repeat': args.repeat,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
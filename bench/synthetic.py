@@ -0,0 +1,104 @@
+""" Generates synthetic headers for the benchmarks.
+
+The declarations are modeled on the shapes of the headers in test/data:
+structs with scalar, array and self referencing fields, nested structs,
+unions in and with structs, function pointer fields, anonymous typedefs,
+enums, typedef chains and functions taking and returning them.
+
+    from synthetic import HeaderShape, synthetic_header
+    source = synthetic_header(HeaderShape(structs=1000, depth=2))
+
+"""
+
+
+FIELD_TYPES = ['int', 'unsigned int', 'long', 'double', 'const char *',
+               'void *', 'short', 'unsigned char']
+
+
+class HeaderShape(object):
+    """ The parameters of a synthetic header:
+
+    structs         number of toplevel structs, each with a typedef and a
+                    function
+    fields          scalar fields of every struct
+    depth           levels of structs nested into every struct
+    unions          every n-th struct gets a union of two structs, 0 for
+                    none
+    fnptrs          function pointer fields of every struct
+    enums           every n-th struct gets an enum, 0 for none
+    enum_values     values of every enum
+    typedef_chain   length of the chain of typedefs of every n-th struct
+    chain_every     the n of typedef_chain, 0 for no chains
+
+    """
+    def __init__(self, structs=100, fields=8, depth=1, unions=5, fnptrs=1,
+                 enums=10, enum_values=8, typedef_chain=3, chain_every=10):
+        self.structs = structs
+        self.fields = fields
+        self.depth = depth
+        self.unions = unions
+        self.fnptrs = fnptrs
+        self.enums = enums
+        self.enum_values = enum_values
+        self.typedef_chain = typedef_chain
+        self.chain_every = chain_every
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _fields(lines, prefix, count, indent):
+    for j in range(count):
+        typ = FIELD_TYPES[j % len(FIELD_TYPES)]
+        lines.append('%s%s %s%d;' % (indent, typ, prefix, j))
+
+
+def _nested(lines, name, shape, level, indent):
+    """ Appends the fields of the struct `name` and the structs nested
+    into it down to `shape.depth`.
+
+    """
+    _fields(lines, 'field', shape.fields, indent)
+    lines.append('%schar label[16];' % indent)
+    if level < shape.depth:
+        lines.append('%sstruct %s_n%d {' % (indent, name, level))
+        _nested(lines, name, shape, level + 1, indent + '    ')
+        lines.append('%s} nested%d;' % (indent, level))
+
+
+def synthetic_header(shape):
+    """ Returns the source of a header with the HeaderShape `shape`.
+
+    """
+    lines = []
+    for i in range(shape.structs):
+        name = 's%d' % i
+        lines.append('struct %s {' % name)
+        _nested(lines, name, shape, 0, '    ')
+        for j in range(shape.fnptrs):
+            lines.append('    int (*callback%d)(struct %s *self, float x, '
+                         'int y);' % (j, name))
+        if shape.unions and i % shape.unions == 0:
+            lines.append('    union {')
+            lines.append('        struct { void *cookie; int error; } v0;')
+            lines.append('        struct { float bar; double baz; } v1;')
+            lines.append('    } value;')
+        lines.append('    struct %s *next;' % name)
+        lines.append('};')
+        lines.append('typedef struct %s %s_t;' % (name, name))
+
+        if shape.enums and i % shape.enums == 0:
+            values = ', '.join('E%d_%d' % (i, j)
+                               for j in range(shape.enum_values))
+            lines.append('enum e%d { %s };' % (i, values))
+            lines.append('typedef struct { enum e%d kind; float weight; } '
+                         'a%d_t;' % (i, i))
+
+        typ = '%s_t' % name
+        if shape.chain_every and i % shape.chain_every == 0:
+            for j in range(shape.typedef_chain):
+                lines.append('typedef %s %s_c%d;' % (typ, name, j))
+                typ = '%s_c%d' % (name, j)
+        lines.append('int %s_call(%s *self, int count, const char *name, '
+                     'double value);' % (name, typ))
+    return '\n'.join(lines) + '\n'
@@ -1,13 +1,98 @@
 # This largely mimics the AST of Python 2.7 with additional nodes 
 # to support Cython specific constructs. 
 
+import contextvars
+
 
 #------------------------------------------------------------------------------
 # AST validation
 #------------------------------------------------------------------------------
+# The node constructors check their arguments only while `_validate` is
+# on in the current context, see set_validation() and validating().
+# validate() checks a complete tree.
+_validate = contextvars.ContextVar('validate', default=True)
+
+
+def set_validation(enabled):
+    """ Turns the structural checks of the node constructors on or off in
+    the current context. Returns the previous setting, so it can be
+    restored.
+
+    """
+    previous = _validate.get()
+    _validate.set(bool(enabled))
+    return previous
+
+
+def validating(enabled, func, *args):
+    """ Yields the items of the iterable returned by func(*args). The
+    iterable is created and iterated with the checks of the node
+    constructors turned on or off by `enabled`, in a context of its own,
+    so the setting neither leaks to the code consuming the items nor to
+    other threads and generators.
+
+    """
+    context = contextvars.copy_context()
+    context.run(set_validation, enabled)
+    iterator = context.run(lambda: iter(func(*args)))
+    while True:
+        try:
+            item = context.run(next, iterator)
+        except StopIteration:
+            return
+        yield item
+
+
+def validate(node):
+    """ Checks the structure of the tree at `node` like the constructors
+    do when validation is on. Raises an AssertionError for the first
+    invalid node.
+
+    """
+    node._check()
+    for name in _slot_names(type(node)):
+        child = getattr(node, name, None)
+        if isinstance(child, CWAN):
+            validate(child)
+        elif isinstance(child, list):
+            for item in child:
+                if isinstance(item, CWAN):
+                    validate(item)
+
+
+def count_nodes(node):
+    """ Returns the number of nodes in the tree at `node`.
+
+    """
+    count = 1
+    for name in _slot_names(type(node)):
+        child = getattr(node, name, None)
+        if isinstance(child, CWAN):
+            count += count_nodes(child)
+        elif isinstance(child, list):
+            for item in child:
+                if isinstance(item, CWAN):
+                    count += count_nodes(item)
+    return count
+
+
+# maps node classes to the names of all their slots
+_slots = {}
+
+
+def _slot_names(cls):
+    names = _slots.get(cls)
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            names.extend(klass.__dict__.get('__slots__', ()))
+        _slots[cls] = names
+    return names
+
+
 def assert_mod(node, var_name):
     msg = '%s must be a mod node.' % var_name
-    assert isinstance(node, mode), msg
+    assert isinstance(node, mod), msg
 
 
 def assert_stmt(node, var_name):
@@ -34,7 +119,7 @@ def assert_exprs(items, var_name):
 
 def assert_arguments(args, var_name):
     msg = '%s must be an arguments node.' % var_name
-    assert isinstance(args, arguments), var_name
+    assert isinstance(args, arguments), msg
 
 
 def assert_operator(op, var_name):
@@ -91,7 +176,7 @@ def assert_comprehension(node, var_name):
     assert isinstance(node, comprehension), msg
 
 
-def assert_comprehensions(node, var_name):
+def assert_comprehensions(items, var_name):
     msg = '%s must be comprehension nodes.' % var_name
     for item in items:
         assert isinstance(item, comprehension), msg
@@ -99,7 +184,7 @@ def assert_comprehensions(node, var_name):
 
 def assert_expr_context(node, var_name):
     msg = '%s must be an expr_context node.' % var_name
-    assert isinstance(node, expr_context)
+    assert isinstance(node, expr_context), msg
 
 
 def assert_slice(node, var_name):
@@ -159,13 +244,13 @@ def assert_ctype(node, var_name):
 # Base ast node
 #------------------------------------------------------------------------------
 class CWAN(object):
-    """ The base class of all CWrap Ast Nodes. 
+    """ The base class of all CWrap Ast Nodes. The nodes have __slots__,
+    an attribute not listed in the slots of a node class can't be set.
 
     """
-    def __init__(self, *args, **kwargs):
-        self.init(*args, **kwargs)
+    __slots__ = ()
 
-    def init(self, *args, **kwargs):
+    def _check(self):
         pass
 
 
@@ -173,7 +258,7 @@ class CWAN(object):
 # Python AST nodes (closely mimic the builtin ast module nodes)
 #------------------------------------------------------------------------------
 class mod(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Module(mod):
@@ -182,13 +267,19 @@ class Module(mod):
     body : A list of stmt nodes.
 
     """
-    def init(self, body):
-        assert_stmts(body, 'body')
+    __slots__ = ('body',)
+
+    def __init__(self, body):
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_stmts(self.body, 'body')
 
 
 class stmt(CWAN):
-    pass
+    __slots__ = ()
 
 
 class FunctionDef(stmt):
@@ -200,15 +291,21 @@ class FunctionDef(stmt):
     decorator_list : A list of expr nodes.
 
     """
-    def init(self, name, args, body, decorator_list):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
-        assert_arguments(args, 'args')
-        assert_exprs(decorator_list, 'decorator_list')
+    __slots__ = ('name', 'args', 'body', 'decorator_list')
+
+    def __init__(self, name, args, body, decorator_list):
         self.name = name
         self.args = args
         self.body = body
         self.decorator_list = decorator_list
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
+        assert_arguments(self.args, 'args')
+        assert_exprs(self.decorator_list, 'decorator_list')
 
 
 class ClassDef(stmt):
@@ -220,15 +317,21 @@ class ClassDef(stmt):
     decorator_list : A list of expr nodes.
 
     """
-    def init(self, name, bases, body, decorator_list):
-        assert_str(name, 'name')
-        assert_exprs(bases, 'bases')
-        assert_stmts(body, 'body')
-        assert_exprs(decorator_list, 'decorator_list')
+    __slots__ = ('name', 'bases', 'body', 'decorator_list')
+
+    def __init__(self, name, bases, body, decorator_list):
         self.name = name
         self.bases = bases
         self.body = body
         self.decorator_list = decorator_list
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_exprs(self.bases, 'bases')
+        assert_stmts(self.body, 'body')
+        assert_exprs(self.decorator_list, 'decorator_list')
 
 
 class Return(stmt):
@@ -237,10 +340,16 @@ class Return(stmt):
     value : An expr node. Can be None.
 
     """
-    def init(self, value):
-        if value:
-            assert_expr(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.value:
+            assert_expr(self.value, 'value')
 
 
 class Delete(stmt):
@@ -249,9 +358,15 @@ class Delete(stmt):
     targets : A list of expr nodes.
 
     """
-    def init(self, targets):
-        assert_exprs(targets, 'targets')
+    __slots__ = ('targets',)
+
+    def __init__(self, targets):
         self.targets = targets
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.targets, 'targets')
 
 
 class Assign(stmt):
@@ -261,11 +376,17 @@ class Assign(stmt):
     value : an expr node
 
     """
-    def init(self, targets, value):
-        assert_exprs(targets, 'targets')
-        assert_expr(value, 'value')
+    __slots__ = ('targets', 'value')
+
+    def __init__(self, targets, value):
         self.targets = targets
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.targets, 'targets')
+        assert_expr(self.value, 'value')
 
 
 class AugAssign(stmt):
@@ -276,13 +397,19 @@ class AugAssign(stmt):
     value : an expr node
 
     """
-    def init(self, target, op, value):
-        assert_expr(target, 'target')
-        assert_operator(op, 'op')
-        assert_expr(value, 'value')
+    __slots__ = ('target', 'op', 'value')
+
+    def __init__(self, target, op, value):
         self.target = target
         self.op = op
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.target, 'target')
+        assert_operator(self.op, 'op')
+        assert_expr(self.value, 'value')
 
 
 class Print(stmt):
@@ -293,14 +420,20 @@ class Print(stmt):
     nl : a boolean
 
     """
-    def init(self, dest, values, nl):
-        if dest:
-            assert_expr(dest, 'dest')
-        assert_exprs(values, 'values')
-        assert_bool(nl, 'nl')
+    __slots__ = ('dest', 'values', 'nl')
+
+    def __init__(self, dest, values, nl):
         self.dest = dest
         self.values = values
         self.nl = nl
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.dest:
+            assert_expr(self.dest, 'dest')
+        assert_exprs(self.values, 'values')
+        assert_bool(self.nl, 'nl')
 
 
 class For(stmt):
@@ -312,15 +445,21 @@ class For(stmt):
     orelse : a list of stmt nodes.
 
     """
-    def init(self, target, iter, body, orelse):
-        assert_expr(target, 'target')
-        assert_expr(iter, 'iter')
-        assert_stmts(body, 'body')
-        assert_stmts(orelse, 'orelse')
+    __slots__ = ('target', 'iter', 'body', 'orelse')
+
+    def __init__(self, target, iter, body, orelse):
         self.target = target
         self.iter = iter
         self.body = body
         self.orelse = orelse
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.target, 'target')
+        assert_expr(self.iter, 'iter')
+        assert_stmts(self.body, 'body')
+        assert_stmts(self.orelse, 'orelse')
 
 
 class While(stmt):
@@ -331,13 +470,19 @@ class While(stmt):
     orelse : a list of stmt nodes.
 
     """
-    def init(self, test, body, orelse):
-        assert_expr(test, 'test')
-        assert_stmts(body, 'body')
-        assert_stmts(orelse, 'orelse')
+    __slots__ = ('test', 'body', 'orelse')
+
+    def __init__(self, test, body, orelse):
         self.test = test
         self.body = body
         self.orelse = orelse
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.test, 'test')
+        assert_stmts(self.body, 'body')
+        assert_stmts(self.orelse, 'orelse')
 
 
 class If(stmt):
@@ -348,13 +493,19 @@ class If(stmt):
     orelse : a list of stmt nodes.
 
     """
-    def init(self, test, body, orelse):
-        assert_expr(test, 'test')
-        assert_stmts(body, 'body')
-        assert_stmts(orelse, 'orelse')
+    __slots__ = ('test', 'body', 'orelse')
+
+    def __init__(self, test, body, orelse):
         self.test = test
         self.body = body
         self.orelse = orelse
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.test, 'test')
+        assert_stmts(self.body, 'body')
+        assert_stmts(self.orelse, 'orelse')
 
 
 class With(stmt):
@@ -365,14 +516,20 @@ class With(stmt):
     body : a list of stmt nodes.
 
     """
-    def init(self, context_expr, optional_vars, body):
-        assert_expr(context_expr, 'context_expr')
-        if optional_vars:
-            assert_expr(optional_vars, 'optional_vars')
-        assert_stmts(body, 'body')
+    __slots__ = ('context_expr', 'optional_vars', 'body')
+
+    def __init__(self, context_expr, optional_vars, body):
         self.context_expr = context_expr
         self.optional_vars = optional_vars
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.context_expr, 'context_expr')
+        if self.optional_vars:
+            assert_expr(self.optional_vars, 'optional_vars')
+        assert_stmts(self.body, 'body')
 
 
 class Raise(stmt):
@@ -383,16 +540,22 @@ class Raise(stmt):
     tback : an expr node. Can be None.
 
     """
-    def init(self, type, inst, tback):
-        if type:
-            assert_expr(type, 'type')
-        if inst:
-            assert_expr(inst, 'inst')
-        if tback:
-            assert_expr(tback, 'tback')
+    __slots__ = ('type', 'inst', 'tback')
+
+    def __init__(self, type, inst, tback):
         self.type = type
         self.inst = inst
         self.tback = tback
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.type:
+            assert_expr(self.type, 'type')
+        if self.inst:
+            assert_expr(self.inst, 'inst')
+        if self.tback:
+            assert_expr(self.tback, 'tback')
 
 
 class TryExcept(stmt):
@@ -403,13 +566,19 @@ class TryExcept(stmt):
     orelse : a list of stmt nodes.
 
     """
-    def init(self, body, handlers, orelse):
-        assert_stmts(body, 'body')
-        assert_excepthandlers(handlers, 'handlers')
-        assert_stmts(orelse, 'orelse')
+    __slots__ = ('body', 'handlers', 'orelse')
+
+    def __init__(self, body, handlers, orelse):
         self.body = body
         self.handlers = handlers
         self.orelse = orelse
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_stmts(self.body, 'body')
+        assert_excepthandlers(self.handlers, 'handlers')
+        assert_stmts(self.orelse, 'orelse')
 
 
 class TryFinally(stmt):
@@ -419,11 +588,17 @@ class TryFinally(stmt):
     finalbody : a list of stmt nodes.
 
     """
-    def init(self, body, finalbody):
-        assert_stmts(body, 'body')
-        assert_stmts(finalbody, 'finalbody')
+    __slots__ = ('body', 'finalbody')
+
+    def __init__(self, body, finalbody):
         self.body = body
         self.finalbody = finalbody
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_stmts(self.body, 'body')
+        assert_stmts(self.finalbody, 'finalbody')
 
 
 class Assert(stmt):
@@ -433,12 +608,18 @@ class Assert(stmt):
     msg : an expr node. Can be None.
 
     """
-    def init(self, test, msg):
-        assert_expr(test, 'test')
-        if msg:
-            assert_expr(msg, 'msg')
+    __slots__ = ('test', 'msg')
+
+    def __init__(self, test, msg):
         self.test = test
         self.msg = msg
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.test, 'test')
+        if self.msg:
+            assert_expr(self.msg, 'msg')
 
 
 class Import(stmt):
@@ -447,9 +628,15 @@ class Import(stmt):
     names : a list of alias nodes.
 
     """
-    def init(self, names):
-        assert_aliases(names, 'names')
+    __slots__ = ('names',)
+
+    def __init__(self, names):
         self.names = names
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_aliases(self.names, 'names')
 
 
 class ImportFrom(stmt):
@@ -460,15 +647,21 @@ class ImportFrom(stmt):
     level : an integer. Can be None.
 
     """
-    def init(self, module, names, level):
-        if module:
-            assert_str(module, 'module')
-        assert_aliases(names, 'names')
-        if level:
-            assert_int(level, 'level')
+    __slots__ = ('module', 'names', 'level')
+
+    def __init__(self, module, names, level):
         self.module = module
         self.names = names
         self.level = level
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.module:
+            assert_str(self.module, 'module')
+        assert_aliases(self.names, 'names')
+        if self.level:
+            assert_int(self.level, 'level')
 
 
 class Exec(stmt):
@@ -479,15 +672,21 @@ class Exec(stmt):
     locals : an expr node. Can be None.
 
     """
-    def init(self, body, globals, locals):
-        assert_expr(body, 'body')
-        if globals:
-            assert_expr(globals, 'globals')
-        if locals:
-            assert_expr(locals, 'locals')
+    __slots__ = ('body', 'globals', 'locals')
+
+    def __init__(self, body, globals, locals):
         self.body = body
         self.globals = globals
         self.locals = locals
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.body, 'body')
+        if self.globals:
+            assert_expr(self.globals, 'globals')
+        if self.locals:
+            assert_expr(self.locals, 'locals')
 
 
 class Global(stmt):
@@ -496,9 +695,15 @@ class Global(stmt):
     names : a list of strings.
 
     """
-    def init(self, names):
-        assert_strs(names, 'names')
+    __slots__ = ('names',)
+
+    def __init__(self, names):
         self.names = names
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_strs(self.names, 'names')
 
 
 class Expr(stmt):
@@ -507,16 +712,22 @@ class Expr(stmt):
     value : an expr node. 
     
     """
-    def init(self, value):
-        assert_expr(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.value, 'value')
 
 
 class Pass(stmt):
     """ The pass statement. Inherits stmt. Singleton.
 
     """
-    pass
+    __slots__ = ()
 Pass = Pass()
 
 
@@ -524,7 +735,7 @@ class Break(stmt):
     """ The break statement. Inherits stmt. Singleton.
 
     """
-    pass
+    __slots__ = ()
 Break = Break()
 
 
@@ -532,12 +743,12 @@ class Continue(stmt):
     """ The continue statement. Inherits stmt. Singleton.
 
     """
-    pass
+    __slots__ = ()
 Continue = Continue()
 
 
 class expr(CWAN):
-    pass
+    __slots__ = ()
 
 
 class BoolOp(expr):
@@ -547,11 +758,17 @@ class BoolOp(expr):
     values : a list of expr nodes.
 
     """
-    def init(self, op, values):
-        assert_boolop(op, 'op')
-        assert_exprs(values, 'values')
+    __slots__ = ('op', 'values')
+
+    def __init__(self, op, values):
         self.op = op
         self.values = values
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_boolop(self.op, 'op')
+        assert_exprs(self.values, 'values')
 
 
 class BinOp(expr):
@@ -562,13 +779,19 @@ class BinOp(expr):
     right : an expr node.
 
     """
-    def init(self, left, op, right):
-        assert_expr(left, 'left')
-        assert_operator(op, 'op')
-        assert_expr(right, 'right')
+    __slots__ = ('left', 'op', 'right')
+
+    def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.left, 'left')
+        assert_operator(self.op, 'op')
+        assert_expr(self.right, 'right')
 
 
 class UnaryOp(expr):
@@ -578,11 +801,17 @@ class UnaryOp(expr):
     operand : an expr node.
 
     """
-    def init(self, op, operand):
-        assert_unaryop(op, 'op')
-        assert_expr(operand, 'operand')
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op, operand):
         self.op = op
         self.operand = operand
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_unaryop(self.op, 'op')
+        assert_expr(self.operand, 'operand')
 
 
 class Lambda(expr):
@@ -592,11 +821,17 @@ class Lambda(expr):
     body : and expr node.
 
     """
-    def init(self, args, body):
-        assert_arguments(args, 'args')
-        assert_expr(body, 'body')
+    __slots__ = ('args', 'body')
+
+    def __init__(self, args, body):
         self.args = args
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_arguments(self.args, 'args')
+        assert_expr(self.body, 'body')
 
 
 class IfExp(expr):
@@ -607,13 +842,19 @@ class IfExp(expr):
     orelse : an expr node
 
     """
-    def init(self, test, body, orelse):
-        assert_expr(test, 'test')
-        assert_expr(body, 'body')
-        assert_expr(orelse, 'orelse')
+    __slots__ = ('test', 'body', 'orelse')
+
+    def __init__(self, test, body, orelse):
         self.test = test
         self.body = body
         self.orelse = orelse
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.test, 'test')
+        assert_expr(self.body, 'body')
+        assert_expr(self.orelse, 'orelse')
 
 
 class Dict(expr):
@@ -623,13 +864,19 @@ class Dict(expr):
     values : a list of expr nodes.
 
     """
-    def init(self, keys, values):
-        assert_exprs(keys, 'keys')
-        assert_exprs(values, 'values')
-        msg = 'keys and values not same lenght'
-        assert len(keys) == len(values), msg
+    __slots__ = ('keys', 'values')
+
+    def __init__(self, keys, values):
         self.keys = keys
         self.values = values
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.keys, 'keys')
+        assert_exprs(self.values, 'values')
+        msg = 'keys and values not same lenght'
+        assert len(self.keys) == len(self.values), msg
 
 
 class Set(expr):
@@ -638,10 +885,16 @@ class Set(expr):
     elts : A list of expr nodes.
 
     """
-    def init(self, elts):
-        assert_exprs(elts, 'elts')
-        assert elts, 'Set literal cannot be empty.'
+    __slots__ = ('elts',)
+
+    def __init__(self, elts):
         self.elts = elts
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.elts, 'elts')
+        assert self.elts, 'Set literal cannot be empty.'
 
 
 class ListComp(expr):
@@ -651,11 +904,17 @@ class ListComp(expr):
     generators : a list of comprehension nodes.
 
     """
-    def init(self, elt, generators):
-        assert_expr(elt, 'elt')
-        assert_comprehensions(generators, 'generators')
+    __slots__ = ('elt', 'generators')
+
+    def __init__(self, elt, generators):
         self.elt = elt
         self.generators = generators
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.elt, 'elt')
+        assert_comprehensions(self.generators, 'generators')
 
 
 class SetComp(expr):
@@ -665,11 +924,17 @@ class SetComp(expr):
     generators : a list of comprehension nodes.
 
     """
-    def init(self, elt, generators):
-        assert_expr(elt, 'elt')
-        assert_comprehensions(generators, 'generators')
+    __slots__ = ('elt', 'generators')
+
+    def __init__(self, elt, generators):
         self.elt = elt
         self.generators = generators
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.elt, 'elt')
+        assert_comprehensions(self.generators, 'generators')
 
 
 class DictComp(expr):
@@ -680,13 +945,19 @@ class DictComp(expr):
     generators : a list of comprehension nodes.
 
     """
-    def init(self, key, value, generators):
-        assert_expr(key, 'key')
-        assert_expr(value, 'value')
-        assert_comprehensions(generators, 'generators')
+    __slots__ = ('key', 'value', 'generators')
+
+    def __init__(self, key, value, generators):
         self.key = key
         self.value = value
         self.generators = generators
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.key, 'key')
+        assert_expr(self.value, 'value')
+        assert_comprehensions(self.generators, 'generators')
 
 
 class GeneratorExp(expr):
@@ -696,11 +967,17 @@ class GeneratorExp(expr):
     generators : a list of comprehension nodes.
 
     """
-    def init(self, elt, generators):
-        assert_expr(elt, 'elt')
-        assert_comprehensions(generators, 'generators')
+    __slots__ = ('elt', 'generators')
+
+    def __init__(self, elt, generators):
         self.elt = elt
         self.generators = generators
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.elt, 'elt')
+        assert_comprehensions(self.generators, 'generators')
 
 
 class Yield(expr):
@@ -709,10 +986,16 @@ class Yield(expr):
     value : an expr node. Can be None.
 
     """
-    def init(self, value):
-        if value:
-            assert_expr(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.value:
+            assert_expr(self.value, 'value')
 
 
 class Compare(expr):
@@ -723,15 +1006,21 @@ class Compare(expr):
     comparators : a list of expr node.
 
     """
-    def init(self, left, ops, comparators):
-        assert_expr(left, 'left')
-        assert_cmpops(ops, 'op')
-        assert_exprs(comparators, 'comparators')
-        msg = 'ops and comparators must have same length'
-        assert len(ops) == len(comparators), msg
+    __slots__ = ('left', 'ops', 'comparators')
+
+    def __init__(self, left, ops, comparators):
         self.left = left
         self.ops = ops
         self.comparators = comparators
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.left, 'left')
+        assert_cmpops(self.ops, 'op')
+        assert_exprs(self.comparators, 'comparators')
+        msg = 'ops and comparators must have same length'
+        assert len(self.ops) == len(self.comparators), msg
 
 
 class Call(expr):
@@ -744,19 +1033,25 @@ class Call(expr):
     kwargs : an expr node. Can be None.
 
     """
-    def init(self, func, args, keywords, starargs, kwargs):
-        assert_expr(func, 'func')
-        assert_exprs(args, 'args')
-        assert_keywords(keywords, 'keywords')
-        if starargs:
-            assert_expr(starargs, 'starargs')
-        if kwargs:
-            assert_expr(kwargs, 'kwargs')
+    __slots__ = ('func', 'args', 'keywords', 'starargs', 'kwargs')
+
+    def __init__(self, func, args, keywords, starargs, kwargs):
         self.func = func
         self.args = args
         self.keywords = keywords
         self.starargs = starargs
         self.kwargs = kwargs
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.func, 'func')
+        assert_exprs(self.args, 'args')
+        assert_keywords(self.keywords, 'keywords')
+        if self.starargs:
+            assert_expr(self.starargs, 'starargs')
+        if self.kwargs:
+            assert_expr(self.kwargs, 'kwargs')
 
 
 class Repr(expr):
@@ -765,9 +1060,15 @@ class Repr(expr):
     value : an expr node.
 
     """
-    def init(self, value):
-        assert_expr(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.value, 'value')
 
 
 class Num(expr):
@@ -776,9 +1077,15 @@ class Num(expr):
     n : A Python number.
 
     """
-    def init(self, n):
-        assert_num(n, 'n')
+    __slots__ = ('n',)
+
+    def __init__(self, n):
         self.n = n
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_num(self.n, 'n')
 
 
 class Str(expr):
@@ -787,9 +1094,15 @@ class Str(expr):
     s : A Python string.
 
     """
-    def init(self, s):
-        assert_basestring(s, 's')
+    __slots__ = ('s',)
+
+    def __init__(self, s):
         self.s = s
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_basestring(self.s, 's')
 
 
 class Attribute(expr):
@@ -800,13 +1113,19 @@ class Attribute(expr):
     ctx : an expr_context node.
 
     """
-    def init(self, value, attr, ctx):
-        assert_expr(value, 'value')
-        assert_str(attr, 'attr')
-        assert_expr_context(ctx, 'ctx')
+    __slots__ = ('value', 'attr', 'ctx')
+
+    def __init__(self, value, attr, ctx):
         self.value = value
         self.attr = attr
         self.ctx = ctx
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.value, 'value')
+        assert_str(self.attr, 'attr')
+        assert_expr_context(self.ctx, 'ctx')
 
 
 class Subscript(expr):
@@ -817,13 +1136,19 @@ class Subscript(expr):
     ctx : an expr_context node.
 
     """
-    def init(self, value, slice, ctx):
-        assert_expr(value, 'value')
-        assert_slice(slice, 'slice')
-        assert_expr_context(ctx, 'ctx')
+    __slots__ = ('value', 'slice', 'ctx')
+
+    def __init__(self, value, slice, ctx):
         self.value = value
         self.slice = slice
         self.ctx = ctx
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.value, 'value')
+        assert_slice(self.slice, 'slice')
+        assert_expr_context(self.ctx, 'ctx')
 
 
 class Name(expr):
@@ -833,11 +1158,17 @@ class Name(expr):
     ctx : an expr_context node.
 
     """
-    def init(self, id, ctx):
-        assert_str(id, 'id')
-        assert_expr_context(ctx, 'ctx')
+    __slots__ = ('id', 'ctx')
+
+    def __init__(self, id, ctx):
         self.id = id
         self.ctx = ctx
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.id, 'id')
+        assert_expr_context(self.ctx, 'ctx')
 
 
 class List(expr):
@@ -847,11 +1178,17 @@ class List(expr):
     ctx : an expr_context node.
 
     """
-    def init(self, elts, ctx):
-        assert_exprs(elts, 'elts')
-        assert_expr_context(ctx, 'ctx')
+    __slots__ = ('elts', 'ctx')
+
+    def __init__(self, elts, ctx):
         self.elts = elts
         self.ctx = ctx
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.elts, 'elts')
+        assert_expr_context(self.ctx, 'ctx')
 
 
 class Tuple(expr):
@@ -861,56 +1198,62 @@ class Tuple(expr):
     ctx : an expr_context node.
 
     """
-    def init(self, elts, ctx):
-        assert_exprs(elts, 'elts')
-        assert_expr_context(ctx, 'ctx')
+    __slots__ = ('elts', 'ctx')
+
+    def __init__(self, elts, ctx):
         self.elts = elts
         self.ctx = ctx
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.elts, 'elts')
+        assert_expr_context(self.ctx, 'ctx')
 
 
 class expr_context(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Load(expr_context):
-    pass
+    __slots__ = ()
 Load = Load()
 
 
 class Store(expr_context):
-    pass
+    __slots__ = ()
 Store = Store()
 
 
 class Del(expr_context):
-    pass
+    __slots__ = ()
 Del = Del()
 
 
 class AugLoad(expr_context):
-    pass
+    __slots__ = ()
 AugLoad = AugLoad()
 
 
 class AugStore(expr_context):
-    pass
+    __slots__ = ()
 AugStore = AugStore()
 
 
 class Param(expr_context):
-    pass
+    __slots__ = ()
 Param = Param()
 
 
 class slice(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Ellipsis(slice):
     """ The Ellipsis object. Inherits slice. Singleton.
 
     """
-    pass
+    __slots__ = ()
 Ellipsis = Ellipsis()
 
 
@@ -922,16 +1265,22 @@ class Slice(slice):
     step : an expr node. Can be None.
 
     """
-    def init(self, lower, upper, step):
-        if lower:
-            assert_expr(lower, 'lower')
-        if upper:
-            assert_expr(upper, 'upper')
-        if step:
-            assert_expr(step, 'step')
+    __slots__ = ('lower', 'upper', 'step')
+
+    def __init__(self, lower, upper, step):
         self.lower = lower
         self.upper = upper
         self.step = step
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.lower:
+            assert_expr(self.lower, 'lower')
+        if self.upper:
+            assert_expr(self.upper, 'upper')
+        if self.step:
+            assert_expr(self.step, 'step')
 
 
 class ExtSlice(slice):
@@ -940,9 +1289,15 @@ class ExtSlice(slice):
     dims : a list of slice nodes.
 
     """
-    def init(self, dims):
-        assert_slices(dims, 'dims')
+    __slots__ = ('dims',)
+
+    def __init__(self, dims):
         self.dims = dims
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_slices(self.dims, 'dims')
 
 
 class Index(slice):
@@ -951,164 +1306,170 @@ class Index(slice):
     value : an expr node.
 
     """
-    def init(self, value):
-        assert_expr(value)
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.value, 'value')
 
 
 class boolop(CWAN):
-    pass
+    __slots__ = ()
 
 
 class And(boolop):
-    pass
+    __slots__ = ()
 And = And()
 
 
 class Or(boolop):
-    pass
+    __slots__ = ()
 Or = Or()
 
 
 class operator(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Add(operator):
-    pass
+    __slots__ = ()
 Add = Add()
 
 
 class Sub(operator):
-    pass
+    __slots__ = ()
 Sub = Sub()
 
 
 class Mult(operator):
-    pass
+    __slots__ = ()
 Mult = Mult()
 
 
 class Div(operator):
-    pass
+    __slots__ = ()
 Div = Div()
 
 
 class Mod(operator):
-    pass
+    __slots__ = ()
 Mod = Mod()
 
 
 class Pow(operator):
-    pass
+    __slots__ = ()
 Pow = Pow()
 
 
 class LShift(operator):
-    pass
+    __slots__ = ()
 LShift = LShift()
 
 
 class RShift(operator):
-    pass
+    __slots__ = ()
 RShift = RShift()
 
 
 class BitOr(operator):
-    pass
+    __slots__ = ()
 BitOr = BitOr()
 
 
 class BitXor(operator):
-    pass
+    __slots__ = ()
 BitXor = BitXor()
 
 
 class BitAnd(operator):
-    pass
+    __slots__ = ()
 BitAnd = BitAnd()
 
 
 class FloorDiv(operator):
-    pass
+    __slots__ = ()
 FloorDiv = FloorDiv()
 
 
 class unaryop(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Invert(unaryop):
-    pass
+    __slots__ = ()
 Invert = Invert()
 
 
 class Not(unaryop):
-    pass
+    __slots__ = ()
 Not = Not()
 
 
 class UAdd(unaryop):
-    pass
+    __slots__ = ()
 UAdd = UAdd()
 
 
 class USub(unaryop):
-    pass
+    __slots__ = ()
 USub = USub()
 
 
 class cmpop(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Eq(cmpop):
-    pass
+    __slots__ = ()
 Eq = Eq()
 
 
 class NotEq(cmpop):
-    pass
+    __slots__ = ()
 NotEq = NotEq()
 
 
 class Lt(cmpop):
-    pass
+    __slots__ = ()
 Lt = Lt()
 
 
 class LtE(cmpop):
-    pass
+    __slots__ = ()
 LtE = LtE()
 
 
 class Gt(cmpop):
-    pass
+    __slots__ = ()
 Gt = Gt()
 
 
 class GtE(cmpop):
-    pass
+    __slots__ = ()
 GtE = GtE()
 
 
 class Is(cmpop):
-    pass
+    __slots__ = ()
 Is = Is()
 
 
 class IsNot(cmpop):
-    pass
+    __slots__ = ()
 IsNot = IsNot()
 
 
 class In(cmpop):
-    pass
+    __slots__ = ()
 In = In()
 
 
 class NotIn(cmpop):
-    pass
+    __slots__ = ()
 NotIn = NotIn()
 
 
@@ -1120,17 +1481,23 @@ class comprehension(CWAN):
     ifs : a list of expr nodes.
 
     """
-    def init(self, target, iter, ifs):
-        assert_expr(target)
-        assert_expr(iter)
-        assert_exprs(ifs)
+    __slots__ = ('target', 'iter', 'ifs')
+
+    def __init__(self, target, iter, ifs):
         self.target = target
         self.iter = iter
         self.ifs = ifs
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.target, 'target')
+        assert_expr(self.iter, 'iter')
+        assert_exprs(self.ifs, 'ifs')
 
 
 class excepthandler(CWAN):
-    pass
+    __slots__ = ()
 
 
 class ExceptHandler(excepthandler):
@@ -1141,16 +1508,22 @@ class ExceptHandler(excepthandler):
     body : a list of stmt nodes.
 
     """
-    def init(self, type, name, body):
-        if type:
-            assert_expr(type, 'type')
-        if name:
-            assert_expr(name, 'name')
-            assert type, 'Cannot have exception name and not type.'
-        assert_stmts(body, 'body')
+    __slots__ = ('type', 'name', 'body')
+
+    def __init__(self, type, name, body):
         self.type = type
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.type:
+            assert_expr(self.type, 'type')
+        if self.name:
+            assert_expr(self.name, 'name')
+            assert self.type, 'Cannot have exception name and not type.'
+        assert_stmts(self.body, 'body')
 
 
 class arguments(CWAN):
@@ -1162,17 +1535,23 @@ class arguments(CWAN):
     defaults : a list of expr nodes.
 
     """
-    def init(self, args, vararg, kwarg, defaults):
-        assert_exprs(args, 'args')
-        if vararg:
-            assert_str(vararg, 'vararg')
-        if kwarg:
-            assert_str(kwarg, 'kwarg')
-        assert_exprs(defaults, 'defaults')
+    __slots__ = ('args', 'vararg', 'kwarg', 'defaults')
+
+    def __init__(self, args, vararg, kwarg, defaults):
         self.args = args
         self.vararg = vararg
         self.kwarg = kwarg
         self.defaults = defaults
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_exprs(self.args, 'args')
+        if self.vararg:
+            assert_str(self.vararg, 'vararg')
+        if self.kwarg:
+            assert_str(self.kwarg, 'kwarg')
+        assert_exprs(self.defaults, 'defaults')
 
 
 class keyword(CWAN):
@@ -1182,11 +1561,17 @@ class keyword(CWAN):
     value : an expr node.
 
     """
-    def init(self, arg, value):
-        assert_str(arg, 'arg')
-        assert_expr(value, 'value')
+    __slots__ = ('arg', 'value')
+
+    def __init__(self, arg, value):
         self.arg = arg
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.arg, 'arg')
+        assert_expr(self.value, 'value')
 
 
 class alias(CWAN):
@@ -1196,38 +1581,44 @@ class alias(CWAN):
     asname : a string. Can be None.
 
     """
-    def init(self, name, asname):
-        assert_str(name)
-        if asname:
-            assert_str(asname)
+    __slots__ = ('name', 'asname')
+
+    def __init__(self, name, asname):
         self.name = name
         self.asname = asname
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        if self.asname:
+            assert_str(self.asname, 'asname')
 
 
 #------------------------------------------------------------------------------
 # Cython AST nodes
 #------------------------------------------------------------------------------
 class cdefmodifier(CWAN):
-    pass
+    __slots__ = ()
 
 
 class Extern(cdefmodifier):
-    pass
+    __slots__ = ()
 Extern = Extern()
 
 
 class Inline(cdefmodifier):
-    pass
+    __slots__ = ()
 Inline = Inline()
 
 
 class Public(cdefmodifier):
-    pass
+    __slots__ = ()
 Public = Public()
 
 
 class Api(cdefmodifier):
-    pass
+    __slots__ = ()
 Api = Api()
 
 
@@ -1238,11 +1629,17 @@ class CdefDecl(stmt):
     value : A stmt node.
 
     """
-    def init(self, modifiers, value):
-        assert_cdefmodifiers(modifiers, 'modifiers')
-        assert_stmt(value, 'value')
+    __slots__ = ('modifiers', 'value')
+
+    def __init__(self, modifiers, value):
         self.modifiers = modifiers
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_cdefmodifiers(self.modifiers, 'modifiers')
+        assert_stmt(self.value, 'value')
 
 
 class CpdefDecl(stmt):
@@ -1251,9 +1648,15 @@ class CpdefDecl(stmt):
     value : A stmt node.
 
     """
-    def init(self, value):
-        assert_stmt(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_stmt(self.value, 'value')
 
 
 class CFunctionDecl(stmt):
@@ -1265,17 +1668,23 @@ class CFunctionDecl(stmt):
     excepts : An expr node. Can be None.
 
     """
-    def init(self, name, args, returns, excepts):
-        assert_str(name, 'name')
-        assert_arguments(args, 'args')
-        if returns:
-            assert_ctype(returns, 'returns')
-        if excepts:
-            assert_expr(excepts, 'excepts')
+    __slots__ = ('name', 'args', 'returns', 'excepts')
+
+    def __init__(self, name, args, returns, excepts):
         self.name = name
         self.args = args
         self.returns = returns
         self.excepts = excepts
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_arguments(self.args, 'args')
+        if self.returns:
+            assert_ctype(self.returns, 'returns')
+        if self.excepts:
+            assert_expr(self.excepts, 'excepts')
 
 
 class CFunctionDef(stmt):
@@ -1289,21 +1698,28 @@ class CFunctionDef(stmt):
     excepts : An expr node. Can be None.
 
     """
-    def init(self, name, args, body, decorator_list, returns, excepts):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
-        assert_arguments(args, 'args')
-        assert_exprs(decorator_list, 'decorator_list')
-        if returns:
-            assert_ctype(returns, 'returns')
-        if excepts:
-            assert_expr(excepts, 'excepts')
+    __slots__ = ('name', 'args', 'body', 'decorator_list', 'returns',
+                 'excepts')
+
+    def __init__(self, name, args, body, decorator_list, returns, excepts):
         self.name = name
         self.args = args
         self.body = body
         self.decorator_list = decorator_list
         self.returns = returns
         self.excepts = excepts
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
+        assert_arguments(self.args, 'args')
+        assert_exprs(self.decorator_list, 'decorator_list')
+        if self.returns:
+            assert_ctype(self.returns, 'returns')
+        if self.excepts:
+            assert_expr(self.excepts, 'excepts')
 
 
 class CImport(stmt):
@@ -1312,9 +1728,15 @@ class CImport(stmt):
     names : a list of alias nodes.
 
     """
-    def init(self, names):
-        assert_aliases(names, 'names')
+    __slots__ = ('names',)
+
+    def __init__(self, names):
         self.names = names
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_aliases(self.names, 'names')
 
 
 class CImportFrom(stmt):
@@ -1325,15 +1747,21 @@ class CImportFrom(stmt):
     level : an integer. Can be None.
 
     """
-    def init(self, module, names, level):
-        if module:
-            assert_str(module, 'module')
-        assert_aliases(names, 'names')
-        if level:
-            assert_int(level, 'level')
+    __slots__ = ('module', 'names', 'level')
+
+    def __init__(self, module, names, level):
         self.module = module
         self.names = names
         self.level = level
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.module:
+            assert_str(self.module, 'module')
+        assert_aliases(self.names, 'names')
+        if self.level:
+            assert_int(self.level, 'level')
 
 
 class CTypedefDecl(stmt):
@@ -1342,9 +1770,15 @@ class CTypedefDecl(stmt):
     value : a stmt node.
 
     """
-    def init(self, value):
-        assert_stmt(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_stmt(self.value, 'value')
 
 
 class StructDef(stmt):
@@ -1354,11 +1788,17 @@ class StructDef(stmt):
     body : a list of stmt nodes.
 
     """
-    def init(self, name, body):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 
 class UnionDef(stmt):
@@ -1368,11 +1808,17 @@ class UnionDef(stmt):
     body : a list of stmt nodes.
 
     """
-    def init(self, name, body):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 
 class EnumDef(stmt):
@@ -1382,12 +1828,18 @@ class EnumDef(stmt):
     body : A list of stmt nodes.
 
     """
-    def init(self, name, body):
-        if name:
-            assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        if self.name:
+            assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 
 class Property(stmt):
@@ -1397,11 +1849,17 @@ class Property(stmt):
     body : a list of stmt nodes.
 
     """
-    def init(self, name, body):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 
 class ExternFrom(stmt):
@@ -1411,11 +1869,17 @@ class ExternFrom(stmt):
     body : a list of stmt nodes.
 
     """
-    def init(self, name, body):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 
 class CName(expr):
@@ -1425,15 +1889,25 @@ class CName(expr):
     name : a string
 
     """
-    def init(self, ctype, name):
-        assert_ctype(ctype, 'ctype')
-        assert_str(name, 'name')
+    __slots__ = ('ctype', 'name')
+
+    def __init__(self, ctype, name):
         self.ctype = ctype
         self.name = name
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_ctype(self.ctype, 'ctype')
+        assert_str(self.name, 'name')
 
 
 class ctype(CWAN):
-    pass
+    """ The base class of C types, every C type can be const or
+    volatile qualified.
+
+    """
+    __slots__ = ('const', 'volatile')
 
 
 class TypeName(ctype):
@@ -1442,11 +1916,17 @@ class TypeName(ctype):
     name : an expr node.
 
     """
-    def init(self, name, const=False, volatile=False):
-        assert_expr(name, 'name')
+    __slots__ = ('name',)
+
+    def __init__(self, name, const=False, volatile=False):
         self.name = name
         self.const = const
         self.volatile = volatile
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_expr(self.name, 'name')
 
 
 class CFunctionType(ctype):
@@ -1456,12 +1936,20 @@ class CFunctionType(ctype):
     returns : a ctype node. Can be None.
     
     """
-    def init(self, args, returns):
-        assert_arguments(args, 'args')
-        if returns:
-            assert_ctype(returns, 'returns')
+    __slots__ = ('args', 'returns')
+
+    def __init__(self, args, returns):
         self.args = args
         self.returns = returns
+        self.const = False
+        self.volatile = False
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_arguments(self.args, 'args')
+        if self.returns:
+            assert_ctype(self.returns, 'returns')
 
 
 class Pointer(ctype):
@@ -1470,11 +1958,17 @@ class Pointer(ctype):
     value : a ctype node.
 
     """
-    def init(self, value, const=False, volatile=False):
-        assert_ctype(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value, const=False, volatile=False):
         self.value = value
         self.const = const
         self.volatile = volatile
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_ctype(self.value, 'value')
 
 
 class Array(ctype):
@@ -1484,11 +1978,19 @@ class Array(ctype):
     dim : an integer
 
     """
-    def init(self, value, dim):
-        assert_ctype(value, 'value')
-        assert_int(dim, 'dim')
+    __slots__ = ('value', 'dim')
+
+    def __init__(self, value, dim):
         self.value = value
         self.dim = dim
+        self.const = False
+        self.volatile = False
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_ctype(self.value, 'value')
+        assert_int(self.dim, 'dim')
 
 class CppClassDef(stmt):
     """ A cppclass definition. Inherits stmt.
@@ -1498,11 +2000,17 @@ class CppClassDef(stmt):
     #TODO: add template arguments
 
     """
-    def init(self, name, body):
-        assert_str(name, 'name')
-        assert_stmts(body, 'body')
+    __slots__ = ('name', 'body')
+
+    def __init__(self, name, body):
         self.name = name
         self.body = body
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_str(self.name, 'name')
+        assert_stmts(self.body, 'body')
 
 class Reference(ctype):
     """ A C++ reference node. Inherits ctype.
@@ -1510,9 +2018,17 @@ class Reference(ctype):
     value : a ctype node.
 
     """
-    def init(self, value):
-        assert_ctype(value, 'value')
+    __slots__ = ('value',)
+
+    def __init__(self, value):
         self.value = value
+        self.const = False
+        self.volatile = False
+        if _validate.get():
+            self._check()
+
+    def _check(self):
+        assert_ctype(self.value, 'value')
 
 
 
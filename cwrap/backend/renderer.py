@@ -3,6 +3,7 @@ from io import StringIO
 import os
 
 from . import cw_ast
+from .. import dispatch
 from .. import version
 
 
@@ -16,33 +17,61 @@ CODE_HEADER = """\
 
 
 class Code(object):
-
-    def __init__(self):
-        self._io = StringIO()
+    """ The output of the renderer. Chunks are written to `sink`, any
+    object with a write() method (e.g. a file), as soon as they are
+    rendered. Without a sink they are kept in memory, see getvalue().
+    The generation header is written first.
+
+    """
+    def __init__(self, sink=None):
+        self._io = sink if sink is not None else StringIO()
+        self._write = self._io.write
         self._indent_level = 0
         self._indentor = ' ' * 4
+        # `_prefixes` caches the indentation of each level
+        self._prefixes = ['']
+        self._prefix = ''
+        self._write(CODE_HEADER)
+
+    def _set_level(self, level):
+        self._indent_level = level
+        prefixes = self._prefixes
+        while len(prefixes) <= level:
+            prefixes.append(self._indentor * len(prefixes))
+        self._prefix = prefixes[level] if level > 0 else ''
 
     def indent(self, n=1):
-        self._indent_level += n
+        self._set_level(self._indent_level + n)
 
     def dedent(self, n=1):
-        self._indent_level -= n
+        self._set_level(self._indent_level - n)
 
     def write_i(self, code):
-        indent = self._indentor * self._indent_level
+        # Most chunks are a single line, only split the others
+        if '\n' not in code and '\r' not in code:
+            if code:
+                self._write(self._prefix + code)
+            return
+        indent = self._prefix
         lines = (indent + line for line in code.splitlines())
         code = '\n'.join(lines)
-        self._io.write(code)
+        self._write(code)
 
     def write(self, code):
-        self._io.write(code)
+        self._write(code)
                     
     def newline(self, n=1):
-        self._io.write('\n' * n)
+        self._write('\n' * n)
     
     def getvalue(self):
-        res = CODE_HEADER + self._io.getvalue()
-        return res
+        return self._io.getvalue()
+
+
+class _Chunks(list):
+    """ A sink collecting the written chunks, see ASTRenderer.iter_render.
+
+    """
+    write = list.append
 
 
 class ASTRenderer(object):
@@ -50,29 +79,73 @@ class ASTRenderer(object):
     def __init__(self):
         self.code = None
         self.cdef_stmt_context = []
+        cls = type(self)
+        self._visitors = dispatch.get_table(cls, 'visit_',
+                                            cls.unhandled_visitor)
+        self._renderers = dispatch.get_table(cls, 'render_',
+                                             cls.unhandled_renderer)
+        self._iterators = dispatch.get_table(cls, 'iter_')
 
     #--------------------------------------------------------------------------
     # Dispatch methods
     #--------------------------------------------------------------------------
     def render(self, module):
+        """ Returns the code of `module` as a string.
+
+        """
+        self._start(module, None)
+        self.visit(module)
+        return self.code.getvalue()
+
+    def render_to(self, module, sink):
+        """ Writes the code of `module` to `sink`, e.g. a file or
+        socket.makefile(), while it is rendered.
+
+        """
+        self._start(module, sink)
+        self.visit(module)
+
+    def iter_render(self, module):
+        """ Yields the code of `module` in chunks, one per statement of
+        the module and of the extern blocks in it.
+
+        """
+        chunks = _Chunks()
+        self._start(module, chunks)
+        for _ in self.iter_visit(module):
+            if chunks:
+                yield ''.join(chunks)
+                del chunks[:]
+        if chunks:
+            yield ''.join(chunks)
+
+    def _start(self, module, sink):
         if not isinstance(module, cw_ast.Module):
             msg = ('.render(...) must be called with a Module node as ' 
                    'argument. Got `%s` instead.' % type(module))
             raise TypeError(msg)
-        self.code = Code()
+        self.code = Code(sink)
         self.cdef_stmt_context = []
-        self.visit(module)
-        return self.code.getvalue()
 
     def visit(self, node):
-        method_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method_name, self.unhandled_visitor)
-        visitor(node)
+        self._visitors[node.__class__](self, node)
+
+    def iter_visit(self, node):
+        """ Renders `node` like visit(), but yields after each statement
+        it contains. Nodes without an iter_* method are rendered by
+        their visitor in one step.
+
+        """
+        iterator = self._iterators[node.__class__]
+        if iterator is None:
+            self.visit(node)
+            yield
+        else:
+            for step in iterator(self, node):
+                yield step
 
     def visit_render(self, node):
-        method_name = 'render_' + node.__class__.__name__
-        renderer = getattr(self, method_name, self.unhandled_renderer)
-        return renderer(node)
+        return self._renderers[node.__class__](self, node)
 
     def unhandled_visitor(self, node):
         print('No visitor for node: `%s`' % node)
@@ -86,8 +159,13 @@ class ASTRenderer(object):
     # cw_ast.mod Handlers
     #--------------------------------------------------------------------------
     def visit_Module(self, mod):
+        for _ in self.iter_Module(mod):
+            pass
+
+    def iter_Module(self, mod):
         for stmt in mod.body:
-            self.visit(stmt)
+            for step in self.iter_visit(stmt):
+                yield step
             self.code.newline()
 
     #--------------------------------------------------------------------------
@@ -429,13 +507,18 @@ class ASTRenderer(object):
         self.code.newline()
     
     def visit_CdefDecl(self, cdef_decl):
+        for _ in self.iter_CdefDecl(cdef_decl):
+            pass
+
+    def iter_CdefDecl(self, cdef_decl):
         # this is a bit weird since we need to cdef then write a stmt
         # so we put the cdef decl in a context and let the child 
         # handle it
         modifiers = [self.visit_render(mod) for mod in cdef_decl.modifiers]
         items = ['cdef'] + modifiers
         self.cdef_stmt_context.append(' '.join(items))
-        self.visit(cdef_decl.value)
+        for step in self.iter_visit(cdef_decl.value):
+            yield step
 
     def visit_CpdefDecl(self, cpdef_decl):
         self.cdef_stmt_context.append('cpdef')
@@ -623,6 +706,10 @@ class ASTRenderer(object):
         self.code.dedent()
         
     def visit_ExternFrom(self, extern_from):
+        for _ in self.iter_ExternFrom(extern_from):
+            pass
+
+    def iter_ExternFrom(self, extern_from):
         name = extern_from.name
         if self.cdef_stmt_context:
             mod = self.cdef_stmt_context.pop()
@@ -634,6 +721,7 @@ class ASTRenderer(object):
         self.code.indent()
         for stmt in extern_from.body:
             self.visit(stmt)
+            yield
         self.code.dedent()
     
     #--------------------------------------------------------------------------
@@ -1,14 +1,30 @@
+import contextlib
+import copy
+import multiprocessing
 import os
 
 from . import frontends
-from .backend import renderer
+from . import stats
+from . import timeline
+from . import trace
+from .backend import cw_ast, renderer
+from .depgraph import DependencyGraph, options_key
+from .output import AtomicFile, depfile_path, write_depfile
+from .pipeline import Pipeline
+
+
+tracer = trace.get_tracer('config')
 
 
 class ASTContainer(object):
 
-    def __init__(self, module, filename):
+    def __init__(self, module, filename, dependencies=None, header_file=None):
         self.module = module
         self.filename = filename
+        # the files the module was generated from and the File of its
+        # header, if the frontend knows them
+        self.dependencies = dependencies
+        self.header_file = header_file
 
 
 class File(object):
@@ -17,30 +33,331 @@ class File(object):
         self.path = os.path.abspath(path)
         self.metadata = metadata
 
+    def to_dict(self):
+        return {'path': self.path, 'metadata': self.metadata}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['path'], **data['metadata'])
+
+
+def _init_worker(frontend_name):
+    """ Initializer of the worker processes of a parallel run. Lets the
+    frontend do its expensive setup once per worker.
+
+    """
+    frontend = frontends.get_frontend(frontend_name)
+    init_worker = getattr(frontend, 'init_worker', None)
+    if init_worker is not None:
+        init_worker()
+
+
+def _render_file(args):
+    """ Parses, transforms and renders a single header in a worker
+    process. Returns a list of (container, code) tuples, the containers
+    are ASTContainers without the module, the statistics of the header
+    if the `stats` option is set and its timeline if the `timeline`
+    option is set, otherwise None, and the trace messages written
+    meanwhile, which the parent writes to its own trace stream.
+
+    """
+    config, header_file = args
+    single = Config(config.frontend, [header_file], config.save_dir,
+                    **config.metadata)
+    # a forked worker inherits the statistics and the timeline of the
+    # parent, the header gets its own
+    report = stats.Stats() if config.metadata.get('stats') else None
+    events = timeline.Timeline() if config.metadata.get('timeline') \
+        else None
+    with contextlib.ExitStack() as stack:
+        if report is not None:
+            stack.enter_context(stats.collect(report))
+        if events is not None:
+            stack.enter_context(timeline.record(events))
+        output = stack.enter_context(trace.capture())
+        results = single._render_containers()
+    return results, report, events, output.getvalue()
+
 
 class Config(object):
-    
-    def __init__(self, frontend, files, save_dir=None, **metadata):
+
+    def __init__(self, frontend, files, save_dir=None, jobs=1, **metadata):
         self.frontend = frontend
         self.files = files
         self.save_dir = save_dir or os.getcwd()
+        # `jobs` is the number of worker processes used by generate()
+        self.jobs = jobs
         self.metadata = metadata
 
-    def generate(self):
+    def to_dict(self):
+        """ Returns the config as a dict of json serializable values
+        (as long as the options are), see from_dict().
+
+        """
+        return {'frontend': self.frontend,
+                'files': [header_file.to_dict() for header_file in self.files],
+                'save_dir': self.save_dir, 'jobs': self.jobs,
+                'metadata': self.metadata}
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Creates a Config from a dict returned by to_dict().
+
+        """
+        files = [File.from_dict(header_file) for header_file in data['files']]
+        return cls(data['frontend'], files, data['save_dir'], data['jobs'],
+                   **data['metadata'])
+
+    def render(self):
+        """ Generates the code for all files in this process. Returns
+        an iterable of (filename, code) tuples.
+
+        """
+        for ast_container, code in self._iter_render():
+            yield ast_container.filename, code
+
+    def _render_containers(self, ast_containers=None):
+        """ Like render(), but returns a list of (container, code) tuples
+        whose containers are ASTContainers without the module, so they
+        can be sent back from a worker process. Renders the ASTContainers
+        `ast_containers` instead of those of generate_asts(), if given.
+
+        """
+        return [(ASTContainer(None, ast_container.filename,
+                              ast_container.dependencies,
+                              ast_container.header_file), code)
+                for ast_container, code in self._iter_render(ast_containers)]
+
+    def _iter_render(self, ast_containers=None):
+        ast_renderer = renderer.ASTRenderer()
+        if ast_containers is None:
+            ast_containers = self.generate_asts()
+        for ast_container in ast_containers:
+            path = stats.container_path(ast_container)
+            with stats.phase('render', path):
+                code = ast_renderer.render(ast_container.module)
+            yield ast_container, code
+
+    def generate_asts(self):
+        """ Returns an iterable of the ASTContainers of all files. The
+        cw_ast constructors only check their arguments if the
+        `validate_ast` option is set.
+
+        """
+        frontend = frontends.get_frontend(self.frontend)
+        return cw_ast.validating(self.metadata.get('validate_ast', False),
+                                 frontend.generate_asts, self)
+
+    def render_parallel(self):
+        """ Generates the code for all files using a pool of `jobs` worker
+        processes, each of which handles one header at a time. Returns an
+        iterable of (filename, code) tuples in the order of the files.
+
+        """
+        for container, code in self._render_parallel():
+            yield container.filename, code
+
+    def _render_parallel(self):
+        # Let the frontend resolve options that depend on all files
+        frontend = frontends.get_frontend(self.frontend)
+        prepare_config = getattr(frontend, 'prepare_config', None)
+        config = prepare_config(self) if prepare_config is not None else self
+
+        tasks = [(config, header_file) for header_file in config.files]
+        pool = multiprocessing.Pool(self.jobs, _init_worker, (self.frontend,))
+        try:
+            for result, report, events, output in pool.imap(_render_file,
+                                                            tasks):
+                trace.write_text(output)
+                if report is not None and stats.active():
+                    stats.active().merge(report)
+                if events is not None and timeline.active():
+                    timeline.active().merge(events)
+                for item in result:
+                    yield item
+        except BaseException:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    def generate(self, render=None):
+        """ Writes the code of all files to `save_dir`. Without worker
+        processes every file is streamed to disk while it is rendered.
+        Files are replaced atomically; with the `write_if_changed` option
+        a file whose contents didn't change isn't touched at all.
+
+        With the `dep_graph` option only the headers are generated whose
+        include closure changed since the last run, see
+        depgraph.DependencyGraph.
+
+        With the `stats` option the statistics of every header are
+        collected and returned as a stats.Stats, if the option is a path
+        they are written there as json. Without it None is returned. The
+        `timeline` option is the path the timeline.Timeline of the run is
+        written to.
+
+        `render` replaces parsing and rendering the files in this process:
+        it is called with the Config of the files to generate and returns
+        their (container, code) tuples like _render_containers(), e.g.
+        those the server kept from earlier runs.
+
+        """
+        with self._instrument() as report:
+            config, graph = self._dirty_config()
+            if config.files or graph is None:
+                self._generate(config, graph, render)
+            if graph is not None:
+                graph.prune(self.files)
+                graph.save()
+        return report
+
+    async def generate_async(self, queue_size=4):
+        """ Like generate(), but a coroutine which parses, transforms and
+        renders, and writes the files in a pipeline of threads connected
+        by queues of at most `queue_size` headers, see pipeline.Pipeline.
+        `jobs` is not used.
+
+        """
+        with self._instrument() as report:
+            config, graph = self._dirty_config()
+            if config.files:
+                await Pipeline(self, config, graph, queue_size).run()
+            if graph is not None:
+                graph.prune(self.files)
+                graph.save()
+        return report
+
+    @contextlib.contextmanager
+    def _instrument(self):
+        """ Collects the statistics of the block with the `stats` option
+        and records its timeline with the `timeline` option, into those
+        collected already if any. Writes them to the paths the options
+        give, if they are paths.
+
+        """
+        stats_option = self.metadata.get('stats')
+        timeline_option = self.metadata.get('timeline')
+        report = events = None
+        with contextlib.ExitStack() as stack:
+            if stats_option:
+                report = stack.enter_context(
+                    stats.collect(stats.active()))
+            if timeline_option:
+                events = stack.enter_context(
+                    timeline.record(timeline.active()))
+            with timeline.span('generate'):
+                yield report
+        if isinstance(stats_option, str):
+            report.write(stats_option)
+        if isinstance(timeline_option, str):
+            events.write(timeline_option)
+
+    def _dirty_config(self):
+        """ Returns the config to generate and the dependency graph. With
+        the `dep_graph` option that is a copy of the config with only the
+        headers whose include closure changed, otherwise the config itself
+        and None.
+
+        """
+        graph_path = self.metadata.get('dep_graph')
+        if graph_path is None:
+            return self, None
+
+        graph = DependencyGraph.load(graph_path, options_key(self))
+        config = copy.copy(self)
+        config.files = graph.dirty_files(self.files, self.save_dir)
+        if tracer.info:
+            tracer.write(trace.INFO, 'Generating %d of %d headers' % (
+                len(config.files), len(self.files)))
+        return config, graph
+
+    def watch(self, interval=0.5):
+        """ Writes the code of all files to `save_dir` like generate(),
+        then keeps watching the headers and the files they include and
+        writes the code of a header again whenever one of them changed.
+        The files are checked every `interval` seconds. Doesn't return,
+        stop it with KeyboardInterrupt.
+
+        """
         frontend = frontends.get_frontend(self.frontend)
-        cw_asts = frontend.generate_asts(self)
+        watch_asts = getattr(frontend, 'watch_asts', None)
+        if watch_asts is None:
+            raise ValueError('The %s frontend has no watch mode' %
+                             self.frontend)
         ast_renderer = renderer.ASTRenderer()
-        for ast_container in cw_asts:
-            filename = ast_container.filename
-            save_path = os.path.join(self.save_dir, filename)
-            print('Rendering %s' % save_path) 
-            mod_node = ast_container.module
-            code = ast_renderer.render(mod_node)
-            try:
-                with open(save_path, 'wb') as f:
-                    f.write(code)
-            except IOError:
-                msg = 'Could not gain write access to %s' % save_path
-                raise IOError(msg)
+        for ast_container in cw_ast.validating(
+                self.metadata.get('validate_ast', False), watch_asts, self,
+                interval):
+            self._write_module(ast_renderer, ast_container, None)
+
+    def _generate(self, config, graph, render=None):
+        if render is not None:
+            for container, code in render(config):
+                self._write_code(container, code, graph)
+        # the headers of an umbrella translation unit are parsed together
+        elif config.jobs > 1 and len(config.files) > 1 and \
+                not config.metadata.get('umbrella'):
+            for container, code in config._render_parallel():
+                self._write_code(container, code, graph)
+        else:
+            ast_renderer = renderer.ASTRenderer()
+            for ast_container in config.generate_asts():
+                self._write_module(ast_renderer, ast_container, graph)
+
+    def _write_module(self, ast_renderer, ast_container, graph):
+        """ Streams the module of `ast_container` to its file while it is
+        rendered.
+
+        """
+        path = stats.container_path(ast_container)
+        with stats.phase('render', path):
+            with self._open(ast_container.filename) as f:
+                ast_renderer.render_to(ast_container.module, f)
+        with stats.phase('write', path):
+            self._written(f, ast_container, graph)
+        if stats.active():
+            stats.count('bytes', os.path.getsize(f.path), path)
+
+    def _write_code(self, container, code, graph):
+        """ Writes the rendered `code` of `container` to its file.
+
+        """
+        path = stats.container_path(container)
+        with stats.phase('write', path):
+            with self._open(container.filename) as f:
+                f.write(code)
+            self._written(f, container, graph)
+        stats.count('bytes', len(code), path)
+
+    def _open(self, filename):
+        save_path = os.path.join(self.save_dir, filename)
+        if tracer.info:
+            tracer.write(trace.INFO, 'Rendering %s' % save_path)
+        try:
+            return AtomicFile(save_path,
+                              self.metadata.get('write_if_changed', False))
+        except IOError:
+            msg = 'Could not gain write access to %s' % save_path
+            raise IOError(msg)
 
+    def _written(self, output_file, container, graph):
+        """ Called after `output_file` was closed. Writes its depfile
+        if the `depfiles` option is set and records it in the dependency
+        graph `graph`.
 
+        """
+        if not output_file.changed and tracer.info:
+            tracer.write(trace.INFO, 'Unchanged %s' % output_file.path)
+        dependencies = container.dependencies
+        if self.metadata.get('depfiles') and dependencies is not None:
+            write_depfile(depfile_path(output_file.path), output_file.path,
+                          dependencies,
+                          self.metadata.get('write_if_changed', False))
+        # Without its header a module can't be attributed, so the
+        # header isn't in the graph and is always generated again
+        if graph is not None and container.header_file is not None:
+            graph.record(container.header_file, container.filename,
+                         dependencies)
@@ -0,0 +1,152 @@
+# Stdlib imports
+import hashlib
+import json
+import os
+
+# Local package imports
+from .output import AtomicFile, file_fingerprint, fingerprint_unchanged
+
+
+# Bump this whenever the layout of the graph file changes. A graph of
+# another version is discarded and all headers are generated again.
+GRAPH_VERSION = 1
+
+
+# The options of a Config which change the generated code. The options
+# of a single File are compared per header, see DependencyGraph.is_dirty.
+OUTPUT_OPTIONS = ['include_dirs', 'language', 'header_scope', 'pch',
+                  'umbrella', 'share_declarations']
+
+
+def options_key(config):
+    """ Returns a hash of the frontend and the options of `config` which
+    change the generated code. The outputs recorded in a graph are only
+    valid for the same options, other options (caches, statistics,
+    validation, ...) don't invalidate them.
+
+    """
+    options = dict((name, config.metadata[name]) for name in OUTPUT_OPTIONS
+                   if name in config.metadata)
+    data = json.dumps([config.frontend, os.path.abspath(config.save_dir),
+                       options], sort_keys=True, default=repr)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class DependencyGraph(object):
+    """ A persistent graph of the headers of a Config, the files they
+    include and the files generated from them.
+
+    Every file of the graph is stored once with its fingerprint (path,
+    size, mtime and digest, see output.file_fingerprint), every header
+    with the list of files of its include closure and its outputs. A
+    header needs to be generated again if one of the files of its closure
+    changed, one of its outputs is missing or the options differ from
+    those the graph was recorded with. Since a file is shared by all
+    headers including it, it is checked only once per run.
+
+    """
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.files = {}
+        self.headers = {}
+        self._recorded = set()
+        self._changed = None
+
+    @classmethod
+    def load(cls, path, key):
+        """ Loads the graph at `path`. Returns an empty graph if there is
+        none or it was recorded with other options than `key`.
+
+        """
+        graph = cls(path, key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return graph
+        if data.get('version') == GRAPH_VERSION and data.get('key') == key:
+            graph.files = data.get('files', {})
+            graph.headers = data.get('headers', {})
+        return graph
+
+    def save(self):
+        """ Writes the graph to `path`, leaving out files no header
+        includes any more.
+
+        """
+        used = set()
+        for header in self.headers.values():
+            used.update(header['includes'])
+        files = dict((path, fingerprint)
+                     for path, fingerprint in self.files.items()
+                     if path in used)
+        data = {'version': GRAPH_VERSION, 'key': self.key, 'files': files,
+                'headers': self.headers}
+        with AtomicFile(self.path, only_if_changed=True) as f:
+            json.dump(data, f, sort_keys=True, default=repr)
+
+    def changed_files(self):
+        """ Returns the set of files of the graph which were changed or
+        removed since they were recorded.
+
+        """
+        if self._changed is None:
+            self._changed = set(
+                path for path, fingerprint in self.files.items()
+                if not fingerprint_unchanged(fingerprint))
+        return self._changed
+
+    def is_dirty(self, header_file, save_dir):
+        """ Checks if the header of the File `header_file` needs to be
+        generated again.
+
+        """
+        header = self.headers.get(header_file.path)
+        if header is None or header['metadata'] != header_file.metadata:
+            return True
+        for filename in header['outputs']:
+            if not os.path.exists(os.path.join(save_dir, filename)):
+                return True
+        changed = self.changed_files()
+        return any(path in changed for path in header['includes'])
+
+    def dirty_files(self, files, save_dir):
+        """ Returns the Files of `files` which need to be generated
+        again.
+
+        """
+        return [header_file for header_file in files
+                if self.is_dirty(header_file, save_dir)]
+
+    def record(self, header_file, filename, dependencies):
+        """ Records that `filename` was generated from the header of the
+        File `header_file` and the `dependencies`. The first output
+        recorded for a header in a run replaces its old outputs.
+
+        """
+        path = header_file.path
+        if path not in self._recorded:
+            self._recorded.add(path)
+            self.headers[path] = {'metadata': header_file.metadata,
+                                  'outputs': [], 'includes': []}
+        header = self.headers[path]
+        if filename not in header['outputs']:
+            header['outputs'].append(filename)
+        changed = self.changed_files()
+        for name in [path] + list(dependencies or []):
+            if name in header['includes'] or not os.path.isfile(name):
+                continue
+            header['includes'].append(name)
+            if name not in self.files or name in changed:
+                self.files[name] = file_fingerprint(name)
+                changed.discard(name)
+
+    def prune(self, files):
+        """ Forgets the headers which are not in the Files `files`.
+
+        """
+        paths = set(header_file.path for header_file in files)
+        for path in list(self.headers):
+            if path not in paths:
+                del self.headers[path]
@@ -0,0 +1,62 @@
+""" Dispatch tables of the tree walkers.
+
+The parser, the transformer and the renderer call a handler method per
+node, named after the node: 'visit_' + the cursor kind name, 'visit_' +
+the node class name and so on. Instead of building that name and looking
+it up with getattr for every node, a walker keeps a DispatchTable per
+class and prefix, which maps the node key (a cursor kind id or a node
+class) to the handler function:
+
+    self._visitors = dispatch.get_table(type(self), 'visit_',
+                                        default=type(self).generic_visit)
+    ...
+    self._visitors[node.__class__](self, node)
+
+"""
+
+
+def class_name(key):
+    """ The handler name suffix of a node class.
+
+    """
+    return key.__name__
+
+
+class DispatchTable(dict):
+    """ Maps node keys to the handler functions of the class `cls`.
+
+    The handler of a key is the attribute `prefix` + `name(key)` of
+    `cls`, or `default` if there is no such attribute or `name` returns
+    None. Handlers are resolved on the first lookup of a key and stored,
+    so every later lookup is a single dict access.
+
+    """
+    def __init__(self, cls, prefix, default=None, name=class_name):
+        super(DispatchTable, self).__init__()
+        self.cls = cls
+        self.prefix = prefix
+        self.default = default
+        self.name = name
+
+    def __missing__(self, key):
+        name = self.name(key)
+        if name is None:
+            handler = self.default
+        else:
+            handler = getattr(self.cls, self.prefix + name, self.default)
+        self[key] = handler
+        return handler
+
+
+def get_table(cls, prefix, default=None, name=class_name):
+    """ Returns the DispatchTable of `cls` for `prefix`, creating it on
+    first use. The table is kept on the class itself, so it is built once
+    and a subclass with other handlers gets a table of its own.
+
+    """
+    attr = '_dispatch_' + prefix
+    table = cls.__dict__.get(attr)
+    if table is None:
+        table = DispatchTable(cls, prefix, default, name)
+        setattr(cls, attr, table)
+    return table
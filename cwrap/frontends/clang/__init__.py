@@ -1,65 +1,209 @@
 # Stdlib imports
+import copy
 import os
 import subprocess
 import tempfile
 
+# CWrap imports
+from ... import stats
+from ... import trace
+from ...ir_cache import IRCache
+
 # Local package imports
 from . import  ast_transforms as transforms
+from . import  c_ast
 from . import  clang_parser
+from .tu_cache import TUCache
+from .pch import get_prelude
+from .scope import get_header_scope
+from .decl_store import DeclarationStore
+from .diagnostics import DiagnosticSet
+from .ffi_stats import account_calls
+from .umbrella import umbrella_containers
+from .watch import Watcher
+
+
+tracer = trace.get_tracer('frontend')
 
 
-def gen_c_ast(header_path, include_dirs, language):
+def gen_c_ast(header_path, include_dirs, language, tu_cache=None,
+              prelude=None, scope=None, diagnostics=None, dependencies=None,
+              store=None):
     """ Parse the given header file into a C style ast which can be
     transformed into a CWrap ast. The include dirs are passed along to 
     gccxml.
 
     """
-    c_ast = clang_parser.parse(header_path, include_dirs, language)
+    c_ast = clang_parser.parse(header_path, include_dirs, language,
+                               tu_cache=tu_cache, prelude=prelude,
+                               scope=scope, diagnostics=diagnostics,
+                               dependencies=dependencies, store=store)
     return c_ast
 
 
-def generate_asts(config):
-    """ Returns an iterable of ASTContainer objects.
+def init_worker():
+    """ Prepares a worker process of a parallel run (see Config.jobs),
+    so libclang is loaded once per worker and not once per header.
+
+    """
+    clang_parser.get_index()
+
+
+def prepare_config(config):
+    """ Returns a copy of `config` whose options no longer depend on the
+    full list of files, before the files are distributed to worker
+    processes. Resolves `pch='auto'` to the detected common prelude and
+    builds the PCH of the prelude, so the workers load it instead of
+    each building it again. A prelude with errors isn't used.
+
+    """
+    config = copy.copy(config)
+    config.metadata = dict(config.metadata)
+    prelude = get_prelude(config)
+    if prelude is not None:
+        args = clang_parser.clang_args(
+            config.metadata.get('include_dirs', []),
+            config.metadata.get('language', ''))
+        if not prelude.args(clang_parser.get_index(), args,
+                            clang_parser.PARSE_OPTIONS):
+            prelude = None
+    if 'pch' in config.metadata:
+        config.metadata['pch'] = prelude.includes if prelude else None
+    return config
+
+
+def generate_asts(config, diagnostics=None):
+    """ Returns an iterable of ASTContainer objects. The diagnostics of
+    all headers are added to the `diagnostics` DiagnosticSet, if given.
 
     """
-    c_ast_containers = []
+    c_ast_containers = list(parse_asts(config, diagnostics))
+
+    # Now we can create an ast transformer and transform the list 
+    # of containers into a generator that can be rendered into code
+    return transform_asts(c_ast_containers)
+
+
+def transform_asts(c_ast_containers):
+    """ Transforms the CAstContainers `c_ast_containers` returned by
+    parse_asts. Returns an iterable of ASTContainer objects.
+
+    """
+    ast_transformer = transforms.CAstTransformer(c_ast_containers)
+    return ast_transformer.transform()
+
+
+def parse_asts(config, diagnostics=None):
+    """ Parses the headers of `config` one after another. Returns an
+    iterator of their CAstContainers, a header is only parsed when its
+    container is requested. With the `ffi_stats` option the libclang
+    calls are accounted, see ffi_stats.CallAccounting.
+
+    """
+    c_ast_containers = _parse_asts(config, diagnostics)
+    if config.metadata.get('ffi_stats'):
+        c_ast_containers = account_calls(c_ast_containers)
+    return c_ast_containers
+
+
+def _parse_asts(config, diagnostics):
+    if diagnostics is None:
+        diagnostics = DiagnosticSet()
+
+    # An optional on-disk cache of the parsed translation units
+    tu_cache_dir = config.metadata.get('tu_cache_dir')
+    tu_cache = TUCache(tu_cache_dir) if tu_cache_dir else None
+
+    # An optional on-disk cache of the transformed c_ast items, which
+    # skips parsing altogether
+    ir_cache_dir = config.metadata.get('ir_cache_dir')
+    ir_cache = IRCache(ir_cache_dir, c_ast) if ir_cache_dir else None
+
+    # An optional set of includes shared by all headers, which is
+    # precompiled once and then included with -include-pch
+    prelude = get_prelude(config)
+
+    # Optionally all headers are parsed at once in a single translation
+    # unit including them
+    if config.metadata.get('umbrella') and len(config.files) > 1:
+        if tracer.info:
+            tracer.write(trace.INFO, 'Parsing %d headers in one unit' %
+                         len(config.files))
+        for container in umbrella_containers(config, tu_cache, prelude,
+                                             diagnostics):
+            yield container
+        return
+
+    # The headers whose declarations are wrapped, by default all of them
+    scope = get_header_scope(config)
+
+    # Optionally the headers share the nodes of the declarations of the
+    # files they have in common
+    store = None
+    if config.metadata.get('share_declarations'):
+        store = DeclarationStore()
+
     for header_file in config.files:
-        # read the header info and create the extern and implemenation
-        # module names
         path = header_file.path
-        header_name = os.path.split(path)[-1]
-        extern_name = header_file.metadata.get('extern_name')
-        implementation_name = header_file.metadata.get('implementation_name')
-        if extern_name is None:
-            extern_name = '_' + os.path.splitext(header_name)[0]
-        if implementation_name is None:
-            implementation_name = os.path.splitext(header_name)[0]
 
         # generate the c_ast for the header 
         include_dirs = config.metadata.get('include_dirs', [])
 
         language = config.metadata.get('language', '')
+
+        cached = None
+        if ir_cache is not None:
+            # The options the c_ast items depend on
+            ir_args = [[ir_cache.relative(d) for d in include_dirs],
+                       language, config.metadata.get('header_scope', 'all')]
+            with stats.phase('ir_cache', path):
+                cached = ir_cache.load(path, ir_args)
+            stats.count('ir_cache_hits' if cached is not None
+                        else 'ir_cache_misses', 1, path)
+        if cached is not None:
+            if tracer.info:
+                tracer.write(trace.INFO, 'Loaded %s' % path)
+            trans_items, dependencies = cached
+            yield transforms.CAstContainer(
+                trans_items, *transforms.module_names(header_file),
+                dependencies=dependencies, header_file=header_file)
+            continue
         
-        print('Parsing %s' % path)
-        ast_items = gen_c_ast(path, include_dirs, language) 
-
-        print('in __init__/generate_asts()')
-        print('file parsed')
-        print('AST:', ast_items)
-        for item in ast_items:
-            print(item.__class__.__name__, item.name)
-        
-        # Apply the transformations to the ast items 
-        trans_items = transforms.apply_c_ast_transformations(ast_items)
-        
-        # Create the CAstContainer for these items
-        container = transforms.CAstContainer(trans_items, header_name, 
-                                             extern_name, implementation_name)
+        if tracer.info:
+            tracer.write(trace.INFO, 'Parsing %s' % path)
+        dependencies = []
+        shared = store.hits if store is not None else 0
+        ast_items = gen_c_ast(path, include_dirs, language, tu_cache, prelude,
+                              scope, diagnostics, dependencies, store)
+        if stats.active():
+            stats.count('c_ast_nodes', c_ast.count_nodes(ast_items), path)
+            if store is not None:
+                stats.count('shared_declarations', store.hits - shared, path)
+
+        if tracer.debug:
+            tracer.write(trace.DEBUG, 'file parsed')
+            tracer.write(trace.DEBUG, 'AST:', ast_items)
+            for item in ast_items:
+                tracer.write(trace.DEBUG, item.__class__.__name__, item.name)
 
         # Add the container to the list
-        c_ast_containers.append(container)
+        with stats.phase('transform', path):
+            container = transforms.make_container(header_file, ast_items,
+                                                  dependencies)
+        if ir_cache is not None:
+            with stats.phase('ir_cache', path):
+                ir_cache.store(path, ir_args, container.items, dependencies)
+        yield container
 
-    # Now we can create an ast transformer and transform the list 
-    # of containers into a generator that can be rendered into code
-    ast_transformer = transforms.CAstTransformer(c_ast_containers)
-    return ast_transformer.transform()
+    if store is not None and tracer.info:
+        tracer.write(trace.INFO, 'Shared %d declarations, %d stored' %
+                     (store.hits, len(store.nodes)))
+
+
+def watch_asts(config, interval=0.5, diagnostics=None):
+    """ Returns an endless iterable of ASTContainer objects: first those
+    of all headers, then those of every header which is reparsed because
+    it or one of its includes changed (see watch.Watcher).
+
+    """
+    return Watcher(config, diagnostics).watch(interval)
@@ -1,4 +1,10 @@
+# Stdlib imports
+import os
+
 # CWrap imports
+from ... import dispatch
+from ... import stats
+from ... import trace
 from ...backend import cw_ast
 from ...config import ASTContainer 
 
@@ -6,6 +12,9 @@ from ...config import ASTContainer
 from . import c_ast
 
 
+tracer = trace.get_tracer('transform')
+
+
 def find_toplevel_items(items):
     """ Finds and returns the toplevel items given a list of items, one
     of which should be a toplevel namespace node.
@@ -90,7 +99,8 @@ def _flatten_container(container, items=None): #, context_name=None):
     # any fields that reference them with the typedefs.
     for idx, field, typedef in reversed(mod_context):
         r = container.members.pop(idx) #TODO????
-        print('removed member', r.name)
+        if tracer.debug:
+            tracer.write(trace.DEBUG, 'removed member', r.name)
         for member in container.members:
             if isinstance(member, c_ast.Field):
                 if member.typ is field:
@@ -188,14 +198,50 @@ def apply_c_ast_transformations(c_ast_items):
 
 class CAstContainer(object):
     """ A container object that holds a list of ast items, and the
-    names of the modules they should be rendered to.
+    names of the modules they should be rendered to. `dependencies`
+    is the list of files the items were parsed from, `header_file` the
+    File of the parsed header.
 
     """
-    def __init__(self, items, header_name, extern_name, implementation_name):
+    def __init__(self, items, header_name, extern_name, implementation_name,
+                 dependencies=None, header_file=None):
         self.items = items
         self.header_name = header_name
         self.extern_name = extern_name
         self.implementation_name = implementation_name
+        self.dependencies = dependencies
+        self.header_file = header_file
+
+
+def module_names(header_file):
+    """ Returns the header name and the names of the extern and the
+    implementation module of the File `header_file`.
+
+    """
+    # read the header info and create the extern and implemenation
+    # module names
+    path = header_file.path
+    header_name = os.path.split(path)[-1]
+    extern_name = header_file.metadata.get('extern_name')
+    implementation_name = header_file.metadata.get('implementation_name')
+    if extern_name is None:
+        extern_name = '_' + os.path.splitext(header_name)[0]
+    if implementation_name is None:
+        implementation_name = os.path.splitext(header_name)[0]
+    return header_name, extern_name, implementation_name
+
+
+def make_container(header_file, ast_items, dependencies):
+    """ Transforms the `ast_items` parsed from the header of the File
+    `header_file` and returns them in a CAstContainer.
+
+    """
+    # Apply the transformations to the ast items 
+    trans_items = apply_c_ast_transformations(ast_items)
+
+    header_name, extern_name, implementation_name = module_names(header_file)
+    return CAstContainer(trans_items, header_name, extern_name,
+                         implementation_name, dependencies, header_file)
 
 
 class CAstTransformer(object):
@@ -205,6 +251,9 @@ class CAstTransformer(object):
         self.ast_containers = ast_containers
         self.pxd_nodes = []
         self.modifier_stack = []
+        cls = type(self)
+        self._visitors = dispatch.get_table(cls, 'visit_', cls.generic_visit)
+        self._translators = dispatch.get_table(cls, 'translate_')
 
     def transform(self):
         for container in self.ast_containers:
@@ -212,29 +261,34 @@ class CAstTransformer(object):
             self.pxd_nodes = []
             self.modifier_stack = []
             header_name = container.header_name
-
-            for item in items:
-                # only transform items for this header (not #include'd
-                # or other __builtin__ stuff)
-                if item.location is not None:
-                    #if not item.location[0].endswith(header_name):
-                    #    continue
-                    pass #include everythin
-                self.visit(item)
-                #TODO: debug only
-                #print self.pxd_nodes
-                #print
-       
-            extern = cw_ast.ExternFrom(container.header_name, self.pxd_nodes)
-            cdef_decl = cw_ast.CdefDecl([], extern)
-            mod = cw_ast.Module([cdef_decl])
-            
-            yield ASTContainer(mod, container.extern_name + '.pxd')
+            path = container.header_file.path \
+                if container.header_file is not None else header_name
+
+            with stats.phase('translate', path):
+                for item in items:
+                    # only transform items for this header (not #include'd
+                    # or other __builtin__ stuff)
+                    if item.location is not None:
+                        #if not item.location[0].endswith(header_name):
+                        #    continue
+                        pass #include everythin
+                    self.visit(item)
+                    #TODO: debug only
+                    #print self.pxd_nodes
+                    #print
+
+                extern = cw_ast.ExternFrom(container.header_name,
+                                           self.pxd_nodes)
+                cdef_decl = cw_ast.CdefDecl([], extern)
+                mod = cw_ast.Module([cdef_decl])
+            if stats.active():
+                stats.count('cw_ast_nodes', cw_ast.count_nodes(mod), path)
+
+            yield ASTContainer(mod, container.extern_name + '.pxd',
+                               container.dependencies, container.header_file)
 
     def visit(self, node):
-        visitor_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, visitor_name, self.generic_visit)
-        res = visitor(node)
+        res = self._visitors[node.__class__](self, node)
         return res
 
     def generic_visit(self, node):
@@ -378,8 +432,8 @@ class CAstTransformer(object):
     # render nodes
     #--------------------------------------------------------------------------
     def visit_translate(self, node):
-        name = 'translate_' + node.__class__.__name__
-        res = getattr(self, name, lambda arg: None)(node)
+        translator = self._translators[node.__class__]
+        res = translator(self, node) if translator is not None else None
         if res is None:
             #print 'Unhandled node in translate: ', node
             pass
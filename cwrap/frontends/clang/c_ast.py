@@ -1,38 +1,97 @@
+from sys import intern
+
+
+def intern_name(name):
+    """ Returns the interned `name`. The same type, field and argument
+    names occur in many nodes, interning keeps one copy of each.
+
+    """
+    return intern(name) if isinstance(name, str) else name
+
+
+# maps node classes to the names of the slots which refer to child nodes
+_child_slots = {}
+
+
+def _child_slot_names(cls):
+    names = _child_slots.get(cls)
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            names.extend(name for name in klass.__dict__.get('__slots__', ())
+                         if name not in ('location', 'name', 'context'))
+        _child_slots[cls] = names
+    return names
+
+
+def count_nodes(items):
+    """ Returns the number of distinct nodes reachable from the nodes
+    `items`, not following the `context` of a node up to its parent.
+    Shared nodes, e.g. the types, are counted once.
+
+    """
+    seen = set()
+    stack = list(items)
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        for name in _child_slot_names(type(node)):
+            child = getattr(node, name, None)
+            if isinstance(child, C_ASTNode):
+                stack.append(child)
+            elif isinstance(child, list):
+                stack.extend(item for item in child
+                             if isinstance(item, C_ASTNode))
+    return len(seen)
+
+
 class C_ASTNode(object):
+    """ The base class of the c_ast nodes. Every node has a `name` and a
+    `location`, which the parser sets. The nodes have __slots__ and set
+    all their attributes in their constructor.
+
+    """
+    __slots__ = ('location', 'name')
 
-    def __init__(self, *args, **kwargs):
-        self.location = None
-        #self.render_hints = {}
-        self.name = ''
-        self.init(*args, **kwargs)
-       
-    def init(self, *args, **kwargs):
-        pass
-  
     
 class Typedef(C_ASTNode):
 
-    def init(self, name, typ, context):
-        self.name = name
+    __slots__ = ('typ', 'context')
+
+    def __init__(self, name, typ, context):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
 
 class FundamentalType(C_ASTNode):
 
-    def init(self, name):
-        self.name = name
+    __slots__ = ()
+
+    def __init__(self, name):
+        self.location = None
+        self.name = intern_name(name)
 
 class CvQualifiedType(C_ASTNode):
 
-    def init(self, typ, const, volatile):
+    __slots__ = ('typ', 'const', 'volatile')
+
+    def __init__(self, typ, const, volatile):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.const = const
         self.volatile = volatile
 
 class Ignored(C_ASTNode):
 
-    def init(self, name):
-        self.name = name
+    __slots__ = ('arguments',)
+
+    def __init__(self, name):
+        self.location = None
+        self.name = intern_name(name)
         self.arguments = []
 
     def fixup_argtypes(self, typemap):
@@ -48,8 +107,11 @@ class Ignored(C_ASTNode):
 
 class Field(C_ASTNode):
     
-    def init(self, name, typ, context, bits=None, offset=None):
-        self.name = name
+    __slots__ = ('typ', 'context')
+
+    def __init__(self, name, typ, context, bits=None, offset=None):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
         #self.bits = bits
@@ -58,8 +120,11 @@ class Field(C_ASTNode):
 
 class Struct(C_ASTNode):
     
-    def init(self, name, members = None, context = None):
-        self.name = name
+    __slots__ = ('members', 'context', 'typedef_name')
+
+    def __init__(self, name, members = None, context = None):
+        self.location = None
+        self.name = intern_name(name)
         self.members = members if members is not None else []
         self.context = context
 
@@ -76,8 +141,11 @@ class Struct(C_ASTNode):
 
 class Union(C_ASTNode):
     
-    def init(self, name, align = None, members = None, context = None, bases = None, size = None):
-        self.name = name
+    __slots__ = ('members', 'context', 'typedef_name')
+
+    def __init__(self, name, align = None, members = None, context = None, bases = None, size = None):
+        self.location = None
+        self.name = intern_name(name)
         #self.align = align
         self.members = members if members is not None else []
         self.context = context
@@ -96,15 +164,21 @@ class Union(C_ASTNode):
             
 class EnumValue(C_ASTNode):
 
-    def init(self, name, value):
-        self.name = name
+    __slots__ = ('value',)
+
+    def __init__(self, name, value):
+        self.location = None
+        self.name = intern_name(name)
         self.value = value
     
 
 class Enumeration(C_ASTNode):
     
-    def init(self, name, context):
-        self.name = name
+    __slots__ = ('context', 'values', 'typedef_name')
+
+    def __init__(self, name, context):
+        self.location = None
+        self.name = intern_name(name)
         self.context = context
         self.values = []
 
@@ -120,7 +194,11 @@ class Enumeration(C_ASTNode):
 
 class PointerType(C_ASTNode):
 
-    def init(self, typ, size, align):
+    __slots__ = ('typ', 'size', 'align')
+
+    def __init__(self, typ, size, align):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.size = size
         self.align = align
@@ -132,7 +210,11 @@ class PointerType(C_ASTNode):
 
 class ArrayType(C_ASTNode):
 
-    def init(self, typ, min, max):
+    __slots__ = ('typ', 'min', 'max')
+
+    def __init__(self, typ, min, max):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.min = min
         self.max = max
@@ -140,15 +222,21 @@ class ArrayType(C_ASTNode):
 
 class Argument(C_ASTNode):
 
-    def init(self, name, typ):
+    __slots__ = ('typ',)
+
+    def __init__(self, name, typ):
+        self.location = None
         self.typ = typ
-        self.name = name
+        self.name = intern_name(name)
 
 
 class Function(C_ASTNode):
 
-    def init(self, name, returns, context=None, attributes=None, extern=None):
-        self.name = name
+    __slots__ = ('returns', 'context', 'attributes', 'extern', 'arguments')
+
+    def __init__(self, name, returns, context=None, attributes=None, extern=None):
+        self.location = None
+        self.name = intern_name(name)
         self.returns = returns
         self.context = context
         self.attributes = attributes
@@ -168,7 +256,11 @@ class Function(C_ASTNode):
 
 class FunctionType(C_ASTNode):
 
-    def init(self, returns, attributes):
+    __slots__ = ('returns', 'attributes', 'arguments')
+
+    def __init__(self, returns, attributes):
+        self.location = None
+        self.name = ''
         self.returns = returns
         self.attributes = attributes
         self.arguments = []
@@ -185,8 +277,11 @@ class FunctionType(C_ASTNode):
 
 class OperatorFunction(C_ASTNode):
 
-    def init(self, name, returns, context, attributes, extern):
-        self.name = name
+    __slots__ = ('returns', 'context', 'attributes', 'extern', 'arguments')
+
+    def __init__(self, name, returns, context, attributes, extern):
+        self.location = None
+        self.name = intern_name(name)
         self.returns = returns
         self.context = context
         self.attributes = attributes
@@ -206,24 +301,33 @@ class OperatorFunction(C_ASTNode):
 
 class Macro(C_ASTNode):
 
-    def init(self, name, args, body):
-        self.name = name
+    __slots__ = ('args', 'body')
+
+    def __init__(self, name, args, body):
+        self.location = None
+        self.name = intern_name(name)
         self.args = args
         self.body = body
 
 
 class Alias(C_ASTNode):
 
-    def init(self, name, value, typ=None):
-        self.name = name
+    __slots__ = ('value', 'typ')
+
+    def __init__(self, name, value, typ=None):
+        self.location = None
+        self.name = intern_name(name)
         self.value = value
         self.typ = typ
     
 
 class File(C_ASTNode):
 
-    def init(self, name, members = None):
-        self.name = name
+    __slots__ = ('members',)
+
+    def __init__(self, name, members = None):
+        self.location = None
+        self.name = intern_name(name)
         self.members = members if members is not None else []
 
     def add_member(self, member):
@@ -236,8 +340,11 @@ class File(C_ASTNode):
 
 class Namespace(C_ASTNode):
 
-    def init(self, name, members = None):
-        self.name = name
+    __slots__ = ('members',)
+
+    def __init__(self, name, members = None):
+        self.location = None
+        self.name = intern_name(name)
         self.members = members if members is not None else []
         
     def add_member(self, member):
@@ -249,8 +356,11 @@ class Namespace(C_ASTNode):
 
 class Variable(C_ASTNode):
 
-    def init(self, name, typ, context, init):
-        self.name = name
+    __slots__ = ('typ', 'context', 'init')
+
+    def __init__(self, name, typ, context, init):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
         self.init = init
@@ -261,8 +371,11 @@ class Variable(C_ASTNode):
 
 class Class(C_ASTNode):
     
-    def init(self, name, members = None, context = None):
-        self.name = name
+    __slots__ = ('members', 'context')
+
+    def __init__(self, name, members = None, context = None):
+        self.location = None
+        self.name = intern_name(name)
         self.members = members if members is not None else []
         self.context = context
         
@@ -278,14 +391,20 @@ class Class(C_ASTNode):
         self.template_params.append(template_param)
 
 class ClassTemplate(Class):
-    
+
+    __slots__ = ()
+
     template_params = []
     def add_template_parameter(self, template_param):
         self.template_params.append(template_param)
 
 class RefType(C_ASTNode):
     #C++ reference type
-    def init(self, typ):
+    __slots__ = ('typ',)
+
+    def __init__(self, typ):
+        self.location = None
+        self.name = ''
         self.typ = typ
 
 
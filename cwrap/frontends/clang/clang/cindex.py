@@ -215,6 +215,17 @@ class SourceLocation(Structure):
         """Get the file offset represented by this source location."""
         return self._get_instantiation()[3]
 
+    @property
+    def is_in_system_header(self):
+        """Returns true if the given source location is in a system header."""
+        return conf.lib.clang_Location_isInSystemHeader(self)
+
+    @property
+    def is_from_main_file(self):
+        """Returns true if the given source location is in the main file of
+        the corresponding translation unit."""
+        return conf.lib.clang_Location_isFromMainFile(self)
+
     def __eq__(self, other):
         return conf.lib.clang_equalLocations(self, other)
 
@@ -499,12 +510,15 @@ class CursorKind(object):
     @property
     def name(self):
         """Get the enumeration name of this cursor kind."""
-        if self._name_map is None:
-            self._name_map = {}
+        # The map is shared by all kinds, an assignment to self would
+        # scan the class dict once per kind
+        if CursorKind._name_map is None:
+            name_map = {}
             for key,value in list(CursorKind.__dict__.items()):
                 if isinstance(value,CursorKind):
-                    self._name_map[value] = key
-        return self._name_map[self]
+                    name_map[value] = key
+            CursorKind._name_map = name_map
+        return CursorKind._name_map[self]
 
     @staticmethod
     def from_id(id):
@@ -1389,12 +1403,15 @@ class TypeKind(object):
     @property
     def name(self):
         """Get the enumeration name of this cursor kind."""
-        if self._name_map is None:
-            self._name_map = {}
+        # The map is shared by all kinds, an assignment to self would
+        # scan the class dict once per kind
+        if TypeKind._name_map is None:
+            name_map = {}
             for key,value in list(TypeKind.__dict__.items()):
                 if isinstance(value,TypeKind):
-                    self._name_map[value] = key
-        return self._name_map[self]
+                    name_map[value] = key
+            TypeKind._name_map = name_map
+        return TypeKind._name_map[self]
 
     @property
     def spelling(self):
@@ -2447,12 +2464,15 @@ class CommentKind(object):
     @property
     def name(self):
         """Get the enumeration name of this cursor kind."""
-        if self._name_map is None:
-            self._name_map = {}
+        # The map is shared by all kinds, an assignment to self would
+        # scan the class dict once per kind
+        if CommentKind._name_map is None:
+            name_map = {}
             for key,value in list(CommentKind.__dict__.items()):
                 if isinstance(value,CommentKind):
-                    self._name_map[value] = key
-        return self._name_map[self]
+                    name_map[value] = key
+            CommentKind._name_map = name_map
+        return CommentKind._name_map[self]
 
     @staticmethod
     def from_id(id):
@@ -3074,6 +3094,14 @@ functionList = [
    [Type],
    bool),
 
+  ("clang_Location_isFromMainFile",
+   [SourceLocation],
+   bool),
+
+  ("clang_Location_isInSystemHeader",
+   [SourceLocation],
+   bool),
+
   ("clang_parseTranslationUnit",
    [Index, c_char_p, c_void_p, c_int, c_void_p, c_int, c_int],
    c_object_p),
@@ -3179,6 +3207,25 @@ def register_functions(lib, ignore_errors):
 
     list(map(register, functionList))
 
+def wrap_functions(lib, wrapper):
+    """Replace the registered functions of a libclang library instance.
+
+    Every function of functionList is replaced by wrapper(name, function),
+    e.g. to count its calls. With a wrapper of None the registered functions
+    are restored. The functions are looked up on the library at every call,
+    so while they aren't wrapped calling them costs nothing extra.
+    """
+    originals = lib.__dict__.setdefault('_registered_functions', {})
+    for item in functionList:
+        name = item[0]
+        func = originals.get(name)
+        if func is None:
+            try:
+                func = originals[name] = getattr(lib, name)
+            except AttributeError:
+                continue
+        setattr(lib, name, func if wrapper is None else wrapper(name, func))
+
 class Config:
     library_path = None
     library_file = None
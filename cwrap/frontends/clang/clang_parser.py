@@ -11,25 +11,77 @@ import os
 import sys
 import re
 
+from ... import dispatch
+from ... import stats
+from ... import trace
 from . import c_ast
+from .diagnostics import DiagnosticSet
+from .cursor_table import CursorTable
 
 from . import clang
 from .clang.cindex import CursorKind, TypeKind
 
 
+tracer = trace.get_tracer('parser')
+type_tracer = trace.get_tracer('types')
+
+
 # A function show(level, *args) would have been simpler but less fun
 # and you'd need a separate parameter for the AST walkers if you want
 # it to be exchangeable.
 class Level(int):
     '''represent currently visited level of a tree'''
-    def show(self, *args):
-        '''pretty print an indented line'''
-        print('\t'*self + ' '.join(map(str, args)))
+    def show(self, tracer, *args):
+        '''trace an indented debug line, callers check tracer.debug first'''
+        tracer.write(trace.DEBUG, *args, indent=self)
     def __add__(self, inc):
         '''increase level'''
         return Level(super(Level, self).__add__(inc))
 
 
+def kind_name(kind_id):
+    """ The handler name suffix of a cursor kind id, None for kinds
+    unknown to the bindings.
+
+    """
+    try:
+        return CursorKind.from_id(kind_id).name
+    except ValueError:
+        return None
+
+
+# The libclang index shared by all parses in this process, see get_index()
+_index = None
+
+
+def get_index():
+    """ Returns the libclang Index of this process, loading libclang
+    and creating the index on first use. Reusing the index avoids paying
+    for its setup once per parsed header.
+
+    """
+    global _index
+    if _index is None:
+        _index = clang.cindex.Index.create()
+    return _index
+
+
+# The options all translation units are parsed with
+PARSE_OPTIONS = clang.cindex.TranslationUnit.PARSE_INCOMPLETE + \
+    clang.cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD + \
+    clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+
+
+def clang_args(include_dirs, language):
+    """ Returns the clang arguments for the `include_dirs` and the
+    `language`.
+
+    """
+    args_include_dirs = ['-I'+d for d in include_dirs]
+    args_language = ['-x'+language if language else '']
+    return args_include_dirs + args_language
+
+
 def MAKE_NAME(name):
     """ Converts a mangled C++ name to a valid python identifier.
 
@@ -71,7 +123,42 @@ class ClangParser(object):
     #                       'OperatorFunction', 'Method', 'Constructor',
     #                       'Destructor', 'OperatorMethod'])
 
-    def __init__(self, *args):
+    def __init__(self, scope=None, diagnostics=None, store=None):
+        # `diagnostics` collects the diagnostics of the parsed
+        # translation units, see diagnostics.DiagnosticSet
+        if diagnostics is None:
+            diagnostics = DiagnosticSet()
+        self.diagnostics = diagnostics
+
+        # `visitors` maps cursor kind ids to the visit_* method of the
+        # kind, see dispatch.DispatchTable
+        cls = type(self)
+        self.visitors = dispatch.get_table(cls, 'visit_',
+                                           cls.unhandled_element, kind_name)
+
+        # `scope` (see scope.HeaderScope) selects the toplevel
+        # declarations which are visited, None visits all of them
+        self.scope = scope
+
+        # `store` (see decl_store.DeclarationStore) shares the nodes of
+        # toplevel declarations with the parsers of other headers
+        self.store = store
+
+        # `table` holds all cursors of the parsed translation unit,
+        # see cursor_table.CursorTable
+        self.table = None
+
+        # `prelude_files` are the files included by the precompiled
+        # prelude, see get_dependencies()
+        self.prelude_files = []
+
+        # `type_cache` maps the identity of a libclang type to the
+        # result of type_to_c_ast_type, `type_nodes` maps the contents
+        # of c_ast type nodes to their shared instance. The type nodes
+        # are shared, so they must never be modified.
+        self.type_cache = {}
+        self.type_nodes = {}
+
         # `context` acts like stack where parent nodes are pushed
         # before visiting children
         self.context = []
@@ -98,46 +185,85 @@ class ClangParser(object):
     #--------------------------------------------------------------------------
     # Parsing entry points
     #--------------------------------------------------------------------------
-    def parse(self, cfile, include_dirs, language, unsaved_files=None):
+    def parse(self, cfile, include_dirs, language, unsaved_files=None,
+              tu_cache=None, prelude=None):
         """ Parsing entry point. `cfile` is a filename or a file
-        object.
+        object. If a `tu_cache` (see tu_cache.TUCache) is given, an up
+        to date translation unit is loaded from it instead of parsing
+        the file again. If a `prelude` (see pch.Prelude) is given, its
+        precompiled header is included before the file.
 
         """
-        args_include_dirs = ['-I'+d for d in include_dirs]
-        args_language = ['-x'+language if language else '']
-                
-        index = clang.cindex.Index.create()
-        tu = index.parse(cfile,
-                         args = args_include_dirs + args_language, 
-                         #args = ['-I/usr/include/c++/4.2.1',],
-                         options = clang.cindex.TranslationUnit.PARSE_INCOMPLETE + \
-                             clang.cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD + \
-                             clang.cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES,
-                         unsaved_files = unsaved_files
-                         )
-
-        for d in tu.diagnostics:
-            self.print_diag_info(d)
-        
-        #UGLY: first element is TRANSLATION_UNIT, parse children
-        ast = self.parse_element(tu.cursor) 
+        args = clang_args(include_dirs, language)
+        options = PARSE_OPTIONS
+
+        index = get_index()
+        with stats.phase('parse', cfile):
+            if prelude is not None:
+                pch_args = prelude.args(index, args, options,
+                                        self.diagnostics)
+                self.prelude_files = prelude.dependencies(args)
+                args = args + pch_args
+
+            tu = None
+            if tu_cache is not None:
+                tu = tu_cache.load(index, cfile, args, unsaved_files)
+                stats.count('tu_cache_hits' if tu is not None
+                            else 'tu_cache_misses', 1, cfile)
+
+            if tu is None:
+                tu = index.parse(cfile,
+                                 args = args,
+                                 #args = ['-I/usr/include/c++/4.2.1',],
+                                 options = options,
+                                 unsaved_files = unsaved_files
+                                 )
+                if tu_cache is not None:
+                    tu_cache.store(tu, cfile, args, unsaved_files)
+
+        return self.parse_tu(tu)
+
+    def parse_tu(self, tu):
+        """ Parses the already created TranslationUnit `tu`.
+
+        """
+        self.diagnostics.add_tu(tu)
+        path = tu.spelling
+
+        with stats.phase('walk', path):
+            # Extract all cursors in one traversal, parse_element then
+            # reads them from the table instead of querying libclang per
+            # cursor
+            parent_kinds = set(kind.value for kind in self.parent_kinds)
+            skipped_kinds = set(kind.value for kind in self.skipped_kinds)
+            self.table = CursorTable(tu, self.scope, parent_kinds,
+                                     skipped_kinds, self.store)
+
+            #UGLY: first element is TRANSLATION_UNIT, parse children
+            ast = self.parse_element(self.table.cursors[0])
+        stats.count('cursors', len(self.table.cursors), path)
         #for c in tu.cursor.get_children():
         #    self.parse_element(c)
         return ast
 
 
-    def print_diag_info(self, diag):
-        print('category name:', diag.category_name)
-        print('location:', diag.location.file, diag.location.line, ':', diag.location.column)
-        print('severity:', diag.severity)
-        print('spelling:', diag.spelling)
-        #print 'ranges:', list(diag.ranges)
-        #print 'fixits', list(diag.fixits)
-        print('fixits', ['%d:%d-%d:%d %s'%(f.range.start.line, f.range.start.column, 
-                                           f.range.end.line, f.range.end.column,
-                                           f.value) for f in diag.fixits])
-        print()
 
+    def get_dependencies(self):
+        """ Returns the list of files the parsed translation unit depends
+        on: the main file, the files it includes and the files of the
+        precompiled prelude.
+
+        """
+        tu = self.table.tu
+        files = [tu.spelling]
+        for inclusion in tu.get_includes():
+            name = inclusion.include.name
+            if name not in files:
+                files.append(name)
+        for name in self.prelude_files:
+            if name not in files:
+                files.append(name)
+        return files
 
     simple_types = {TypeKind.VOID: 'void',
                     TypeKind.BOOL: 'bint',
@@ -163,39 +289,77 @@ class ClangParser(object):
                     TypeKind.LONGDOUBLE: 'long double',
                     }
 
+    def shared_type(self, node_class, *args):
+        """ Returns the shared instance of the c_ast type node
+        `node_class(*args)`. Child nodes are compared by identity, which
+        is enough as they are shared as well.
+
+        """
+        key = (node_class,) + tuple(id(arg) if isinstance(arg, c_ast.C_ASTNode)
+                                    else arg for arg in args)
+        node = self.type_nodes.get(key)
+        if node is None:
+            node = self.type_nodes[key] = node_class(*args)
+        return node
+
     def type_to_c_ast_type(self, t, level, recurse = True):
         #convert clang type to c_ast type, return c_ast and hash value for corresponding cursor (or None)
-        level.show( 'in type to c_ast:', 'kind:', t.kind, repr(t.get_declaration().spelling))
+
+        # libclang types are uniqued per translation unit, the first data
+        # pointer identifies the type including its qualifiers. Unexposed
+        # types are resolved differently depending on `recurse` and
+        # unknown ones may become known later, so they aren't cached.
+        key = (t._kind_id, t.data[0])
+        result = self.type_cache.get(key)
+        if result is not None:
+            return result
+        result = self.convert_type(t, level, recurse)
+        if result is not None and result[0] is not None and \
+                t.kind is not TypeKind.UNEXPOSED and \
+                getattr(result[0], 'name', None) != 'unknown_type':
+            self.type_cache[key] = result
+        return result
+
+    def convert_type(self, t, level, recurse):
+        if type_tracer.debug:
+            level.show(type_tracer, 'in type to c_ast:', 'kind:', t.kind, repr(t.get_declaration().spelling))
 
         kind = t.kind
         if kind in self.simple_types:
             const = t.is_const_qualified()
             volatile = t.is_volatile_qualified()
-            fundtype = c_ast.FundamentalType(self.simple_types[kind])
-            return c_ast.CvQualifiedType(fundtype, const, volatile), None
+            fundtype = self.shared_type(c_ast.FundamentalType,
+                                        self.simple_types[kind])
+            return self.shared_type(c_ast.CvQualifiedType, fundtype, const,
+                                    volatile), None
 
         elif kind is TypeKind.CONSTANTARRAY:
             a, foo = self.type_to_c_ast_type(t.element_type, level+1)
-            return c_ast.ArrayType(a, 0, t.element_count-1), None
+            return self.shared_type(c_ast.ArrayType, a, 0,
+                                    t.element_count-1), None
 
         elif kind is TypeKind.TYPEDEF:
             const = t.is_const_qualified()
             volatile = t.is_volatile_qualified()
-            fundtype = c_ast.FundamentalType(t.get_declaration().spelling)
-            return c_ast.CvQualifiedType(fundtype, const, volatile), None
+            fundtype = self.shared_type(c_ast.FundamentalType,
+                                        t.get_declaration().spelling)
+            return self.shared_type(c_ast.CvQualifiedType, fundtype, const,
+                                    volatile), None
 
         elif kind is TypeKind.POINTER:
             const = t.is_const_qualified()
             volatile = t.is_volatile_qualified()
             ptrtype, foo = self.type_to_c_ast_type(t.get_pointee(), level+1)
             if ptrtype is not None:
-                ptrtype = c_ast.PointerType(ptrtype, None, None)
-                return c_ast.CvQualifiedType(ptrtype, const, volatile), None
+                ptrtype = self.shared_type(c_ast.PointerType, ptrtype, None,
+                                           None)
+                return self.shared_type(c_ast.CvQualifiedType, ptrtype,
+                                        const, volatile), None
 
         elif kind is TypeKind.LVALUEREFERENCE:
             reftype, foo = self.type_to_c_ast_type(t.get_pointee(), level+1)
             if reftype is not None:
-                return c_ast.RefType(reftype), None
+                return self.shared_type(c_ast.RefType, reftype), None
 
         elif kind is TypeKind.ENUM:
             #see if declaration already parsed
@@ -203,16 +367,19 @@ class ClangParser(object):
             if typ is not None:
                 return typ, t.get_declaration().hash
             else:
-                level.show('enum declaration not yet parsed')
+                if type_tracer.debug:
+                    level.show(type_tracer, 'enum declaration not yet parsed')
                 typ = self.parse_element(t.get_declaration(), level) #TODO ????
                 return typ, t.get_declaration().hash
 
         elif kind is TypeKind.FUNCTIONPROTO:
-            level.show('return type:')
+            if type_tracer.debug:
+                level.show(type_tracer, 'return type:')
             returntype, id_ = self.type_to_c_ast_type(t.get_result(), level+1)
             #TODO: very similar to visit_FUNCTION_DECL
             functype = c_ast.FunctionType(returntype, None)
-            level.show('argument types:')
+            if type_tracer.debug:
+                level.show(type_tracer, 'argument types:')
             for arg in t.argument_types():
                 #TODO: argument name?
                 functype.add_argument(c_ast.Argument('', self.type_to_c_ast_type(arg, level+1)[0]))
@@ -222,7 +389,8 @@ class ClangParser(object):
             return self.type_to_c_ast_type(t.get_canonical(), level+1, recurse = False)
         
         else:
-            level.show('do not know to handle type kind, search for declaration')
+            if type_tracer.debug:
+                level.show(type_tracer, 'do not know to handle type kind, search for declaration')
             typ = self.all.get(t.get_declaration().hash)
 
             #print 'in type_to_c_ast_type:'
@@ -232,7 +400,8 @@ class ClangParser(object):
             if typ is not None:
                 return typ, t.get_declaration().hash
             else:
-                level.show("can't find declaration for type, parse type declaration", kind, t.get_declaration().kind)
+                if type_tracer.debug:
+                    level.show(type_tracer, "can't find declaration for type, parse type declaration", kind, t.get_declaration().kind)
                 #print
                 typ = self.parse_element(t.get_declaration(), level+1)
                 if typ is not None:
@@ -242,68 +411,110 @@ class ClangParser(object):
                     if kind is TypeKind.UNEXPOSED:
                         return c_ast.FundamentalType('unexposed_type'), None
 
-                    level.show('give up, unknown_type')
+                    if type_tracer.debug:
+                        level.show(type_tracer, 'give up, unknown_type')
                     return c_ast.FundamentalType('unknown_type'), None #TODO: fixme
                 
         
 
+    # Cursor kinds whose children are parsed by parse_element
+    parent_kinds = [
+        #CursorKind.MACRO_DEFINITION,
+        CursorKind.TRANSLATION_UNIT,
+        CursorKind.NAMESPACE,
+        CursorKind.ENUM_DECL,
+        CursorKind.STRUCT_DECL,
+        CursorKind.UNION_DECL,
+        CursorKind.CLASS_DECL,
+        CursorKind.CLASS_TEMPLATE,
+        CursorKind.FUNCTION_TEMPLATE,
+        CursorKind.FIELD_DECL,
+        CursorKind.PARM_DECL,
+        CursorKind.CONSTRUCTOR,
+        CursorKind.CXX_METHOD,
+        # Functions handle their children (arguments) themselves and
+        # not using the standard way of parsing. This make sense as
+        # it can quite complex for function pointers (where some
+        # arguments belong to the function declaration, some to the
+        # function prototype).
+        #CursorKind.FUNCTION_DECL,
+        ]
+
+    # Cursor kinds which are never handled, they aren't even extracted
+    # into the cursor table
+    skipped_kinds = [
+        CursorKind.PREPROCESSING_DIRECTIVE,
+        CursorKind.MACRO_DEFINITION,
+        CursorKind.MACRO_INSTANTIATION,
+        CursorKind.INCLUSION_DIRECTIVE,
+        ]
+
+    def get_location(self, cursor):
+        """ Returns the (filename, line) tuple of `cursor` or None if it
+        has no file, e.g. for builtin declarations.
+
+        """
+        row = getattr(cursor, '_row', None)
+        if row is not None:
+            return self.table.location(row)
+        location = cursor.location
+        if location.file is None:
+            return None
+        return location.file.name, location.line
+
+    def get_children(self, cursor):
+        """ Returns the children of `cursor`, from the cursor table if
+        the cursor is part of it.
+
+        """
+        row = getattr(cursor, '_row', None)
+        if row is not None:
+            return self.table.children(row)
+        return cursor.get_children()
+
     def parse_element(self, cursor, level = Level()):
         
         #level.show('file:', repr(cursor.location.file))
         # ignore builtin nodes
-        if cursor.location.file is None and cursor.kind is not CursorKind.TRANSLATION_UNIT:
+        location = self.get_location(cursor)
+        if location is None and cursor.kind is not CursorKind.TRANSLATION_UNIT:
             return
 
+        # A toplevel declaration already parsed in another translation
+        # unit is taken from the store, without visiting it again
+        # (the cursor table sets the key of toplevel declarations)
+        store_key = getattr(cursor, '_store_key', None)
+        if store_key is not None:
+            result = self.store.get(store_key)
+            if result is not None:
+                self.register(cursor, result)
+                return result
+
         # Find and call visitor
-        mth = getattr(self, 'visit_' + cursor.kind.name, None)
-        if mth is not None:
-            result = mth(cursor, level)
-        else:
-            result = self.unhandled_element(cursor, level)
+        result = self.visitors[cursor._kind_id](self, cursor, level)
         
         # Record the result and register the the id, which is
         # used in the _fixup_* methods. Some elements don't have
         # an id, so we create our own.
         if result is not None:
-            location = cursor.location
-            if location.file is not None:
-                result.location = (location.file.name, location.line)
-
-            self.all[cursor.hash] = result
+            if location is not None:
+                result.location = location
+            self.register(cursor, result)
 
         #debug output
-        if result is not None:
-            level.show('cursor:', cursor.kind, str(cursor.type.kind))
-            level.show('name:', repr(result.name))
-            print()
+        if result is not None and tracer.debug:
+            level.show(tracer, 'cursor:', cursor.kind, str(cursor.type.kind))
+            level.show(tracer, 'name:', repr(result.name))
         
 
         # if this element has subelements, push it onto the context
         # since the next elements will be it's children.
-        if cursor.kind in [
-            #CursorKind.MACRO_DEFINITION,
-            CursorKind.TRANSLATION_UNIT,
-            CursorKind.NAMESPACE,
-            CursorKind.ENUM_DECL,
-            CursorKind.STRUCT_DECL,
-            CursorKind.UNION_DECL,
-            CursorKind.CLASS_DECL,
-            CursorKind.CLASS_TEMPLATE,
-            CursorKind.FUNCTION_TEMPLATE,
-            CursorKind.FIELD_DECL,
-            CursorKind.PARM_DECL,
-            CursorKind.CONSTRUCTOR,
-            CursorKind.CXX_METHOD,
-            # Functions handle their children (arguments) themselves and
-            # not using the standard way of parsing. This make sense as
-            # it can quite complex for function pointers (where some
-            # arguments belong to the function declaration, some to the
-            # function prototype).
-            #CursorKind.FUNCTION_DECL,
-                           ]:
+        if cursor.kind in self.parent_kinds:
             self.context.append(result)
 
-            for c in cursor.get_children():
+            # Toplevel declarations out of scope aren't part of the
+            # cursor table, so they are skipped with all their children
+            for c in self.get_children(cursor):
                 child = self.parse_element(c, level+1)
                 if child is not None and hasattr(result, 'add_child'):
                     result.add_child(child)
@@ -313,7 +524,9 @@ class ClangParser(object):
             self.context.pop()
 
         self.cdata = None
-        
+
+        if store_key is not None and result is not None:
+            self.store.add(store_key, result)
         
         #level.show('parse_element result', result)
         #if result is not None:
@@ -323,7 +536,17 @@ class ClangParser(object):
         return result
 
 
-    
+    def register(self, cursor, node):
+        """ Registers `node` as the result of `cursor` in `all`.
+
+        """
+        # A declaration parsed again replaces the node cached
+        # types may refer to
+        previous = self.all.get(cursor.hash)
+        if previous is not None and previous is not node:
+            self.type_cache.clear()
+        self.all[cursor.hash] = node
+
     def unhandled_element(self, cursor, level):
         """ Handler for element nodes where a real handler is not
          found.
@@ -336,7 +559,8 @@ class ClangParser(object):
             return
 
         #print 'Unhandled element `%s`.' % cursor.displayname
-        level.show('unhandled element', repr(cursor.spelling), repr(cursor.displayname), cursor.kind)
+        if tracer.debug:
+            level.show(tracer, 'unhandled element', repr(cursor.spelling), repr(cursor.displayname), cursor.kind)
         #print
 
     #--------------------------------------------------------------------------
@@ -419,7 +643,8 @@ class ClangParser(object):
     def visit_TYPEDEF_DECL(self, cursor, level):
         c_ast_type, id_ = self.type_to_c_ast_type(cursor.underlying_typedef_type, level)
         if c_ast_type is not None:
-            level.show('in visit_TYPEDEF_DECL, c_ast_type =', c_ast_type.__class__.__name__, 'name =', repr(c_ast_type.name))
+            if tracer.debug:
+                level.show(tracer, 'in visit_TYPEDEF_DECL, c_ast_type =', c_ast_type.__class__.__name__, 'name =', repr(c_ast_type.name))
             
             #special handling of typedef enum, struct, union
             if type(c_ast_type) in (c_ast.Enumeration, c_ast.Union, c_ast.Struct):
@@ -432,13 +657,16 @@ class ClangParser(object):
 
                 if not c_ast_type.name: 
                     #unnamed record -> remove declaration from self.all 
-                    level.show('remove declaration', c_ast_type, self.all[id_])
+                    if tracer.debug:
+                        level.show(tracer, 'remove declaration', c_ast_type, self.all[id_])
                     try:
                         idx = c_ast_type.context.members.index(c_ast_type)
-                        level.show('remove from parent, idx', idx)
+                        if tracer.debug:
+                            level.show(tracer, 'remove from parent, idx', idx)
                         c_ast_type.context.members.pop(idx)
                     except ValueError:
-                        level.show("not contained in parent", c_ast_type)
+                        if tracer.debug:
+                            level.show(tracer, "not contained in parent", c_ast_type)
 
                 elif c_ast_type.name == cursor.spelling:
                     #enum tagname == typename: no typedef, do nothing
@@ -459,7 +687,7 @@ class ClangParser(object):
         # If a field has struct as a child, use the field name as the
         # structs name (in case it hasn't one). This way anonymous structs
         # and unions get a proper mangled name for Cython.
-        children = list(cursor.get_children())
+        children = list(self.get_children(cursor))
         if len(children) == 1 and children[0].kind in \
                 [CursorKind.STRUCT_DECL, CursorKind.UNION_DECL]:
             node = self.all[children[0].hash]
@@ -485,7 +713,8 @@ class ClangParser(object):
         returntype, id_ = self.type_to_c_ast_type(cursor.type.get_result(), level)
         func = c_ast.Function(name, returntype)
         for arg in cursor.get_arguments():
-            level.show('function argument', arg.kind, arg.spelling)
+            if tracer.debug:
+                level.show(tracer, 'function argument', arg.kind, arg.spelling)
             func.add_argument(c_ast.Argument(arg.spelling, self.type_to_c_ast_type(arg.type, level+1)[0]))
         return func
 
@@ -515,20 +744,34 @@ class ClangParser(object):
         #parent.add_argument(arg)
         return arg
         
+    def repaired_type(self, typ, name):
+        #return copy of type with the fundamental type renamed, the type
+        #nodes are shared and must not be modified
+        if isinstance(typ, c_ast.FundamentalType):
+            return c_ast.FundamentalType(name)
+        elif isinstance(typ, c_ast.PointerType):
+            return c_ast.PointerType(self.repaired_type(typ.typ, name),
+                                     typ.size, typ.align)
+        elif isinstance(typ, c_ast.ArrayType):
+            return c_ast.ArrayType(self.repaired_type(typ.typ, name),
+                                   typ.min, typ.max)
+        elif isinstance(typ, c_ast.RefType):
+            return c_ast.RefType(self.repaired_type(typ.typ, name))
+        return typ
+
     def repair_type(self, obj, name):
         #repair type of c_ast object
-        if isinstance(obj, c_ast.FundamentalType):
-            obj.name = name
-        elif isinstance(obj, (c_ast.Field, c_ast.PointerType, c_ast.ArrayType, c_ast.RefType, c_ast.Argument)):
-            self.repair_type(obj.typ, name)
+        if isinstance(obj, (c_ast.Field, c_ast.Argument)):
+            obj.typ = self.repaired_type(obj.typ, name)
         elif isinstance(obj, (c_ast.Function, c_ast.FunctionType, c_ast.OperatorFunction)):
-            self.repair_type(obj.returns, name)
+            obj.returns = self.repaired_type(obj.returns, name)
 
     def visit_TYPE_REF(self, cursor, level):
         typ, id = self.type_to_c_ast_type(cursor.type, level)
         parent = self.context[-1]
         if parent is not None:
-            level.show('TYPE REF', repr(cursor.displayname), 'parent: %s, type: %s'%(parent, cursor.type.kind))
+            if tracer.debug:
+                level.show(tracer, 'TYPE REF', repr(cursor.displayname), 'parent: %s, type: %s'%(parent, cursor.type.kind))
 
             if cursor.type.kind is TypeKind.UNEXPOSED:
                 #fix type of parent
@@ -541,7 +784,8 @@ class ClangParser(object):
         if hasattr(parent, 'add_template_parameter'):
             parent.add_template_parameter(param)
         else:
-            level.show('TEMPLATE_TYPE_PARAMETER: unknown parent', parent)
+            if tracer.debug:
+                level.show(tracer, 'TEMPLATE_TYPE_PARAMETER: unknown parent', parent)
 
     def visit_Namespace(self, attrs):
         name = attrs['name']
@@ -883,23 +1127,45 @@ class ClangParser(object):
 
 # `cfile` can be a 2-tuple with a virtual file name and the file contents.
 # The contents can either be a string or a file-like object (with a read()
-# method).
-def parse(cfile, include_dirs, language):
-    parser = ClangParser()
+# method). If a `dependencies` list is given, the files the translation
+# unit depends on are appended to it (see ClangParser.get_dependencies).
+# A `store` (see decl_store.DeclarationStore) shares the toplevel
+# declarations with other calls.
+def parse(cfile, include_dirs, language, tu_cache=None, prelude=None,
+          scope=None, diagnostics=None, dependencies=None, store=None):
+    parser = ClangParser(scope, diagnostics, store)
     if isinstance(cfile, list):
-        parser.parse(cfile[0][0], include_dirs, language, unsaved_files=cfile)
+        parser.parse(cfile[0][0], include_dirs, language, unsaved_files=cfile,
+                     tu_cache=tu_cache, prelude=prelude)
     else:
-        parser.parse(cfile, include_dirs, language)
+        parser.parse(cfile, include_dirs, language, tu_cache=tu_cache,
+                     prelude=prelude)
+    return _get_items(parser, dependencies)
+
+
+def parse_tu(tu, scope=None, diagnostics=None, dependencies=None):
+    """ Like parse, but for the already created TranslationUnit `tu`.
+
+    """
+    parser = ClangParser(scope, diagnostics)
+    parser.parse_tu(tu)
+    return _get_items(parser, dependencies)
+
+
+def _get_items(parser, dependencies):
+    if dependencies is not None:
+        dependencies.extend(parser.get_dependencies())
 
-    print('all:')
-    for a in parser.all:
-        print(hex(a), parser.all[a].name)
-    print()
+    if tracer.debug:
+        tracer.write(trace.DEBUG, 'all:')
+        for a in parser.all:
+            tracer.write(trace.DEBUG, hex(a), parser.all[a].name)
 
     items = parser.get_result()
 
-    print('in clang_parser.py/parse(), items:')
-    for i in items:
-        print("%20s: %s"%(i.__class__.__name__, i.name))
+    if tracer.debug:
+        tracer.write(trace.DEBUG, 'in clang_parser.py/parse(), items:')
+        for i in items:
+            tracer.write(trace.DEBUG, "%20s: %s"%(i.__class__.__name__, i.name))
 
     return items
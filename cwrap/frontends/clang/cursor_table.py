@@ -0,0 +1,213 @@
+# Stdlib imports
+from array import array
+from ctypes import byref, cast, c_uint, c_void_p
+
+# Local package imports
+from .clang.cindex import conf, callbacks, c_object_p, File
+
+
+# Return values of the clang_visitChildren callback
+CONTINUE = 1
+RECURSE = 2
+
+
+class CursorTable(object):
+    """ All cursors of a translation unit, extracted in a single
+    recursive clang_visitChildren traversal.
+
+    The cursors are stored in depth first order, row 0 is the translation
+    unit cursor itself. Per row the table keeps the columns
+
+        kinds       the cursor kind id
+        parents     the row of the parent cursor (-1 for row 0)
+        ends        the row after the last descendant of the cursor
+        hashes      the result of clang_hashCursor
+        files       the file id, 0 for cursors without a file
+        lines       the line of the cursor location
+        spellings   the spelling id, -1 for cursors which aren't
+                    declarations
+        type_kinds  the type kind id of the cursor type
+
+    File ids index `file_names`, spelling ids index `strings`. The Cursor
+    objects in `cursors` have their `_row` set and the caches of their
+    `hash`, `location`, `spelling` and `type` properties filled in, so
+    using them doesn't call into libclang again.
+
+    If a `scope` (see scope.HeaderScope) is given, toplevel cursors out
+    of scope are not recorded and their children aren't visited at all.
+    If a set of `parent_kinds` ids is given, only the children of cursors
+    of these kinds are recorded. Cursors of the `skipped_kinds` ids aren't
+    recorded at all.
+
+    If a `store` (see decl_store.DeclarationStore) is given, toplevel
+    declarations get their store key as `_store_key`. The children of
+    those already in the store aren't visited, their nodes are reused.
+
+    """
+    def __init__(self, tu, scope=None, parent_kinds=None, skipped_kinds=(),
+                 store=None):
+        self.tu = tu
+        self.scope = scope
+        self.store = store
+        self.parent_kinds = parent_kinds
+        self.skipped_kinds = skipped_kinds
+
+        self.cursors = []
+        self.kinds = array('i')
+        self.parents = array('i')
+        self.ends = array('i')
+        self.hashes = array('I')
+        self.files = array('i')
+        self.lines = array('I')
+        self.spellings = array('i')
+        self.type_kinds = array('i')
+
+        self.file_names = [None]
+        self._file_objects = [None]
+        self._file_ids = {}
+        self.strings = []
+        self._string_ids = {}
+        # maps cursor kind ids to whether they are declarations
+        self._declaration_kinds = {}
+
+        self._extract()
+
+    def __len__(self):
+        return len(self.cursors)
+
+    def _add(self, cursor, parent):
+        """ Appends a row for `cursor` and returns its index.
+
+        """
+        lib = conf.lib
+        row = len(self.cursors)
+        cursor._tu = self.tu
+        cursor._row = row
+        cursor._hash = lib.clang_hashCursor(cursor)
+
+        location = lib.clang_getCursorLocation(cursor)
+        f, line, column, offset = c_object_p(), c_uint(), c_uint(), c_uint()
+        lib.clang_getInstantiationLocation(location, byref(f), byref(line),
+                                           byref(column), byref(offset))
+        if f:
+            address = cast(f, c_void_p).value
+            file_id = self._file_ids.get(address)
+            if file_id is None:
+                file_id = len(self.file_names)
+                self._file_ids[address] = file_id
+                self._file_objects.append(File(f))
+                self.file_names.append(self._file_objects[-1].name)
+            f = self._file_objects[file_id]
+        else:
+            file_id = 0
+            f = None
+        location._data = (f, line.value, column.value, offset.value)
+        cursor._loc = location
+
+        kind_id = cursor._kind_id
+        is_declaration = self._declaration_kinds.get(kind_id)
+        if is_declaration is None:
+            try:
+                is_declaration = cursor.kind.is_declaration()
+            except ValueError:
+                # a cursor kind unknown to the bindings
+                is_declaration = False
+            self._declaration_kinds[kind_id] = is_declaration
+        if is_declaration:
+            spelling = cursor._spelling = lib.clang_getCursorSpelling(cursor)
+            spelling_id = self._string_ids.get(spelling)
+            if spelling_id is None:
+                spelling_id = len(self.strings)
+                self._string_ids[spelling] = spelling_id
+                self.strings.append(spelling)
+        else:
+            spelling_id = -1
+            cursor._spelling = None
+
+        cursor._type = lib.clang_getCursorType(cursor)
+
+        self.cursors.append(cursor)
+        self.kinds.append(kind_id)
+        self.parents.append(parent)
+        self.ends.append(row + 1)
+        self.hashes.append(cursor._hash)
+        self.files.append(file_id)
+        self.lines.append(line.value)
+        self.spellings.append(spelling_id)
+        self.type_kinds.append(cursor._type._kind_id)
+        return row
+
+    def _extract(self):
+        root = self.tu.cursor
+        self._add(root, -1)
+
+        # The stack holds the raw bytes and the rows of the ancestors of
+        # the next cursor. The parent passed to the callback is always
+        # one of them, so the bytes are enough to find its row.
+        stack = [(bytes(root), 0)]
+        ends = self.ends
+        scope = self.scope
+        store = self.store
+        parent_kinds = self.parent_kinds
+        skipped_kinds = self.skipped_kinds
+
+        def visitor(child, parent, data):
+            if child._kind_id in skipped_kinds:
+                return CONTINUE
+            key = bytes(parent)
+            while stack[-1][0] != key:
+                ends[stack.pop()[1]] = len(self.cursors)
+            parent_row = stack[-1][1]
+            row = self._add(child, parent_row)
+            if parent_row == 0:
+                if scope is not None and not scope.contains(child):
+                    self._pop(row)
+                    return CONTINUE
+                if store is not None and child._kind_id in store.kinds:
+                    key = child._store_key = store.key(child)
+                    if key is not None and key in store.nodes:
+                        return CONTINUE
+            if parent_kinds is not None and \
+                    child._kind_id not in parent_kinds:
+                return CONTINUE
+            stack.append((bytes(child), row))
+            return RECURSE
+
+        conf.lib.clang_visitChildren(root, callbacks['cursor_visit'](visitor),
+                                     None)
+        while stack:
+            ends[stack.pop()[1]] = len(self.cursors)
+
+    def _pop(self, row):
+        """ Removes the last row again.
+
+        """
+        del self.cursors[row]
+        for column in (self.kinds, self.parents, self.ends, self.hashes,
+                       self.files, self.lines, self.spellings,
+                       self.type_kinds):
+            column.pop()
+
+    def children(self, row):
+        """ Returns the list of the child cursors of `row`.
+
+        """
+        cursors = self.cursors
+        ends = self.ends
+        children = []
+        end = ends[row]
+        row += 1
+        while row < end:
+            children.append(cursors[row])
+            row = ends[row]
+        return children
+
+    def location(self, row):
+        """ Returns the (filename, line) tuple of the cursor at `row` or
+        None if it has no file.
+
+        """
+        file_id = self.files[row]
+        if file_id == 0:
+            return None
+        return self.file_names[file_id], self.lines[row]
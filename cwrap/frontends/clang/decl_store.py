@@ -0,0 +1,90 @@
+# Local package imports
+from . import c_ast
+from .clang.cindex import CursorKind
+
+
+class DeclarationStore(object):
+    """ The c_ast nodes of the toplevel declarations of all headers
+    parsed in a run, shared between their translation units.
+
+    Headers which include the same files see the same declarations. The
+    parser of the first header converts such a declaration and adds its
+    node to the store, the parsers of the following headers find it by
+    the USR and the location of the cursor and reuse the node, without
+    visiting the cursor and its children again.
+
+    The location is part of the key, so a declaration repeated somewhere
+    else isn't mistaken for the stored one. Like a precompiled header,
+    the store assumes that a header means the same in every translation
+    unit including it, i.e. that it doesn't depend on macros defined
+    differently before it is included.
+
+    Only nodes which are never modified later on are shared: named
+    functions, variables and enumerations, structs and unions without
+    nested structs or unions (which are flattened into the toplevel by
+    the transformations) and typedefs of anything but an anonymous
+    struct, union or enumeration (which are renamed and removed from the
+    toplevel by the parser).
+
+    """
+    kinds = frozenset(kind.value for kind in (
+        CursorKind.FUNCTION_DECL, CursorKind.VAR_DECL,
+        CursorKind.TYPEDEF_DECL, CursorKind.STRUCT_DECL,
+        CursorKind.UNION_DECL, CursorKind.ENUM_DECL))
+
+    def __init__(self):
+        self.nodes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, cursor):
+        """ Returns the key of the declaration `cursor`, or None if it
+        can't be shared.
+
+        """
+        usr = cursor.get_usr()
+        if not usr:
+            return None
+        location = cursor.location
+        if location.file is None:
+            return None
+        return (cursor._kind_id, usr, location.file.name, location.offset)
+
+    def get(self, key):
+        """ Returns the node stored for `key` or None.
+
+        """
+        node = self.nodes.get(key)
+        if node is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return node
+
+    def add(self, key, node):
+        """ Stores `node` for `key`, if it can be shared.
+
+        """
+        if is_shareable(node):
+            self.nodes[key] = node
+
+
+def is_anonymous_record(node):
+    return isinstance(node, (c_ast.Struct, c_ast.Union, c_ast.Enumeration)) \
+        and not node.name
+
+
+def is_shareable(node):
+    """ Checks if the declaration `node` is left alone after it has been
+    parsed, see DeclarationStore.
+
+    """
+    if not node.name:
+        return False
+    if isinstance(node, (c_ast.Struct, c_ast.Union)):
+        return not any(isinstance(member, (c_ast.Struct, c_ast.Union))
+                       for member in node.members)
+    if isinstance(node, c_ast.Typedef):
+        return not is_anonymous_record(node.typ)
+    return isinstance(node, (c_ast.Function, c_ast.Variable,
+                             c_ast.Enumeration))
@@ -0,0 +1,110 @@
+# Stdlib imports
+from collections import namedtuple
+
+# CWrap imports
+from ... import trace
+
+# Local package imports
+from .clang.cindex import Diagnostic as ClangDiagnostic
+
+
+tracer = trace.get_tracer('diagnostics')
+
+
+Diagnostic = namedtuple('Diagnostic', ['severity', 'category', 'filename',
+                                       'line', 'column', 'spelling',
+                                       'fixits'])
+
+SEVERITY_NAMES = {ClangDiagnostic.Ignored: 'ignored',
+                  ClangDiagnostic.Note: 'note',
+                  ClangDiagnostic.Warning: 'warning',
+                  ClangDiagnostic.Error: 'error',
+                  ClangDiagnostic.Fatal: 'fatal'}
+
+# The trace level new diagnostics are reported at, by severity
+TRACE_LEVELS = {ClangDiagnostic.Ignored: trace.DEBUG,
+                ClangDiagnostic.Note: trace.INFO,
+                ClangDiagnostic.Warning: trace.WARNING,
+                ClangDiagnostic.Error: trace.ERROR,
+                ClangDiagnostic.Fatal: trace.ERROR}
+
+
+def from_clang(diag):
+    """ Converts a libclang Diagnostic into a Diagnostic tuple.
+
+    """
+    location = diag.location
+    filename = location.file.name if location.file is not None else None
+    fixits = tuple('%d:%d-%d:%d %s' % (f.range.start.line,
+                                       f.range.start.column,
+                                       f.range.end.line, f.range.end.column,
+                                       f.value)
+                   for f in diag.fixits)
+    return Diagnostic(diag.severity, diag.category_name, filename,
+                      location.line, location.column, diag.spelling, fixits)
+
+
+class DiagnosticSet(object):
+    """ The diagnostics of one or more translation units. A diagnostic
+    reported more than once (e.g. for a header included by several parsed
+    files) is kept once, together with the number of times it was seen.
+    New diagnostics are written to the 'diagnostics' tracer.
+
+    """
+    def __init__(self):
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __iter__(self):
+        return iter(self._counts)
+
+    def __contains__(self, diag):
+        return diag in self._counts
+
+    def add(self, diag):
+        """ Adds the Diagnostic `diag`, returns True if it is new.
+
+        """
+        count = self._counts.get(diag, 0)
+        self._counts[diag] = count + 1
+        if count:
+            return False
+        level = TRACE_LEVELS.get(diag.severity, trace.ERROR)
+        if tracer.enabled(level):
+            tracer.write(level, '%s:%s:%s: %s: %s' % (
+                diag.filename, diag.line, diag.column,
+                SEVERITY_NAMES.get(diag.severity, diag.severity),
+                diag.spelling))
+            for fixit in diag.fixits:
+                tracer.write(level, '    fixit', fixit)
+        return True
+
+    def add_tu(self, tu):
+        """ Adds all diagnostics of the TranslationUnit `tu`.
+
+        """
+        for diag in tu.diagnostics:
+            self.add(from_clang(diag))
+
+    def count(self, diag):
+        """ Returns how often `diag` was reported.
+
+        """
+        return self._counts.get(diag, 0)
+
+    def filter(self, severity=ClangDiagnostic.Ignored, filename=None):
+        """ Returns the list of diagnostics with at least the given
+        `severity`, optionally only those of the file `filename`.
+
+        """
+        return [diag for diag in self._counts
+                if diag.severity >= severity and
+                (filename is None or diag.filename == filename)]
+
+    def errors(self):
+        """ Returns the list of errors and fatal errors.
+
+        """
+        return self.filter(ClangDiagnostic.Error)
@@ -0,0 +1,104 @@
+# Stdlib imports
+import time
+
+# CWrap imports
+from ... import stats
+from ... import trace
+
+# Local package imports
+from .clang import cindex
+
+
+tracer = trace.get_tracer('frontend')
+
+
+class CallAccounting(object):
+    """ Counts the calls of the libclang functions and the time spent in
+    them while it is enabled, per function and per phase of the calling
+    thread (see stats.current_phase). Phases are only known while
+    statistics are collected, otherwise the calls are attributed to the
+    phase None.
+
+    The registered functions of the library are wrapped on enable() and
+    restored on disable(), so disabled accounting costs nothing. The time
+    of a call includes the Python callbacks it makes, e.g. the visitor of
+    clang_visitChildren, and the calls made by them.
+
+    """
+    def __init__(self):
+        # maps (phase, function) to [calls, seconds]
+        self.calls = {}
+
+    def wrap(self, name, func):
+        calls = self.calls
+        perf_counter = time.perf_counter
+        current_phase = stats.current_phase
+
+        def call(*args):
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = perf_counter() - start
+                key = (current_phase(), name)
+                record = calls.get(key)
+                if record is None:
+                    calls[key] = [1, elapsed]
+                else:
+                    record[0] += 1
+                    record[1] += elapsed
+        return call
+
+    def enable(self):
+        cindex.wrap_functions(cindex.conf.lib, self.wrap)
+
+    def disable(self):
+        cindex.wrap_functions(cindex.conf.lib, None)
+
+    def top(self, n=10):
+        """ Returns the `n` functions with the most time as a list of
+        (function, calls, seconds) tuples, summed over the phases.
+
+        """
+        totals = {}
+        for (phase, name), (count, seconds) in self.calls.items():
+            total = totals.setdefault(name, [0, 0.0])
+            total[0] += count
+            total[1] += seconds
+        ranked = sorted(totals.items(), key=lambda item: -item[1][1])
+        return [(name, count, seconds)
+                for name, (count, seconds) in ranked[:n]]
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.disable()
+
+
+def account_calls(iterable):
+    """ Yields the items of `iterable` while the libclang calls made to
+    produce them are accounted. Adds the calls to the statistics being
+    collected, if any, and traces the most expensive functions.
+
+    """
+    with CallAccounting() as accounting:
+        for item in iterable:
+            yield item
+    report_calls(accounting)
+
+
+def report_calls(accounting):
+    """ Adds the calls counted by the CallAccounting `accounting` to the
+    statistics being collected, if any, and traces the most expensive
+    functions.
+
+    """
+    report = stats.active()
+    if report is not None:
+        report.add_calls(accounting.calls)
+    if tracer.info:
+        for name, count, seconds in accounting.top():
+            tracer.write(trace.INFO, '%-36s %10d calls %10.3f s' %
+                         (name, count, seconds))
@@ -0,0 +1,232 @@
+# Stdlib imports
+import collections
+import time
+
+# Local package imports
+from . import ast_transforms as transforms
+from . import c_ast
+from . import clang_parser
+from .pch import INCLUDE_PAT
+from .scope import get_header_scope
+
+
+class FileCost(object):
+    """ The costs a file of the include closures adds to the headers of a
+    Config, summed over all headers:
+
+        headers         number of headers including it
+        direct          number of headers including it themselves
+        cursors         cursors visited in it
+        declarations    toplevel declarations in it
+        c_ast_nodes     c_ast nodes produced for its declarations
+        parse_time      estimated seconds libclang spent parsing it and
+                        the files it includes first, only known for the
+                        headers and the files they include themselves
+
+    `spellings` are the #include targets it was included with by the
+    headers, e.g. '<stdio.h>'.
+
+    """
+    fields = ['headers', 'direct', 'cursors', 'declarations', 'c_ast_nodes',
+              'parse_time']
+
+    def __init__(self, path):
+        self.path = path
+        self.spellings = set()
+        self.headers = 0
+        self.direct = 0
+        self.cursors = 0
+        self.declarations = 0
+        self.c_ast_nodes = 0
+        self.parse_time = 0.0
+
+    def to_dict(self):
+        data = dict((name, getattr(self, name)) for name in self.fields)
+        data['path'] = self.path
+        data['spellings'] = sorted(self.spellings)
+        return data
+
+
+class IncludeProfile(object):
+    """ The FileCosts of the files included by the headers of a Config,
+    see profile_includes().
+
+    """
+    def __init__(self):
+        self.files = {}
+        self.headers = []
+        # the direct system includes of every header, in their order
+        self.system_includes = []
+
+    def file(self, path):
+        cost = self.files.get(path)
+        if cost is None:
+            cost = self.files[path] = FileCost(path)
+        return cost
+
+    def top(self, n=10, key='parse_time'):
+        """ Returns the `n` FileCosts with the highest `key`.
+
+        """
+        costs = sorted(self.files.values(),
+                       key=lambda cost: getattr(cost, key), reverse=True)
+        return costs[:n]
+
+    def recommend(self, min_share=1.0, min_fraction=0.05):
+        """ Returns a dict with the recommended options:
+
+            pch         the system includes at least `min_share` of the
+                        headers include themselves, in the order of the
+                        first header, for the `pch` option
+            exclude     the included files other than the headers with at
+                        least `min_fraction` of all cursors, most costly
+                        first, to leave out of the `header_scope`
+            header_scope
+                        a `header_scope` list excluding these files,
+                        '!' followed by their path
+
+        """
+        shared = collections.Counter()
+        for includes in self.system_includes:
+            shared.update(set(includes))
+        needed = min_share * len(self.headers)
+        pch = []
+        for includes in self.system_includes:
+            for spelling in includes:
+                if shared[spelling] >= needed and spelling not in pch:
+                    pch.append(spelling)
+
+        total = sum(cost.cursors for cost in self.files.values())
+        headers = set(self.headers)
+        exclude = [cost.path for cost in self.top(len(self.files), 'cursors')
+                   if cost.path not in headers and total and
+                   cost.cursors >= min_fraction * total]
+        return {'pch': pch, 'exclude': exclude,
+                'header_scope': ['!' + path for path in exclude]}
+
+    def to_dict(self):
+        costs = self.top(len(self.files))
+        return {'headers': list(self.headers),
+                'files': [cost.to_dict() for cost in costs],
+                'recommendations': self.recommend()}
+
+    def format(self, n=10):
+        """ Returns a text report of the `n` most costly files and the
+        recommendations.
+
+        """
+        lines = ['%10s %8s %8s %8s %6s  %s' % ('parse ms', 'cursors',
+                                               'decls', 'nodes', 'hdrs',
+                                               'file')]
+        for cost in self.top(n):
+            lines.append('%10.2f %8d %8d %8d %6d  %s' % (
+                cost.parse_time * 1000, cost.cursors, cost.declarations,
+                cost.c_ast_nodes, cost.headers, cost.path))
+        recommendations = self.recommend()
+        lines.append('')
+        lines.append('pch: %s' % (','.join(recommendations['pch']) or '-'))
+        lines.append('scope: %s' % (
+            ','.join(recommendations['header_scope']) or '-'))
+        return '\n'.join(lines)
+
+
+def _parse_time(index, path, args, contents=None):
+    unsaved_files = [(path, contents)] if contents is not None else None
+    start = time.perf_counter()
+    tu = index.parse(path, args=args, options=clang_parser.PARSE_OPTIONS,
+                     unsaved_files=unsaved_files)
+    return tu, time.perf_counter() - start
+
+
+def profile_header(profile, path, args, scope=None, prefixes=True):
+    """ Parses the header at `path` with the clang `args` and adds the
+    costs of the files it includes to the IncludeProfile `profile`.
+
+    With `prefixes` the parse time of every file the header includes
+    itself is estimated by parsing the header up to each of these
+    includes: the time a prefix takes longer than the one before is
+    attributed to its last include. The header gets the rest of the time.
+
+    """
+    index = clang_parser.get_index()
+    tu, total = _parse_time(index, path, args)
+    parser = clang_parser.ClangParser(scope)
+    parser.parse_tu(tu)
+    table = parser.table
+    profile.headers.append(path)
+
+    inclusions = list(tu.get_includes())
+    closure = set(inclusion.include.name for inclusion in inclusions)
+    closure.add(path)
+    for name in closure:
+        profile.file(name).headers += 1
+
+    # cursors and toplevel declarations per file
+    for file_id, n in collections.Counter(table.files).items():
+        if file_id:
+            profile.file(table.file_names[file_id]).cursors += n
+    parents = table.parents
+    for row in range(1, len(table)):
+        if parents[row] == 0 and table.files[row]:
+            profile.file(table.file_names[table.files[row]]).declarations \
+                += 1
+
+    by_file = collections.defaultdict(list)
+    for item in transforms.find_toplevel_items(parser.get_result()):
+        if item.location is not None:
+            by_file[item.location[0]].append(item)
+    for name, items in by_file.items():
+        profile.file(name).c_ast_nodes += c_ast.count_nodes(items)
+
+    # the includes of the header itself, in the order of their lines
+    direct = sorted((inclusion for inclusion in inclusions
+                     if inclusion.depth == 1),
+                    key=lambda inclusion: inclusion.location.line)
+    with open(path) as f:
+        lines = f.readlines()
+    system_includes = []
+    for inclusion in direct:
+        cost = profile.file(inclusion.include.name)
+        cost.direct += 1
+        line = inclusion.location.line
+        match = INCLUDE_PAT.match(lines[line - 1]) \
+            if line <= len(lines) else None
+        if match is not None:
+            cost.spellings.add(match.group(1))
+            if match.group(1).startswith('<'):
+                system_includes.append(match.group(1))
+    profile.system_includes.append(system_includes)
+
+    if not prefixes or not direct:
+        profile.file(path).parse_time += total
+        return
+
+    previous = None
+    for inclusion in direct:
+        line = inclusion.location.line
+        if previous is None:
+            previous = _parse_time(index, path, args,
+                                   ''.join(lines[:line - 1]))[1]
+            profile.file(path).parse_time += previous
+        elapsed = _parse_time(index, path, args, ''.join(lines[:line]))[1]
+        profile.file(inclusion.include.name).parse_time += \
+            max(0.0, elapsed - previous)
+        previous = max(elapsed, previous)
+    profile.file(path).parse_time += max(0.0, total - previous)
+
+
+def profile_includes(config, prefixes=True):
+    """ Profiles the includes of all headers of `config` and returns the
+    IncludeProfile. The headers are parsed with the include dirs, the
+    language and the header scope of `config`, without a precompiled
+    prelude or caches.
+
+    """
+    include_dirs = config.metadata.get('include_dirs', [])
+    language = config.metadata.get('language', '')
+    args = clang_parser.clang_args(include_dirs, language)
+    scope = get_header_scope(config)
+    profile = IncludeProfile()
+    for header_file in config.files:
+        profile_header(profile, header_file.path, args, scope, prefixes)
+    return profile
@@ -0,0 +1,249 @@
+# Stdlib imports
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+# CWrap imports
+from ... import trace
+from ...output import file_fingerprint, fingerprint_unchanged
+
+# Local package imports
+from . import clang
+from .diagnostics import DiagnosticSet
+
+
+INCLUDE_PAT = re.compile(r'^\s*#\s*include\s*(<[^>]+>|"[^"]+")')
+GUARD_PAT = re.compile(r'^\s*#\s*(ifndef|define|pragma\s+once)\b')
+
+
+tracer = trace.get_tracer('frontend')
+
+
+def leading_includes(path):
+    """ Returns the list of #include targets (e.g. '<stdio.h>') at the top
+    of the header at `path`. Comments, blank lines and the include guard
+    are skipped, the first other line ends the list.
+
+    """
+    includes = []
+    in_comment = False
+    with open(path) as f:
+        for line in f:
+            stripped = line.strip()
+            if in_comment:
+                if '*/' in stripped:
+                    in_comment = False
+                continue
+            if not stripped or stripped.startswith('//'):
+                continue
+            if stripped.startswith('/*'):
+                in_comment = '*/' not in stripped
+                continue
+            match = INCLUDE_PAT.match(stripped)
+            if match is not None:
+                includes.append(match.group(1))
+            elif GUARD_PAT.match(stripped) is None:
+                break
+    return includes
+
+
+def common_prelude(paths):
+    """ Returns the longest list of system includes (<...>) all headers in
+    `paths` start with. Quoted includes end the prelude, since they are
+    resolved relative to the including header.
+
+    """
+    prelude = None
+    for path in paths:
+        includes = leading_includes(path)
+        if prelude is None:
+            prelude = includes
+            continue
+        n = 0
+        while n < min(len(prelude), len(includes)) and \
+                prelude[n] == includes[n]:
+            n += 1
+        prelude = prelude[:n]
+    prelude = prelude or []
+    for n, inc in enumerate(prelude):
+        if not inc.startswith('<'):
+            return prelude[:n]
+    return prelude
+
+
+def default_pch_dir():
+    """ Returns the directory the PCH files are kept in by default, a per
+    user directory in the temporary directory.
+
+    """
+    user = getattr(os, 'getuid', lambda: 0)()
+    return os.path.join(tempfile.gettempdir(), 'cwrap-pch-%d' % user)
+
+
+class Prelude(object):
+    """ A list of #include directives shared by the headers of a run.
+
+    The prelude is precompiled once per set of clang arguments into a PCH
+    file, which is passed with -include-pch to each header parsed with the
+    same arguments. The PCH files are kept in `pch_dir` together with the
+    fingerprints of their include closure, so they are reused by later runs
+    (and concurrent worker processes) as long as no included file changed.
+    `pch_dir` defaults to default_pch_dir(), which is created only
+    accessible by the user and not used if it belongs to someone else.
+
+    """
+    def __init__(self, includes, pch_dir=None):
+        self.includes = [inc if inc[0] in '<"' else '<%s>' % inc
+                         for inc in includes]
+        if pch_dir is None:
+            pch_dir = default_pch_dir()
+        self.pch_dir = os.path.abspath(pch_dir)
+        self._args = {}
+        # maps the clang arguments to the include closure of the PCH
+        self._files = {}
+
+    @property
+    def source(self):
+        return ''.join('#include %s\n' % inc for inc in self.includes)
+
+    def args(self, index, args, options, diagnostics=None):
+        """ Returns the additional clang arguments which make use of the
+        precompiled prelude, building it first if necessary. The
+        diagnostics of the build are added to the `diagnostics`
+        DiagnosticSet, if given. If the prelude has errors no arguments
+        are returned, so the headers are parsed without it.
+
+        """
+        key = tuple(args)
+        if key not in self._args:
+            built = self.build(index, args, options, diagnostics)
+            if built is None:
+                self._args[key] = []
+                self._files[key] = []
+            else:
+                self._args[key] = ['-include-pch', built[0]]
+                self._files[key] = built[1]
+        return self._args[key]
+
+    def dependencies(self, args):
+        """ Returns the list of headers included by the PCH used with
+        the clang arguments `args`. A translation unit using the PCH
+        doesn't report them as its includes.
+
+        """
+        return self._files.get(tuple(args), [])
+
+    def build(self, index, args, options, diagnostics=None):
+        """ Builds the PCH for the clang arguments `args` unless an up to
+        date one exists. Returns the path of the PCH file and the list of
+        headers it includes, or None if the prelude has errors or the PCH
+        can't be saved. Its diagnostics are added to `diagnostics`.
+
+        """
+        sha = hashlib.sha1(self.source.encode('utf-8'))
+        for arg in args:
+            sha.update(b'\0' + arg.encode('utf-8'))
+        sha.update(('\0%d' % options).encode('utf-8'))
+        key = sha.hexdigest()
+
+        if not self._check_dir():
+            return None
+        header_path = os.path.join(self.pch_dir, key + '.h')
+        pch_path = os.path.join(self.pch_dir, key + '.pch')
+        manifest_path = os.path.join(self.pch_dir, key + '.json')
+        try:
+            with open(manifest_path) as f:
+                includes = json.load(f)
+            if all(fingerprint_unchanged(fp) for fp in includes) and \
+                    os.path.exists(pch_path):
+                return pch_path, [fp[0] for fp in includes[1:]]
+        except (IOError, OSError, ValueError):
+            pass
+
+        if not os.path.exists(header_path):
+            tmp_path = '%s.%d.tmp' % (header_path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                f.write(self.source)
+            os.replace(tmp_path, header_path)
+
+        tu = index.parse(header_path, args=args, options=options)
+        if diagnostics is None:
+            diagnostics = DiagnosticSet()
+        diagnostics.add_tu(tu)
+        if any(diag.severity >= clang.cindex.Diagnostic.Error
+               for diag in tu.diagnostics):
+            # A broken PCH would be reused by every later run
+            if tracer.warning:
+                tracer.write(trace.WARNING, 'Not using the prelude %s, '
+                             'it has errors' % ' '.join(self.includes))
+            return None
+
+        # Write to temporary files and rename them afterwards, so that
+        # concurrent workers never see half written files.
+        tmp_path = '%s.%d.tmp' % (pch_path, os.getpid())
+        try:
+            tu.save(tmp_path)
+        except clang.cindex.TranslationUnitSaveError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if tracer.warning:
+                tracer.write(trace.WARNING, 'Could not save the prelude %s'
+                             % ' '.join(self.includes))
+            return None
+        os.replace(tmp_path, pch_path)
+
+        files = [header_path]
+        for inclusion in tu.get_includes():
+            name = inclusion.include.name
+            if name not in files:
+                files.append(name)
+        tmp_path = '%s.%d.tmp' % (manifest_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump([file_fingerprint(name) for name in files], f)
+        os.replace(tmp_path, manifest_path)
+        return pch_path, files[1:]
+
+
+    def _check_dir(self):
+        """ Creates `pch_dir` if necessary. Returns False if it can't be
+        created, or if it is the default directory and someone else owns
+        it or can write to it, so its PCH files can't be trusted.
+
+        """
+        try:
+            os.makedirs(self.pch_dir, 0o700)
+        except OSError:
+            # created by another process in the meantime
+            if not os.path.isdir(self.pch_dir):
+                if tracer.warning:
+                    tracer.write(trace.WARNING, 'Not using the prelude, '
+                                 'could not create %s' % self.pch_dir)
+                return False
+        if self.pch_dir != os.path.abspath(default_pch_dir()) or \
+                not hasattr(os, 'getuid'):
+            return True
+        st = os.stat(self.pch_dir)
+        if st.st_uid != os.getuid() or st.st_mode & 0o022:
+            if tracer.warning:
+                tracer.write(trace.WARNING, 'Not using the prelude, %s '
+                             'belongs to another user' % self.pch_dir)
+            return False
+        return True
+
+
+def get_prelude(config):
+    """ Returns the Prelude configured with the `pch` option of `config`
+    or None. `pch` is either a list of includes or 'auto', which uses the
+    system includes all headers of the config start with.
+
+    """
+    includes = config.metadata.get('pch')
+    if includes == 'auto':
+        if len(config.files) < 2:
+            return None
+        includes = common_prelude([f.path for f in config.files])
+    if not includes:
+        return None
+    return Prelude(includes, config.metadata.get('pch_dir'))
@@ -0,0 +1,88 @@
+# Stdlib imports
+import fnmatch
+import os
+
+
+class HeaderScope(object):
+    """ Decides which toplevel declarations of a translation unit are
+    wrapped, based on the header they are declared in.
+
+    `policy` is one of
+
+        'all'       every declaration (the default)
+        'main'      only declarations of the parsed header itself
+        'nosystem'  everything that isn't declared in a system header
+        a list      glob patterns, a declaration is wrapped if the path
+                    of its header matches or ends with one of them.
+                    Patterns starting with '!' exclude the headers they
+                    match; a list of exclusions only wraps everything
+                    else
+
+    Declarations outside of the scope are skipped before their children
+    are visited. They are still parsed when a wrapped declaration refers
+    to them, but then they aren't emitted themselves.
+
+    """
+    POLICIES = ('all', 'main', 'nosystem')
+
+    def __init__(self, policy='all'):
+        if isinstance(policy, str) and policy not in self.POLICIES:
+            policy = [policy]
+        self.policy = policy
+        if policy not in self.POLICIES:
+            self._include = [pattern for pattern in policy
+                             if not pattern.startswith('!')]
+            self._exclude = [pattern[1:] for pattern in policy
+                             if pattern.startswith('!')]
+        # maps file names to the result of the glob matching
+        self._matches = {}
+
+    def contains(self, cursor):
+        """ Returns True if the declaration at `cursor` is in scope.
+
+        """
+        policy = self.policy
+        if policy == 'all':
+            return True
+        location = cursor.location
+        if policy == 'main':
+            return location.is_from_main_file
+        if policy == 'nosystem':
+            return not location.is_in_system_header
+        if location.file is None:
+            return False
+        return self.matches(location.file.name)
+
+    def matches(self, name):
+        """ Returns True if the declarations of the header file `name` are
+        in scope. Only the glob patterns are checked, with the other
+        policies every header is in scope.
+
+        """
+        if self.policy in self.POLICIES:
+            return True
+        match = self._matches.get(name)
+        if match is None:
+            path = os.path.abspath(name)
+            match = ((not self._include or
+                      _matches_any(path, self._include)) and
+                     not _matches_any(path, self._exclude))
+            self._matches[name] = match
+        return match
+
+
+def _matches_any(path, patterns):
+    return any(fnmatch.fnmatch(path, pattern) or
+               fnmatch.fnmatch(path, '*/' + pattern)
+               for pattern in patterns)
+
+
+def get_header_scope(config):
+    """ Returns the HeaderScope configured with the `header_scope` option
+    of `config` or None if everything is wrapped.
+
+    """
+    policy = config.metadata.get('header_scope', 'all')
+    if policy == 'all' or not policy:
+        return None
+    return HeaderScope(policy)
@@ -0,0 +1,141 @@
+# Stdlib imports
+import hashlib
+import json
+import os
+
+# CWrap imports
+from ...output import file_fingerprint, fingerprint_unchanged
+
+# Local package imports
+from . import clang
+
+
+# Bump this whenever the layout of the manifest or the way the keys
+# are computed changes. Old entries are then simply never hit again.
+CACHE_VERSION = 1
+
+
+class TUCache(object):
+    """ An on-disk cache of parsed translation units.
+
+    Every entry consists of a json manifest and the AST file written by
+    `TranslationUnit.save`. The manifest is found by hashing the header
+    path together with the clang arguments (include dirs, language) and
+    the contents of any unsaved files. It records the fingerprints of the
+    include closure of the header, which are checked on lookup. The name
+    of the AST file additionally contains the hash of the include closure,
+    so an AST is never loaded for different header contents.
+
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, path, args, unsaved_files):
+        if '-include-pch' in args:
+            # An AST file which depends on a precompiled header can't be
+            # loaded again by libclang, so these are not cached. The PCH
+            # already saves most of the parsing work anyway.
+            return None
+        sha = hashlib.sha1()
+        sha.update(('%d\0%s\0' % (CACHE_VERSION, path)).encode('utf-8'))
+        for arg in args:
+            sha.update(arg.encode('utf-8') + b'\0')
+        for name, contents in unsaved_files or []:
+            if hasattr(contents, 'read'):
+                # File objects can't be fingerprinted without consuming
+                # them, so these translation units are not cached.
+                return None
+            if isinstance(contents, str):
+                contents = contents.encode('utf-8')
+            sha.update(name.encode('utf-8') + b'\0' + contents + b'\0')
+        return sha.hexdigest()
+
+    def _closure_key(self, key, includes):
+        sha = hashlib.sha1(key.encode('utf-8'))
+        for fingerprint in includes:
+            sha.update(('%s\0%s\0' % (fingerprint[0], fingerprint[3])).encode('utf-8'))
+        return sha.hexdigest()
+
+    def _manifest_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _ast_path(self, closure_key):
+        return os.path.join(self.cache_dir, closure_key + '.ast')
+
+    def load(self, index, path, args, unsaved_files=None):
+        """ Returns the cached TranslationUnit for the header `path`
+        parsed with `args`, or None if there is no up to date entry.
+
+        """
+        key = self._key(path, args, unsaved_files)
+        if key is None:
+            return None
+        try:
+            with open(self._manifest_path(key)) as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        includes = manifest.get('includes', [])
+        if manifest.get('version') != CACHE_VERSION or \
+                not all(fingerprint_unchanged(fp) for fp in includes):
+            self.misses += 1
+            return None
+
+        ast_path = self._ast_path(self._closure_key(key, includes))
+        if not os.path.exists(ast_path):
+            self.misses += 1
+            return None
+        try:
+            tu = clang.cindex.TranslationUnit.from_ast_file(ast_path, index)
+        except clang.cindex.TranslationUnitLoadError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tu
+
+    def store(self, tu, path, args, unsaved_files=None):
+        """ Saves the TranslationUnit `tu` of the header `path` parsed
+        with `args` to the cache.
+
+        """
+        key = self._key(path, args, unsaved_files)
+        if key is None:
+            return
+        unsaved_names = set(name for name, contents in unsaved_files or [])
+        files = [path]
+        for inclusion in tu.get_includes():
+            name = inclusion.include.name
+            if name not in files:
+                files.append(name)
+        includes = [file_fingerprint(name) for name in files
+                    if name not in unsaved_names and os.path.exists(name)]
+
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(self.cache_dir):
+                    raise
+
+        # Write to temporary files and rename them afterwards, so that
+        # concurrent runs never see half written entries.
+        ast_path = self._ast_path(self._closure_key(key, includes))
+        tmp_path = '%s.%d.tmp' % (ast_path, os.getpid())
+        try:
+            tu.save(tmp_path)
+        except clang.cindex.TranslationUnitSaveError:
+            return
+        os.replace(tmp_path, ast_path)
+
+        manifest = {'version': CACHE_VERSION, 'path': path, 'args': args,
+                    'includes': includes}
+        manifest_path = self._manifest_path(key)
+        tmp_path = '%s.%d.tmp' % (manifest_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
@@ -0,0 +1,84 @@
+# Stdlib imports
+import glob
+import os
+
+# Local package imports
+from . import ast_transforms as transforms
+from . import c_ast
+from . import clang_parser
+from .scope import HeaderScope, get_header_scope
+
+
+# The name of the generated translation unit, it only exists in memory
+UMBRELLA_NAME = 'cwrap-umbrella.h'
+
+
+def umbrella_source(files):
+    """ Returns the source of a translation unit including all headers of
+    the Files `files`.
+
+    """
+    return ''.join('#include "%s"\n' % header_file.path
+                   for header_file in files)
+
+
+def partition(items, files):
+    """ Distributes the toplevel `items` of the umbrella translation unit
+    to the Files `files` by the file they are declared in. Returns a list
+    with the list of items of every File, items of other files are left
+    out.
+
+    """
+    partitions = dict((header_file.path, []) for header_file in files)
+    paths = {}
+    for item in transforms.find_toplevel_items(items):
+        if item.location is None:
+            continue
+        name = item.location[0]
+        path = paths.get(name)
+        if path is None:
+            path = paths[name] = os.path.abspath(name)
+        members = partitions.get(path)
+        if members is not None:
+            members.append(item)
+    return [partitions[header_file.path] for header_file in files]
+
+
+def umbrella_containers(config, tu_cache=None, prelude=None,
+                        diagnostics=None):
+    """ Parses all headers of `config` in a single translation unit, which
+    includes one after another. Returns a list with a CAstContainer per
+    header, holding the declarations of the header itself.
+
+    All containers get the files of the whole translation unit as their
+    dependencies. The glob patterns of the `header_scope` option select
+    the headers whose declarations are extracted, the other headers get
+    empty containers.
+
+    """
+    include_dirs = config.metadata.get('include_dirs', [])
+    language = config.metadata.get('language', '')
+    name = os.path.join(os.getcwd(), UMBRELLA_NAME)
+    source = umbrella_source(config.files)
+
+    # Only the declarations of the headers themselves are extracted, of
+    # those in the configured scope
+    header_scope = get_header_scope(config)
+    patterns = [glob.escape(header_file.path) for header_file in config.files
+                if header_scope is None or
+                header_scope.matches(header_file.path)]
+    # without patterns every file would be in scope, '!*' excludes all
+    scope = HeaderScope(patterns or ['!*'])
+    dependencies = []
+    items = clang_parser.parse([(name, source)], include_dirs, language,
+                               tu_cache=tu_cache, prelude=prelude,
+                               scope=scope, diagnostics=diagnostics,
+                               dependencies=dependencies)
+
+    containers = []
+    for header_file, members in zip(config.files,
+                                    partition(items, config.files)):
+        file_node = c_ast.File(header_file.path, members)
+        containers.append(transforms.make_container(
+            header_file, [file_node], list(dependencies)))
+    return containers
@@ -0,0 +1,183 @@
+# Stdlib imports
+import os
+import time
+
+# CWrap imports
+from ... import trace
+
+# Local package imports
+from . import ast_transforms as transforms
+from . import clang
+from . import clang_parser
+from .diagnostics import DiagnosticSet, from_clang
+from .scope import get_header_scope
+
+
+tracer = trace.get_tracer('frontend')
+
+
+def file_stamp(path):
+    """ Returns the (size, mtime) of the file at `path`, or None if it
+    doesn't exist.
+
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+class WatchedHeader(object):
+    """ The translation unit of a header, the stamps (see file_stamp)
+    of the files it depended on when it was last parsed and the
+    Diagnostics of that parse.
+
+    """
+    def __init__(self, header_file, tu):
+        self.header_file = header_file
+        self.tu = tu
+        self.stamps = {}
+        self.diagnostics = []
+
+
+class Watcher(object):
+    """ Keeps the libclang index and the translation unit of every header
+    of `config` alive between runs.
+
+    The translation units are parsed with a precompiled preamble, so
+    when a header or one of its includes changed, `TranslationUnit.reparse`
+    only has to parse the part of the header after its leading includes
+    again, unless the includes themselves changed. The files are checked
+    by size and mtime. The `tu_cache_dir` and `pch` options are not used.
+
+    """
+    def __init__(self, config, diagnostics=None):
+        self.config = config
+        include_dirs = config.metadata.get('include_dirs', [])
+        language = config.metadata.get('language', '')
+        self.args = clang_parser.clang_args(include_dirs, language)
+        self.options = clang_parser.PARSE_OPTIONS | \
+            clang.cindex.TranslationUnit.PARSE_PRECOMPILED_PREAMBLE
+        self.scope = get_header_scope(config)
+        if diagnostics is None:
+            diagnostics = DiagnosticSet()
+        self.diagnostics = diagnostics
+        self.headers = []
+
+    def start(self):
+        """ Parses all headers. Returns an iterable of their
+        ASTContainers.
+
+        """
+        index = clang_parser.get_index()
+        self.headers = []
+        parsed = []
+        for header_file in self.config.files:
+            if tracer.info:
+                tracer.write(trace.INFO, 'Parsing %s' % header_file.path)
+            before = self._stamps([header_file.path])
+            tu = index.parse(header_file.path, args=self.args,
+                             options=self.options)
+            header = WatchedHeader(header_file, tu)
+            self.headers.append(header)
+            parsed.append((header, before))
+        return self._transform(parsed)
+
+    def changed(self):
+        """ Returns the WatchedHeaders which depend on a changed file.
+        Every file is checked once, even if many headers include it.
+
+        """
+        stamps = {}
+        changed = []
+        for header in self.headers:
+            for path, stamp in header.stamps.items():
+                if path not in stamps:
+                    stamps[path] = file_stamp(path)
+                if stamps[path] != stamp:
+                    changed.append(header)
+                    break
+        return changed
+
+    def poll(self):
+        """ Reparses the headers which depend on a changed file. Returns
+        an iterable of their ASTContainers.
+
+        """
+        return self._reparse(self.changed())
+
+    def update(self, diagnostics=None):
+        """ Parses all headers on the first call, later only reparses
+        those which depend on a changed file, like poll(). Returns an
+        iterable of the ASTContainers of the parsed headers.
+
+        The diagnostics of every header, also of those which weren't
+        parsed again, are added to the DiagnosticSet `diagnostics`, by
+        default a new one, so every update reports all of them.
+
+        """
+        if diagnostics is None:
+            diagnostics = DiagnosticSet()
+        self.diagnostics = diagnostics
+        if not self.headers:
+            return self.start()
+        changed = self.changed()
+        for header in self.headers:
+            if header not in changed:
+                for diag in header.diagnostics:
+                    diagnostics.add(diag)
+        return self._reparse(changed)
+
+    def _reparse(self, headers):
+        reparsed = []
+        for header in headers:
+            if tracer.info:
+                tracer.write(trace.INFO, 'Reparsing %s' %
+                             header.header_file.path)
+            before = self._stamps(header.stamps)
+            header.tu.reparse()
+            reparsed.append((header, before))
+        return self._transform(reparsed)
+
+    def _stamps(self, paths):
+        """ Returns the time and the stamps of the files at `paths`, taken
+        before a parse. A file saved while it is parsed then still differs
+        from its stamp at the next poll.
+
+        """
+        return time.time(), dict((path, file_stamp(path)) for path in paths)
+
+    def _transform(self, parsed):
+        containers = []
+        for header, (started, stamps) in parsed:
+            dependencies = []
+            ast_items = clang_parser.parse_tu(header.tu, self.scope,
+                                              self.diagnostics, dependencies)
+            header.diagnostics = [from_clang(diag)
+                                  for diag in header.tu.diagnostics]
+            header.stamps = {}
+            for path in dependencies:
+                stamp = stamps[path] if path in stamps else file_stamp(path)
+                # a new include modified since the parse started may have
+                # been parsed before its change, so it counts as changed
+                if path not in stamps and stamp is not None and \
+                        stamp[1] >= started:
+                    stamp = None
+                header.stamps[path] = stamp
+            containers.append(transforms.make_container(
+                header.header_file, ast_items, dependencies))
+        return transforms.CAstTransformer(containers).transform()
+
+    def watch(self, interval=0.5):
+        """ Yields the ASTContainers of all headers, then polls for
+        changes every `interval` seconds forever and yields the
+        ASTContainers of the reparsed headers.
+
+        """
+        for ast_container in self.start():
+            yield ast_container
+        while True:
+            time.sleep(interval)
+            for ast_container in self.poll():
+                yield ast_container
@@ -1,36 +1,52 @@
+from sys import intern
+
+
+def intern_name(name):
+    """ Returns the interned `name`. The same type, field and argument
+    names occur in many nodes, interning keeps one copy of each.
+
+    """
+    return intern(name) if isinstance(name, str) else name
 
 
 class C_ASTNode(object):
+    """ The base class of the c_ast nodes. Every node has a `name` and a
+    `location`, which the parser sets. The nodes have __slots__ and set
+    all their attributes in their constructor.
+
+    """
+    __slots__ = ('location', 'name')
 
-    def __init__(self, *args, **kwargs):
-        self.location = None
-        self.render_hints = {}
-        self.name = ''
-        self.init(*args, **kwargs)
-       
-    def init(self, *args, **kwargs):
-        pass
-  
     
 class Typedef(C_ASTNode):
 
-    def init(self, name, typ, context):
-        self.name = name
+    __slots__ = ('typ', 'context')
+
+    def __init__(self, name, typ, context):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
 
 
 class FundamentalType(C_ASTNode):
 
-    def init(self, name, size, align):
-        self.name = name
+    __slots__ = ('size', 'align')
+
+    def __init__(self, name, size, align):
+        self.location = None
+        self.name = intern_name(name)
         self.size = size
         self.align = align
 
 
 class CvQualifiedType(C_ASTNode):
 
-    def init(self, typ, const, volatile):
+    __slots__ = ('typ', 'const', 'volatile')
+
+    def __init__(self, typ, const, volatile):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.const = const
         self.volatile = volatile
@@ -38,8 +54,11 @@ class CvQualifiedType(C_ASTNode):
 
 class Ignored(C_ASTNode):
 
-    def init(self, name):
-        self.name = name
+    __slots__ = ('arguments',)
+
+    def __init__(self, name):
+        self.location = None
+        self.name = intern_name(name)
         self.arguments = []
 
     def fixup_argtypes(self, typemap):
@@ -52,8 +71,11 @@ class Ignored(C_ASTNode):
 
 class Field(C_ASTNode):
     
-    def init(self, name, typ, context, bits, offset):
-        self.name = name
+    __slots__ = ('typ', 'context', 'bits', 'offset')
+
+    def __init__(self, name, typ, context, bits, offset):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
         self.bits = bits
@@ -62,8 +84,11 @@ class Field(C_ASTNode):
 
 class Struct(C_ASTNode):
     
-    def init(self, name, align, members, context, bases, size):
-        self.name = name
+    __slots__ = ('align', 'members', 'context', 'bases', 'size')
+
+    def __init__(self, name, align, members, context, bases, size):
+        self.location = None
+        self.name = intern_name(name)
         self.align = align
         self.members = members
         self.context = context
@@ -77,8 +102,11 @@ class Struct(C_ASTNode):
 
 class Union(C_ASTNode):
     
-    def init(self, name, align, members, context, bases, size):
-        self.name = name
+    __slots__ = ('align', 'members', 'context', 'bases', 'size')
+
+    def __init__(self, name, align, members, context, bases, size):
+        self.location = None
+        self.name = intern_name(name)
         self.align = align
         self.members = members
         self.context = context
@@ -92,15 +120,21 @@ class Union(C_ASTNode):
 
 class EnumValue(C_ASTNode):
 
-    def init(self, name, value):
-        self.name = name
+    __slots__ = ('value',)
+
+    def __init__(self, name, value):
+        self.location = None
+        self.name = intern_name(name)
         self.value = value
     
 
 class Enumeration(C_ASTNode):
     
-    def init(self, name, size, align):
-        self.name = name
+    __slots__ = ('size', 'align', 'values')
+
+    def __init__(self, name, size, align):
+        self.location = None
+        self.name = intern_name(name)
         self.size = size
         self.align = align
         self.values = []
@@ -115,7 +149,11 @@ class Enumeration(C_ASTNode):
 
 class PointerType(C_ASTNode):
 
-    def init(self, typ, size, align):
+    __slots__ = ('typ', 'size', 'align')
+
+    def __init__(self, typ, size, align):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.size = size
         self.align = align
@@ -127,7 +165,11 @@ class PointerType(C_ASTNode):
 
 class ArrayType(C_ASTNode):
 
-    def init(self, typ, min, max):
+    __slots__ = ('typ', 'min', 'max')
+
+    def __init__(self, typ, min, max):
+        self.location = None
+        self.name = ''
         self.typ = typ
         self.min = min
         self.max = max
@@ -135,15 +177,21 @@ class ArrayType(C_ASTNode):
 
 class Argument(C_ASTNode):
 
-    def init(self, typ, name):
+    __slots__ = ('typ',)
+
+    def __init__(self, typ, name):
+        self.location = None
         self.typ = typ
-        self.name = name
+        self.name = intern_name(name)
 
 
 class Function(C_ASTNode):
 
-    def init(self, name, returns, context, attributes, extern):
-        self.name = name
+    __slots__ = ('returns', 'context', 'attributes', 'extern', 'arguments')
+
+    def __init__(self, name, returns, context, attributes, extern):
+        self.location = None
+        self.name = intern_name(name)
         self.returns = returns
         self.context = context
         self.attributes = attributes
@@ -160,7 +208,11 @@ class Function(C_ASTNode):
 
 class FunctionType(C_ASTNode):
 
-    def init(self, returns, attributes):
+    __slots__ = ('returns', 'attributes', 'arguments')
+
+    def __init__(self, returns, attributes):
+        self.location = None
+        self.name = ''
         self.returns = returns
         self.attributes = attributes
         self.arguments = []
@@ -175,8 +227,11 @@ class FunctionType(C_ASTNode):
 
 class OperatorFunction(C_ASTNode):
 
-    def init(self, name, returns, context, attributes, extern):
-        self.name = name
+    __slots__ = ('returns', 'context', 'attributes', 'extern', 'arguments')
+
+    def __init__(self, name, returns, context, attributes, extern):
+        self.location = None
+        self.name = intern_name(name)
         self.returns = returns
         self.context = context
         self.attributes = attributes
@@ -193,37 +248,52 @@ class OperatorFunction(C_ASTNode):
 
 class Macro(C_ASTNode):
 
-    def init(self, name, args, body):
-        self.name = name
+    __slots__ = ('args', 'body')
+
+    def __init__(self, name, args, body):
+        self.location = None
+        self.name = intern_name(name)
         self.args = args
         self.body = body
 
 
 class Alias(C_ASTNode):
 
-    def init(self, name, value, typ=None):
-        self.name = name
+    __slots__ = ('value', 'typ')
+
+    def __init__(self, name, value, typ=None):
+        self.location = None
+        self.name = intern_name(name)
         self.value = value
         self.typ = typ
     
 
 class File(C_ASTNode):
 
-    def init(self, name):
-        self.name = name
+    __slots__ = ()
+
+    def __init__(self, name):
+        self.location = None
+        self.name = intern_name(name)
     
 
 class Namespace(C_ASTNode):
 
-    def init(self, name, members):
-        self.name = name
+    __slots__ = ('members',)
+
+    def __init__(self, name, members):
+        self.location = None
+        self.name = intern_name(name)
         self.members = members
 
 
 class Variable(C_ASTNode):
 
-    def init(self, name, typ, context, init):
-        self.name = name
+    __slots__ = ('typ', 'context', 'init')
+
+    def __init__(self, name, typ, context, init):
+        self.location = None
+        self.name = intern_name(name)
         self.typ = typ
         self.context = context
         self.init = init
@@ -0,0 +1,306 @@
+# Stdlib imports
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+
+# Local package imports
+from .output import file_digest, file_fingerprint, fingerprint_unchanged
+from .version import source_digest
+
+
+# Bump this whenever the serialized form changes in a way schema_key()
+# doesn't notice, e.g. when the meaning of an attribute changes. Old
+# entries are then simply never hit again.
+IR_VERSION = 2
+
+
+def schema_key(c_ast_module):
+    """ Returns a hash of the names and __slots__ of the node classes of
+    `c_ast_module` and of the sources of its frontend, so a cache entry is
+    never loaded into nodes with a different layout, nor reused after the
+    parser or the transformations changed.
+
+    """
+    classes = []
+    for name, cls in sorted(_node_classes(c_ast_module).items()):
+        slots = [list(getattr(c, '__slots__', ())) for c in cls.__mro__]
+        classes.append([name, slots])
+    frontend_dir = os.path.dirname(os.path.abspath(c_ast_module.__file__))
+    data = json.dumps([IR_VERSION, c_ast_module.__name__,
+                       source_digest(frontend_dir), classes])
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def _node_classes(c_ast_module):
+    base = c_ast_module.C_ASTNode
+    return dict((name, cls) for name, cls in vars(c_ast_module).items()
+                if isinstance(cls, type) and issubclass(cls, base))
+
+
+# maps node classes to the names of all their slots
+_slots = {}
+
+
+def _slot_names(cls):
+    names = _slots.get(cls)
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            names.extend(klass.__dict__.get('__slots__', ()))
+        _slots[cls] = names
+    return names
+
+
+# Marks an unset slot
+_UNSET = object()
+
+
+# The types of the values which are stored as they are
+_PLAIN = frozenset([str, int, float, bool])
+
+
+class _Encoder(object):
+    """ Turns c_ast nodes into a table of json values. A node is a list
+    of its class name and a dict of its set slots, a reference to a node
+    is {"n": its index}. Tuples are {"t": [...]}; lists, strings, numbers,
+    booleans and None are stored as they are.
+
+    The root nodes (c_ast.File) are left out and stored as None. They are
+    only referred to by the `context` of the toplevel items, which the
+    transformations don't need anymore, and would pull in every item of
+    the translation unit.
+
+    """
+    def __init__(self, c_ast_module):
+        self.base = c_ast_module.C_ASTNode
+        self.root_class = getattr(c_ast_module, 'File', None)
+        self.nodes = []
+        self.indices = {}
+        self.pending = []
+
+    def value(self, value):
+        if value is None or value.__class__ in _PLAIN:
+            return value
+        if isinstance(value, self.base):
+            if value.__class__ is self.root_class:
+                return None
+            index = self.indices.get(id(value))
+            if index is None:
+                index = self.indices[id(value)] = len(self.nodes)
+                self.nodes.append(None)
+                self.pending.append(value)
+            return {'n': index}
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        if isinstance(value, tuple):
+            return {'t': [self.value(item) for item in value]}
+        if isinstance(value, (str, int, float)):
+            return value
+        raise TypeError('Can\'t store %r in the IR cache' % (value,))
+
+    def encode(self, items):
+        refs = self.value(items)
+        while self.pending:
+            node = self.pending.pop()
+            slots = {}
+            for name in _slot_names(node.__class__):
+                value = getattr(node, name, _UNSET)
+                if value is not _UNSET:
+                    slots[name] = self.value(value)
+            self.nodes[self.indices[id(node)]] = [node.__class__.__name__,
+                                                  slots]
+        return {'nodes': self.nodes, 'items': refs}
+
+
+def _decode(data, c_ast_module):
+    """ Returns the items of the table `data` written by _Encoder. Only
+    the node classes of `c_ast_module` and their slots are accepted,
+    anything else raises a ValueError.
+
+    """
+    classes = _node_classes(c_ast_module)
+    intern_name = getattr(c_ast_module, 'intern_name', lambda name: name)
+    entries = data['nodes']
+    nodes = []
+    for class_name, slots in entries:
+        cls = classes.get(class_name)
+        if cls is None:
+            raise ValueError('Unknown node class %r' % (class_name,))
+        nodes.append(cls.__new__(cls))
+
+    def decode(value):
+        if value is None or value.__class__ in _PLAIN:
+            return value
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        if isinstance(value, dict):
+            if 'n' in value:
+                return nodes[value['n']]
+            return tuple(decode(item) for item in value['t'])
+        return value
+
+    for node, (class_name, slots) in zip(nodes, entries):
+        names = _slot_names(node.__class__)
+        for name, data_value in slots.items():
+            if name not in names:
+                raise ValueError('Unknown slot %s.%s' % (class_name, name))
+            if name == 'name':
+                data_value = intern_name(data_value)
+            setattr(node, name, decode(data_value))
+    return decode(data['items'])
+
+
+def dumps(items, c_ast_module):
+    """ Returns the compressed serialized form of the c_ast `items`.
+
+    """
+    data = _Encoder(c_ast_module).encode(items)
+    return zlib.compress(json.dumps(data, separators=(',', ':'))
+                         .encode('utf-8'))
+
+
+def loads(data, c_ast_module):
+    """ Returns the c_ast items serialized by dumps(). The data is json,
+    so loading it never runs code, even if the shared cache directory was
+    tampered with.
+
+    """
+    return _decode(json.loads(zlib.decompress(data).decode('utf-8')),
+                   c_ast_module)
+
+
+class IRCache(object):
+    """ An on-disk cache of the transformed c_ast items of headers, the
+    output of the parser after apply_c_ast_transformations.
+
+    A header and the clang arguments (or whatever `args` the frontend
+    passes) map to a json manifest, which records the fingerprints of the
+    files the items were parsed from and the digest of the serialized
+    items. The items themselves are stored in a file named after that
+    digest, so headers with the same items share it and an entry is
+    never read into other items. Manifests and items are written to
+    uniquely named temporary files and renamed, so processes on several
+    machines can share the cache directory.
+
+    The key of a manifest is the digest of the contents of the header and
+    its path relative to `root` (the current directory by default), and
+    the files in the manifest under `root` are recorded relative to it as
+    well, so checkouts at different places share the entries. Frontends
+    pass paths in `args` through relative().
+
+    Loading the items skips parsing, so e.g. changing the options of the
+    renderer doesn't parse the headers again.
+
+    """
+    def __init__(self, cache_dir, c_ast_module, root=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.c_ast_module = c_ast_module
+        self.root = os.path.abspath(root or os.getcwd())
+        self.schema = schema_key(c_ast_module)
+        self.hits = 0
+        self.misses = 0
+
+    def relative(self, path):
+        """ Returns `path` relative to `root` if it is inside of it,
+        otherwise its absolute path.
+
+        """
+        path = os.path.abspath(path)
+        try:
+            relpath = os.path.relpath(path, self.root)
+        except ValueError:
+            # on another drive
+            return path
+        if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+            return path
+        return relpath
+
+    def _absolute(self, path):
+        return os.path.join(self.root, path)
+
+    def _key(self, path, args):
+        data = json.dumps([self.schema, self.relative(path),
+                           file_digest(path), args], sort_keys=True)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _manifest_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _items_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.ir')
+
+    def load(self, path, args):
+        """ Returns the cached (items, dependencies) of the header `path`
+        parsed with `args`, or None if there is no up to date entry.
+
+        """
+        try:
+            with open(self._manifest_path(self._key(path, args))) as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        includes = [[self._absolute(fingerprint[0])] + fingerprint[1:]
+                    for fingerprint in manifest.get('includes', [])]
+        if manifest.get('schema') != self.schema or \
+                not all(fingerprint_unchanged(fp) for fp in includes):
+            self.misses += 1
+            return None
+
+        items_path = self._items_path(manifest['items'])
+        try:
+            # A partially copied or corrupted file is just a miss
+            if file_digest(items_path) != manifest['items']:
+                raise ValueError(items_path)
+            with open(items_path, 'rb') as f:
+                items = loads(f.read(), self.c_ast_module)
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return items, [fingerprint[0] for fingerprint in includes]
+
+    def store(self, path, args, items, dependencies):
+        """ Saves the `items` of the header `path` parsed with `args` from
+        the files `dependencies` to the cache.
+
+        """
+        includes = []
+        for name in dependencies:
+            if os.path.isfile(name):
+                fingerprint = file_fingerprint(name)
+                fingerprint[0] = self.relative(name)
+                includes.append(fingerprint)
+        data = dumps(items, self.c_ast_module)
+        digest = hashlib.sha1(data).hexdigest()
+
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(self.cache_dir):
+                    raise
+
+        items_path = self._items_path(digest)
+        if not os.path.exists(items_path):
+            self._write(items_path, data)
+        manifest = {'version': IR_VERSION, 'schema': self.schema,
+                    'path': self.relative(path), 'args': args,
+                    'includes': includes,
+                    'items': digest}
+        self._write(self._manifest_path(self._key(path, args)),
+                    json.dumps(manifest).encode('utf-8'))
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,142 @@
+# Stdlib imports
+import hashlib
+import os
+
+
+def file_digest(path):
+    """ Returns the sha1 hex digest of the contents of the file at
+    `path`.
+
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def same_contents(path, other_path):
+    """ Returns True if the files at `path` and `other_path` exist and
+    have the same contents.
+
+    """
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+    except OSError:
+        return False
+    return file_digest(path) == file_digest(other_path)
+
+
+def file_fingerprint(path):
+    """ Returns a [path, size, mtime, digest] list describing the
+    current state of the file at `path`.
+
+    """
+    st = os.stat(path)
+    return [path, st.st_size, st.st_mtime, file_digest(path)]
+
+
+def fingerprint_unchanged(fingerprint):
+    """ Checks if the file described by `fingerprint` is still the same.
+    The size and mtime are checked first, the contents are only hashed
+    when the mtime changed (e.g. after a fresh checkout).
+
+    """
+    path, size, mtime, digest = fingerprint
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != size:
+        return False
+    if st.st_mtime == mtime:
+        return True
+    return file_digest(path) == digest
+
+
+class AtomicFile(object):
+    """ A text file which is written to a temporary file next to `path`
+    and renamed to `path` when it is closed, so readers never see it half
+    written. If `only_if_changed` is set and `path` already has the same
+    contents, it is left alone and keeps its mtime. After closing,
+    `changed` tells whether `path` was replaced.
+
+    Used as a context manager, the temporary file is discarded if the
+    block raises.
+
+    """
+    def __init__(self, path, only_if_changed=False):
+        self.path = path
+        self.only_if_changed = only_if_changed
+        self.changed = None
+        self._tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        self._file = open(self._tmp_path, 'w')
+        self.write = self._file.write
+
+    def close(self):
+        """ Replaces `path` by the written contents, unless they are the
+        same and `only_if_changed` is set.
+
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.only_if_changed and same_contents(self.path, self._tmp_path):
+            os.remove(self._tmp_path)
+            self.changed = False
+        else:
+            os.replace(self._tmp_path, self.path)
+            self.changed = True
+
+    def discard(self):
+        """ Removes the temporary file without touching `path`.
+
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self._tmp_path)
+        self.changed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def depfile_escape(path):
+    """ Escapes `path` for a make rule.
+
+    """
+    return path.replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+
+
+def depfile_path(path):
+    """ Returns the path of the depfile of the output file `path`, e.g.
+    '_foo.d' for '_foo.pxd'.
+
+    """
+    return os.path.splitext(path)[0] + '.d'
+
+
+def write_depfile(path, target, dependencies, only_if_changed=False):
+    """ Writes a make style depfile to `path`, which makes `target`
+    depend on the `dependencies` that exist as files. Like with gcc -MP,
+    every dependency also gets an empty rule, so make doesn't fail when a
+    header is removed. Returns True if `path` was replaced.
+
+    """
+    dependencies = [dep for dep in dependencies if os.path.isfile(dep)]
+    with AtomicFile(path, only_if_changed) as f:
+        f.write(depfile_escape(target) + ':')
+        for dep in dependencies:
+            f.write(' \\\n  ' + depfile_escape(dep))
+        f.write('\n')
+        for dep in dependencies:
+            f.write('\n%s:\n' % depfile_escape(dep))
+    return f.changed
@@ -0,0 +1,132 @@
+""" An asyncio pipeline generating the files of a Config.
+
+Config.generate() parses all headers before the first file is rendered.
+The pipeline instead connects the stages with bounded queues, so while a
+header is parsed the previous ones are transformed, rendered and written:
+
+    parse  ->  transform and render  ->  write
+
+Every stage runs in its own thread, one header after another. libclang
+releases the GIL while it parses, so the parse of a header overlaps with
+the rendering of the previous headers. The transformations and the
+renderer are both pure python and hold the GIL, so they share a stage.
+The queues hold at most `queue_size` headers, which bounds the memory
+used by a large batch of headers.
+
+The event loop itself only moves headers between the stages and stays
+responsive, so an async build tool can embed cwrap:
+
+    await config.generate_async()
+
+A frontend takes part in the pipeline with a `parse_asts(config)`
+function returning an iterator of its parsed containers, one per header,
+and a `transform_asts(containers)` function turning them into
+ASTContainers. For other frontends the iterator of generate_asts(config)
+is the parse stage.
+
+"""
+import asyncio
+import concurrent.futures
+
+from . import frontends
+from . import stats
+from . import trace
+from .backend import cw_ast, renderer
+
+
+tracer = trace.get_tracer('config')
+
+
+# Marks the end of the headers in a queue
+_DONE = object()
+
+
+class Pipeline(object):
+    """ Generates the files of `config` like Config._generate(), with the
+    files written by `writer`, its Config. Written files are recorded in
+    the dependency graph `graph`, if given.
+
+    """
+    def __init__(self, writer, config, graph=None, queue_size=4):
+        self.writer = writer
+        self.config = config
+        self.graph = graph
+        self.queue_size = queue_size
+
+        frontend = frontends.get_frontend(config.frontend)
+        validate = config.metadata.get('validate_ast', False)
+        parse_asts = getattr(frontend, 'parse_asts', None)
+        if parse_asts is None:
+            self.parsed = cw_ast.validating(validate, frontend.generate_asts,
+                                            config)
+            self.transform = lambda container: [container]
+        else:
+            self.parsed = parse_asts(config)
+            self.transform = lambda container: cw_ast.validating(
+                validate, frontend.transform_asts, [container])
+
+    async def run(self):
+        """ Runs the stages until all files are written. If a stage
+        fails the others are cancelled and the exception is raised.
+
+        """
+        loop = asyncio.get_running_loop()
+        parsed = asyncio.Queue(self.queue_size)
+        rendered = asyncio.Queue(self.queue_size)
+        # the threads are named after their stage in the timeline
+        executors = [concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix='cwrap-' + stage)
+            for stage in ('parse', 'render', 'write')]
+        tasks = [
+            asyncio.ensure_future(self._parse(loop, executors[0], parsed)),
+            asyncio.ensure_future(
+                self._render(loop, executors[1], parsed, rendered)),
+            asyncio.ensure_future(self._write(loop, executors[2], rendered))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            # a stage which was cancelled still finishes its header
+            for executor in executors:
+                executor.shutdown(wait=False)
+
+    async def _parse(self, loop, executor, parsed):
+        while True:
+            container = await loop.run_in_executor(executor, next,
+                                                   self.parsed, _DONE)
+            await parsed.put(container)
+            if container is _DONE:
+                break
+
+    async def _render(self, loop, executor, parsed, rendered):
+        ast_renderer = renderer.ASTRenderer()
+
+        def render(container):
+            results = []
+            for ast_container in self.transform(container):
+                with stats.phase('render',
+                                 stats.container_path(ast_container)):
+                    code = ast_renderer.render(ast_container.module)
+                results.append((ast_container, code))
+            return results
+
+        while True:
+            container = await parsed.get()
+            if container is _DONE:
+                await rendered.put(_DONE)
+                break
+            for item in await loop.run_in_executor(executor, render,
+                                                   container):
+                await rendered.put(item)
+
+    async def _write(self, loop, executor, rendered):
+        while True:
+            item = await rendered.get()
+            if item is _DONE:
+                break
+            await loop.run_in_executor(executor, self.writer._write_code,
+                                       item[0], item[1], self.graph)
@@ -0,0 +1,345 @@
+""" A long running cwrap server.
+
+Loading libclang and importing the frontend takes longer than parsing a
+small header. A build which runs cwrap for many headers can start a
+server once instead, which keeps libclang and its index loaded, and let
+every cwrap run send its config to it:
+
+    bin/cwrap --server &
+    bin/cwrap -o pxd foo.h       # generated by the server
+
+The server listens on a unix socket. Requests and responses are JSON-RPC
+2.0 objects, one per line. The methods are:
+
+    generate(config, cwd, trace_levels)
+                            runs Config.from_dict(config).generate() in the
+                            directory `cwd` with the `trace_levels` (see
+                            trace.get_spec) and returns {'output': the
+                            messages written meanwhile}, which include the
+                            diagnostics of the headers
+    ping()                  returns {'pid': the pid of the server,
+                            'version': version.source_digest()}
+    shutdown()              stops the server after answering
+
+The server keeps a Session for the headers and options of the last
+configs it generated: the translation units of the headers and their
+rendered code. Generating the same config again only reparses the
+headers which depend on a changed file and writes the code of the others
+as it is.
+
+A client only uses a server of its own version, see generate(), so a
+server started from another checkout is never used by accident.
+
+Requests are handled one after another, so they don't share the global
+state of the frontend (the libclang index, the tracers) concurrently.
+
+"""
+import collections
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import traceback
+
+from . import frontends
+from . import trace
+from .backend import cw_ast
+from .config import Config
+from .depgraph import options_key
+from .version import source_digest
+
+
+tracer = trace.get_tracer('server')
+
+# Seconds a client waits for the server to accept or answer a request,
+# except for the generate requests, which take as long as they take
+TIMEOUT = 10.0
+
+
+def default_socket_path():
+    """ Returns the socket path from the CWRAP_SOCKET environment
+    variable, or a per user path in the temporary directory.
+
+    """
+    path = os.environ.get('CWRAP_SOCKET')
+    if path:
+        return path
+    user = getattr(os, 'getuid', lambda: 0)()
+    return os.path.join(tempfile.gettempdir(), 'cwrap-%d.sock' % user)
+
+
+class ServerError(RuntimeError):
+    """ Raised by the client for an error response of the server.
+
+    """
+
+
+class Session(object):
+    """ What the server keeps between the requests for the same headers
+    and options: the `watcher` of the frontend, which holds the parsed
+    translation units (see frontends.clang.watch.Watcher), and the
+    rendered code of every header.
+
+    A request reparses the headers which depend on a changed file with
+    TranslationUnit.reparse and renders them again, the code of all
+    other headers is written as it was rendered before. The headers are
+    reparsed one after another, whatever `jobs` is.
+
+    """
+    def __init__(self, watcher):
+        self.watcher = watcher
+        # maps header paths to the (container, code) of their last render
+        self.results = {}
+
+    def render(self, config):
+        """ Returns the (container, code) tuples of the headers of
+        `config`, see Config.generate().
+
+        """
+        containers = cw_ast.validating(
+            config.metadata.get('validate_ast', False), self.watcher.update)
+        for container, code in config._render_containers(containers):
+            self.results[container.header_file.path] = (container, code)
+        return [self.results[header_file.path]
+                for header_file in config.files]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """ Answers the requests of a connection until it is closed.
+
+    """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.dispatch(line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if self.server.stopping:
+                break
+
+
+class Server(socketserver.UnixStreamServer):
+    """ The server listening on the unix socket `path`. The `frontend`
+    is loaded before the socket is bound, so a frontend which fails to
+    load leaves no socket behind. The Sessions of the last
+    `max_sessions` configs are kept.
+
+    """
+    def __init__(self, path=None, frontend='clang', max_sessions=8):
+        self.path = path or default_socket_path()
+        self.frontend = frontend
+        self.stopping = False
+        self.max_sessions = max_sessions
+        # maps session keys to Sessions, the most recently used last
+        self.sessions = collections.OrderedDict()
+        if os.path.exists(self.path):
+            if ping(self.path) is not None:
+                raise ServerError('A server is already listening on %s' %
+                                  self.path)
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise ServerError('%s is not a socket' % self.path)
+            # left behind by a server which didn't stop cleanly
+            os.remove(self.path)
+        frontend = frontends.get_frontend(frontend)
+        init_worker = getattr(frontend, 'init_worker', None)
+        if init_worker is not None:
+            init_worker()
+        socketserver.UnixStreamServer.__init__(self, self.path,
+                                               RequestHandler)
+
+    def serve(self):
+        """ Handles requests until the shutdown method is called, then
+        removes the socket.
+
+        """
+        try:
+            if tracer.info:
+                tracer.write(trace.INFO, 'Listening on %s' % self.path)
+            self.serve_forever()
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def dispatch(self, line):
+        """ Returns the response to the request `line`.
+
+        """
+        request_id = None
+        try:
+            request = json.loads(line.decode('utf-8'))
+            request_id = request.get('id')
+            method = getattr(self, 'rpc_' + request['method'], None)
+            if method is None:
+                raise ValueError('Unknown method %s' % request['method'])
+            result = method(**request.get('params', {}))
+        except Exception as e:
+            if tracer.error:
+                tracer.write(trace.ERROR, traceback.format_exc())
+            return {'jsonrpc': '2.0', 'id': request_id,
+                    'error': {'code': -32000, 'message': str(e),
+                              'data': e.__class__.__name__}}
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def session(self, config, cwd):
+        """ Returns the Session of the headers and options of `config` in
+        the directory `cwd`, a new one if there is none yet. Returns None
+        if the frontend can't keep the headers parsed, or the config
+        parses them in an umbrella unit or counts the calls of the
+        frontend (the `umbrella` and `ffi_stats` options).
+
+        """
+        frontend = frontends.get_frontend(config.frontend)
+        watcher = getattr(frontend, 'Watcher', None)
+        if watcher is None or config.metadata.get('umbrella') or \
+                config.metadata.get('ffi_stats'):
+            return None
+        key = json.dumps([cwd, options_key(config),
+                          [header_file.to_dict()
+                           for header_file in config.files]],
+                         sort_keys=True, default=repr)
+        session = self.sessions.pop(key, None)
+        if session is None:
+            session = Session(watcher(config))
+        self.sessions[key] = session
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return session
+
+    def rpc_generate(self, config, cwd, trace_levels=None):
+        config = Config.from_dict(config)
+        if tracer.info:
+            tracer.write(trace.INFO, 'Generating %d headers in %s' %
+                         (len(config.files), cwd))
+        old_cwd = os.getcwd()
+        os.chdir(cwd)
+        try:
+            with trace.capture(trace_levels) as output:
+                session = self.session(config, cwd)
+                if session is None:
+                    config.generate()
+                else:
+                    self._generate(config, session)
+        finally:
+            os.chdir(old_cwd)
+        return {'output': output.getvalue()}
+
+    def _generate(self, config, session):
+        try:
+            config.generate(session.render)
+        except BaseException:
+            # the session may have reparsed headers without keeping their
+            # code, it is the most recently used one
+            self.sessions.popitem()
+            raise
+
+    def rpc_ping(self):
+        return {'pid': os.getpid(), 'version': source_digest()}
+
+    def rpc_shutdown(self):
+        # shutdown() waits for serve_forever() to return, which runs in
+        # this thread, so it is called from another one
+        self.stopping = True
+        threading.Thread(target=self.shutdown).start()
+        return True
+
+
+class Client(object):
+    """ A connection to the server listening on `path`. Raises
+    socket.error (OSError) if there is none. Connecting and waiting for
+    a response time out after `timeout` seconds (None waits forever),
+    raising socket.timeout, which is a socket.error as well.
+
+    """
+    def __init__(self, path=None, timeout=TIMEOUT):
+        self.path = path or default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except socket.error:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile('rb')
+        self.next_id = 0
+
+    def call(self, method, **params):
+        """ Calls `method` of the server and returns its result. Raises
+        ServerError if the server responds with an error.
+
+        """
+        self.next_id += 1
+        request = {'jsonrpc': '2.0', 'id': self.next_id, 'method': method,
+                   'params': params}
+        self.sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        line = self.rfile.readline()
+        if not line:
+            raise ServerError('The server closed the connection')
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise ServerError(response['error']['message'])
+        return response['result']
+
+    def settimeout(self, timeout):
+        """ Sets the `timeout` of the following calls.
+
+        """
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def ping(path=None):
+    """ Returns the ping result ({'pid': ..., 'version': ...}) of the
+    server listening on `path`, or None if there is none.
+
+    """
+    try:
+        with Client(path) as client:
+            return client.call('ping')
+    except (socket.error, ServerError, ValueError):
+        return None
+
+
+def generate(config, path=None):
+    """ Lets the server listening on `path` generate the files of
+    `config` with the trace levels of this process, and writes the
+    messages of the server to the trace stream. Returns False without
+    doing anything if there is no server or it runs another version of
+    cwrap, so the caller can fall back to config.generate().
+
+    """
+    try:
+        client = Client(path)
+    except socket.error:
+        return False
+    with client:
+        try:
+            info = client.call('ping')
+        except (socket.error, ServerError, ValueError):
+            # e.g. a server which is stopping and closes the connection
+            return False
+        if not isinstance(info, dict) or \
+                info.get('version') != source_digest():
+            if tracer.info:
+                tracer.write(trace.INFO, 'Not using the server on %s, it '
+                             'runs another version' % client.path)
+            return False
+        client.settimeout(None)
+        result = client.call('generate', config=config.to_dict(),
+                             cwd=os.getcwd(),
+                             trace_levels=trace.get_spec())
+    trace.write_text(result['output'])
+    return True
@@ -0,0 +1,268 @@
+""" Per header statistics of a run.
+
+While statistics are collected, the stages of cwrap record the wall and
+cpu time of their phases and count what they processed, per header:
+
+    with stats.phase('parse', path):
+        ...
+    stats.count('cursors', len(cursors), path)
+
+When no statistics are collected and no timeline is recorded phase()
+returns a shared no-op context manager and count() returns at once.
+Counts which are expensive to compute are guarded with active():
+
+    if stats.active():
+        stats.count('c_ast_nodes', c_ast.count_nodes(items), path)
+
+Config.generate() collects the statistics of a run with the `stats`
+option, other callers use collect():
+
+    with stats.collect() as report:
+        list(config.generate_asts())
+    report.write('stats.json')
+
+The phases of the clang frontend are parse (libclang), walk (the parser),
+ir_cache (loading and storing the c_ast items), transform (the c_ast
+transformations) and translate (the c_ast to cw_ast transformer), those
+of Config are render and write. A file which is streamed to disk while
+it is rendered is written in the render phase. The cpu time is that of
+the thread running the phase. A frontend can add the calls of foreign
+functions per phase, see Stats.add_calls() and current_phase().
+
+"""
+import json
+import threading
+import time
+
+from . import timeline
+from .output import AtomicFile
+
+
+# Bump when the layout of the json report changes
+STATS_VERSION = 1
+
+# The Stats being collected, None when off
+_stats = None
+
+# The `phase` of a thread is the name of the innermost phase it runs
+_local = threading.local()
+
+
+class HeaderStats(object):
+    """ The phase times and the counters of a single header.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        # maps phase names to [wall, cpu] seconds
+        self.phases = {}
+        self.counters = {}
+
+    def add_time(self, phase, wall, cpu):
+        times = self.phases.get(phase)
+        if times is None:
+            self.phases[phase] = [wall, cpu]
+        else:
+            times[0] += wall
+            times[1] += cpu
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for phase, (wall, cpu) in other.phases.items():
+            self.add_time(phase, wall, cpu)
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_dict(self):
+        phases = dict((phase, {'wall': wall, 'cpu': cpu})
+                      for phase, (wall, cpu) in self.phases.items())
+        return {'path': self.path, 'phases': phases,
+                'counters': dict(self.counters),
+                'wall': sum(wall for wall, cpu in self.phases.values()),
+                'cpu': sum(cpu for wall, cpu in self.phases.values())}
+
+
+class Stats(object):
+    """ The HeaderStats of all headers of a run, in the order they were
+    first seen.
+
+    """
+    def __init__(self):
+        self.headers = {}
+        # maps (phase, function) to [calls, seconds] of the foreign
+        # function calls made in the phase, see add_calls()
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def header(self, path):
+        """ Returns the HeaderStats of `path`, creating it on first use.
+
+        """
+        header = self.headers.get(path)
+        if header is None:
+            with self._lock:
+                header = self.headers.setdefault(path, HeaderStats(path))
+        return header
+
+    def merge(self, other):
+        """ Adds the statistics of the Stats `other`, e.g. those of a
+        worker process.
+
+        """
+        for path, header in other.headers.items():
+            self.header(path).merge(header)
+        self.add_calls(other.calls)
+
+    def add_calls(self, calls):
+        """ Adds the foreign function calls `calls`, a dict mapping
+        (phase, function) to [calls, seconds].
+
+        """
+        with self._lock:
+            for key, (n, seconds) in calls.items():
+                total = self.calls.setdefault(key, [0, 0.0])
+                total[0] += n
+                total[1] += seconds
+
+    def totals(self):
+        """ Returns a HeaderStats with the sums of all headers.
+
+        """
+        totals = HeaderStats(None)
+        for header in self.headers.values():
+            totals.merge(header)
+        return totals
+
+    def to_dict(self):
+        data = {'version': STATS_VERSION,
+                'headers': [header.to_dict()
+                            for header in self.headers.values()],
+                'totals': self.totals().to_dict()}
+        if self.calls:
+            data['calls'] = [
+                {'phase': phase, 'function': name, 'calls': n,
+                 'time': seconds}
+                for (phase, name), (n, seconds) in sorted(
+                    self.calls.items(), key=lambda item: -item[1][1])]
+        return data
+
+    def write(self, path):
+        """ Writes the statistics as json to the file at `path`.
+
+        """
+        with AtomicFile(path) as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    def __getstate__(self):
+        return {'headers': self.headers, 'calls': self.calls}
+
+    def __setstate__(self, state):
+        self.headers = state['headers']
+        self.calls = state['calls']
+        self._lock = threading.Lock()
+
+
+class _Phase(object):
+
+    __slots__ = ('name', 'path', 'wall', 'cpu', 'outer')
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'phase', None)
+        _local.phase = self.name
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = time.perf_counter()
+        if _stats is not None:
+            _stats.header(self.path).add_time(
+                self.name, end - self.wall, time.thread_time() - self.cpu)
+        events = timeline.active()
+        if events is not None:
+            events.add(self.name, self.wall, end, {'header': self.path})
+        _local.phase = self.outer
+
+
+class _NoPhase(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+
+_no_phase = _NoPhase()
+
+
+def active():
+    """ Returns the Stats being collected, or None.
+
+    """
+    return _stats
+
+
+def current_phase():
+    """ Returns the name of the phase the calling thread is in, or None
+    if it is in none or neither statistics nor a timeline are recorded.
+
+    """
+    return getattr(_local, 'phase', None)
+
+
+def container_path(container):
+    """ Returns the header the ASTContainer `container` is attributed to,
+    the path of its header file or else its filename.
+
+    """
+    header_file = container.header_file
+    return header_file.path if header_file is not None \
+        else container.filename
+
+
+def phase(name, path):
+    """ Returns a context manager recording the time spent in it as the
+    phase `name` of the header `path`, in the statistics and as an event
+    of the timeline (see timeline.Timeline) being recorded.
+
+    """
+    if _stats is None and timeline.active() is None:
+        return _no_phase
+    return _Phase(name, path)
+
+
+def count(name, n, path):
+    """ Adds `n` to the counter `name` of the header `path`.
+
+    """
+    if _stats is not None:
+        _stats.header(path).count(name, n)
+
+
+class collect(object):
+    """ A context manager collecting the statistics of the code run in
+    it into the Stats `report`, a new one by default. Returns the Stats.
+
+    """
+    def __init__(self, report=None):
+        self.report = report if report is not None else Stats()
+
+    def __enter__(self):
+        global _stats
+        self.previous = _stats
+        _stats = self.report
+        return _stats
+
+    def __exit__(self, exc_type, exc_value, tb):
+        global _stats
+        _stats = self.previous
@@ -0,0 +1,143 @@
+""" A timeline of a run in the Chrome trace event format.
+
+While a Timeline is recorded, every phase of a header (see stats.phase)
+becomes a complete event ('X') with the process and thread it ran in,
+and the header as its argument. The json file can be opened in
+chrome://tracing or https://ui.perfetto.dev, which show one track per
+thread, so the critical path of a run, stalls of the pipeline stages
+(see pipeline.Pipeline) and the load of the worker processes of a
+parallel run are visible at a glance.
+
+Config.generate() records the timeline with the `timeline` option, other
+callers use record():
+
+    with timeline.record() as events:
+        list(config.generate_asts())
+    events.write('timeline.json')
+
+The timestamps are those of time.perf_counter(), which is the same
+monotonic clock in all processes on Linux, so the events of worker
+processes line up with those of the parent.
+
+"""
+import json
+import os
+import threading
+import time
+
+from .output import AtomicFile
+
+
+# The Timeline being recorded, None when off
+_timeline = None
+
+
+class Timeline(object):
+    """ The trace events of a run.
+
+    """
+    def __init__(self):
+        self.events = []
+        # maps (pid, tid) to the name of the thread
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, args=None):
+        """ Adds a complete event `name` of the calling thread from
+        `start` to `end`, in perf_counter() seconds.
+
+        """
+        thread = threading.current_thread()
+        key = (os.getpid(), thread.ident)
+        event = {'name': name, 'ph': 'X', 'pid': key[0], 'tid': key[1],
+                 'ts': start * 1e6, 'dur': (end - start) * 1e6}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+            if key not in self.threads:
+                self.threads[key] = thread.name
+
+    def merge(self, other):
+        """ Adds the events of the Timeline `other`, e.g. those of a
+        worker process.
+
+        """
+        with self._lock:
+            self.events.extend(other.events)
+            self.threads.update(other.threads)
+
+    def to_dict(self):
+        events = list(self.events)
+        pids = set()
+        for (pid, tid), name in sorted(self.threads.items()):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': tid, 'args': {'name': name}})
+            pids.add(pid)
+        for pid in sorted(pids):
+            name = 'cwrap' if pid == os.getpid() else 'cwrap worker'
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'args': {'name': '%s %d' % (name, pid)}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        """ Writes the timeline as json to the file at `path`.
+
+        """
+        with AtomicFile(path) as f:
+            json.dump(self.to_dict(), f)
+            f.write('\n')
+
+    def __getstate__(self):
+        return {'events': self.events, 'threads': self.threads}
+
+    def __setstate__(self, state):
+        self.events = state['events']
+        self.threads = state['threads']
+        self._lock = threading.Lock()
+
+
+def active():
+    """ Returns the Timeline being recorded, or None.
+
+    """
+    return _timeline
+
+
+class span(object):
+    """ A context manager adding an event `name` for the time spent in
+    it to the Timeline being recorded, if any.
+
+    """
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if _timeline is not None:
+            _timeline.add(self.name, self.start, time.perf_counter(),
+                          self.args)
+
+
+class record(object):
+    """ A context manager recording the events of the code run in it
+    into the Timeline `events`, a new one by default. Returns the
+    Timeline.
+
+    """
+    def __init__(self, events=None):
+        self.events = events if events is not None else Timeline()
+
+    def __enter__(self):
+        global _timeline
+        self.previous = _timeline
+        _timeline = self.events
+        return _timeline
+
+    def __exit__(self, exc_type, exc_value, tb):
+        global _timeline
+        _timeline = self.previous
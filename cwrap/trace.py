@@ -0,0 +1,169 @@
+""" Level gated tracing.
+
+Every subsystem (e.g. 'parser', 'types') has a Tracer whose level decides
+which messages are written. The boolean attributes of a tracer are meant
+to guard the call sites, so the arguments of a message aren't even
+computed when its level is off:
+
+    tracer = trace.get_tracer('parser')
+    ...
+    if tracer.debug:
+        tracer.write(trace.DEBUG, 'cursor:', cursor.kind)
+
+The levels can be set with set_level() or configure(), which takes a
+specification like 'info' or 'parser=debug,types=info'. The environment
+variable CWRAP_TRACE is read on import with the same syntax. get_spec()
+returns the specification of the current levels, e.g. to run another
+process with them, and capture() collects the messages instead of
+writing them out.
+
+"""
+import io
+import os
+import sys
+
+
+OFF = 0
+ERROR = 1
+WARNING = 2
+INFO = 3
+DEBUG = 4
+
+LEVELS = {'off': OFF, 'error': ERROR, 'warning': WARNING, 'info': INFO,
+          'debug': DEBUG}
+
+# Messages are written to `stream`, None means the current sys.stdout
+stream = None
+
+_default_level = WARNING
+_tracers = {}
+
+
+class Tracer(object):
+    """ The tracer of a single subsystem.
+
+    """
+    def __init__(self, name, level):
+        self.name = name
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = level
+        self.error = level >= ERROR
+        self.warning = level >= WARNING
+        self.info = level >= INFO
+        self.debug = level >= DEBUG
+
+    def enabled(self, level):
+        return level <= self.level
+
+    def write(self, level, *args, **kwargs):
+        """ Writes the `args` separated by spaces, if `level` is on. The
+        optional keyword argument `indent` gives the indentation depth.
+
+        """
+        if level > self.level:
+            return
+        indent = kwargs.get('indent', 0)
+        write_text('\t' * indent + ' '.join(map(str, args)) + '\n')
+
+
+def write_text(text):
+    """ Writes the already formatted messages `text`, e.g. those
+    collected by capture() in another process.
+
+    """
+    out = stream if stream is not None else sys.stdout
+    out.write(text)
+
+
+def get_tracer(name):
+    """ Returns the Tracer of the subsystem `name`, creating it at the
+    default level on first use.
+
+    """
+    tracer = _tracers.get(name)
+    if tracer is None:
+        tracer = _tracers[name] = Tracer(name, _default_level)
+    return tracer
+
+
+def set_level(level, subsystem=None):
+    """ Sets the level of `subsystem`, or the default level and the
+    level of all existing tracers if no subsystem is given. `level` is
+    one of the level constants or its name.
+
+    """
+    global _default_level
+    if not isinstance(level, int):
+        try:
+            level = LEVELS[level.lower()]
+        except KeyError:
+            raise ValueError('Unknown trace level %r' % level)
+    if subsystem is not None:
+        get_tracer(subsystem).set_level(level)
+        return
+    _default_level = level
+    for tracer in _tracers.values():
+        tracer.set_level(level)
+
+
+def configure(spec):
+    """ Sets the levels from a specification like 'info' or
+    'parser=debug,types=info'. Entries without a subsystem set the
+    default level and are applied first.
+
+    """
+    entries = [entry.strip() for entry in spec.split(',') if entry.strip()]
+    entries.sort(key=lambda entry: '=' in entry)
+    for entry in entries:
+        if '=' in entry:
+            subsystem, level = entry.split('=', 1)
+            set_level(level.strip(), subsystem.strip())
+        else:
+            set_level(entry)
+
+
+def get_spec():
+    """ Returns the specification of the current levels for configure():
+    the default level followed by the subsystems with another level.
+
+    """
+    names = dict((level, name) for name, level in LEVELS.items())
+    entries = [names[_default_level]]
+    for name, tracer in sorted(_tracers.items()):
+        if tracer.level != _default_level:
+            entries.append('%s=%s' % (name, names[tracer.level]))
+    return ','.join(entries)
+
+
+class capture(object):
+    """ A context manager collecting the messages written in it instead
+    of writing them out, with the levels of the specification `spec` if
+    given. Returns the io.StringIO holding the messages. The previous
+    stream and levels are restored on exit.
+
+    """
+    def __init__(self, spec=None):
+        self.spec = spec
+        self.output = io.StringIO()
+
+    def __enter__(self):
+        global stream
+        self.previous = (stream, _default_level,
+                         dict((name, tracer.level)
+                              for name, tracer in _tracers.items()))
+        stream = self.output
+        if self.spec is not None:
+            configure(self.spec)
+        return self.output
+
+    def __exit__(self, exc_type, exc_value, tb):
+        global stream, _default_level
+        stream, _default_level, levels = self.previous
+        for name, tracer in _tracers.items():
+            tracer.set_level(levels.get(name, _default_level))
+
+
+if os.environ.get('CWRAP_TRACE'):
+    configure(os.environ['CWRAP_TRACE'])
@@ -1,3 +1,6 @@
+import hashlib
+import os
+
 
 # Sufficiently protect the version from being 
 # modified at run time
@@ -11,3 +14,33 @@ class version(object):
         return '.'.join([self.__major__, self.__minor__, self.__bugfix__])
 
 version = version()
+
+
+# maps directories to the digests of their sources
+_source_digests = {}
+
+
+def source_digest(directory=None):
+    """ Returns the version followed by a digest of the python sources in
+    `directory`, by default those of the whole cwrap package. Unlike the
+    version it changes with every change of the code, so it tells apart
+    processes and caches of different checkouts.
+
+    """
+    if directory is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+    digest = _source_digests.get(directory)
+    if digest is None:
+        sha = hashlib.sha1()
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    relpath = os.path.relpath(path, directory)
+                    sha.update(relpath.encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        sha.update(b'\0' + f.read() + b'\0')
+        digest = _source_digests[directory] = '%s-%s' % (
+            version(), sha.hexdigest()[:16])
+    return digest
@@ -0,0 +1,3 @@
+typedef int included_t;
+
+int included_function(void);
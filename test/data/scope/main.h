@@ -0,0 +1,3 @@
+#include "included.h"
+
+int main_function(included_t x);
@@ -0,0 +1,6 @@
+struct shared {
+    const char *a;
+    const char *b;
+    int c;
+    int d;
+};
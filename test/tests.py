@@ -1,9 +1,35 @@
+import asyncio
+import hashlib
+import inspect
+import io
+import json
 import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
 import unittest
+import zlib
+from unittest import mock
 
-from cwrap import frontends
-from cwrap.backend import renderer
+from cwrap import frontends, ir_cache, server, stats, trace, version
+from cwrap.backend import cw_ast, renderer
 from cwrap.config import Config, File
+from cwrap.depgraph import DependencyGraph, options_key
+from cwrap.ir_cache import IRCache
+from cwrap.output import AtomicFile, depfile_path, write_depfile
+from cwrap.frontends.clang import ast_transforms, c_ast, clang_parser, pch, \
+    umbrella
+from cwrap.frontends.clang.cursor_table import CursorTable
+from cwrap.frontends.clang.decl_store import DeclarationStore
+from cwrap.frontends.clang.clang import cindex
+from cwrap.frontends.clang.clang.cindex import CursorKind
+from cwrap.frontends.clang.diagnostics import DiagnosticSet
+from cwrap.frontends.clang.include_profile import profile_includes
+from cwrap.frontends.clang.tu_cache import TUCache
+from cwrap.frontends.clang.watch import Watcher
+from cwrap.frontends.gccxml import c_ast as gccxml_c_ast
 
 
 def create_tst(filename):
@@ -20,14 +46,15 @@ class TestFiles(unittest.TestCase):
     def setUp(self):
         self.frontend = frontends.get_frontend('clang')
 
-    def convert(self, filename):
+    def convert(self, filename, **metadata):
         files = [File(filename)]
-        config = Config('clang', files=files)
+        config = Config('clang', files=files, **metadata)
         asts = self.frontend.generate_asts(config)
         print('\n\n\nvmx: asts:\n', asts, '\n\n\n\n\n')
         ast_renderer = renderer.ASTRenderer()
         for ast_container in asts:
             mod_node = ast_container.module
+            cw_ast.validate(mod_node)
             code = ast_renderer.render(mod_node)
             output = []
             for line in code.splitlines():
@@ -46,6 +73,1067 @@ class TestFiles(unittest.TestCase):
         return output
 
 
+class TempDirTestCase(unittest.TestCase):
+    """ A test case with a temporary directory `tmp_dir`, removed after
+    each test.
+
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def write(self, name, contents):
+        """ Writes `contents` to the file `name` in `tmp_dir`, returns its
+        path.
+
+        """
+        path = self.path(name)
+        with open(path, 'w') as f:
+            f.write(contents)
+        return path
+
+
+class TestTUCache(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = self.path('cache')
+        self.write('common.h', 'typedef int common_t;\n')
+        self.header = self.write('a.h',
+                                 '#include "common.h"\ncommon_t a(void);\n')
+        self.index = clang_parser.get_index()
+        self.cache = TUCache(self.cache_dir)
+
+    def store(self, args):
+        tu = self.index.parse(self.header, args=args,
+                              options=clang_parser.PARSE_OPTIONS)
+        self.cache.store(tu, self.header, args)
+
+    def test_hit(self):
+        self.assertIsNone(self.cache.load(self.index, self.header, []))
+        self.store([])
+        tu = self.cache.load(self.index, self.header, [])
+        self.assertIsNotNone(tu)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        names = [cursor.spelling for cursor in tu.cursor.get_children()]
+        self.assertIn('a', names)
+
+    def test_created_concurrently(self):
+        def makedirs(path, *args):
+            # another worker creates the directory first
+            os.mkdir(path)
+            raise FileExistsError(path)
+
+        with mock.patch.object(os, 'makedirs', side_effect=makedirs):
+            self.store([])
+        self.assertIsNotNone(self.cache.load(self.index, self.header, []))
+
+    def test_include_changed(self):
+        self.store([])
+        self.write('common.h', 'typedef long common_t;\n')
+        self.assertIsNone(self.cache.load(self.index, self.header, []))
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+
+    def test_args_changed(self):
+        self.store([])
+        self.assertIsNone(self.cache.load(self.index, self.header,
+                                          ['-DX']))
+        self.assertIsNotNone(self.cache.load(self.index, self.header, []))
+
+    def test_pch_not_cached(self):
+        args = ['-include-pch', self.path('missing.pch')]
+        tu = self.index.parse(self.header, options=clang_parser.PARSE_OPTIONS)
+        self.cache.store(tu, self.header, args)
+        self.assertFalse(os.path.exists(self.cache_dir))
+        self.assertIsNone(self.cache.load(self.index, self.header, args))
+
+
+class TestParallel(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        data_dir = os.path.join(curdir, 'data')
+        self.files = [File(os.path.join(data_dir, name))
+                      for name in sorted(os.listdir(data_dir))
+                      if name.endswith('.h')]
+
+    def test_same_files(self):
+        serial_dir = self.path('serial')
+        parallel_dir = self.path('parallel')
+        os.mkdir(serial_dir)
+        os.mkdir(parallel_dir)
+        Config('clang', self.files, serial_dir).generate()
+        Config('clang', self.files, parallel_dir, jobs=3).generate()
+        names = sorted(os.listdir(serial_dir))
+        self.assertEqual(len(self.files), len(names))
+        self.assertEqual(names, sorted(os.listdir(parallel_dir)))
+        for name in names:
+            with open(os.path.join(serial_dir, name)) as f:
+                code = f.read()
+            with open(os.path.join(parallel_dir, name)) as f:
+                self.assertEqual(code, f.read())
+
+    def test_render(self):
+        config = Config('clang', self.files, jobs=3)
+        self.assertEqual(list(config.render()),
+                         list(config.render_parallel()))
+
+
+class TestPrelude(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pch_dir = self.path('pch')
+        self.write('common.h', 'typedef int common_t;\n')
+        self.write('a.h', '/* a */\n#ifndef A_H\n#define A_H\n'
+                          '#include <common.h>\n#include <other.h>\n'
+                          '#include "local.h"\ncommon_t a(void);\n#endif\n')
+        self.write('b.h', '#include <common.h>\n#include <more.h>\n'
+                          'common_t b(void);\n')
+        self.args = clang_parser.clang_args([self.tmp_dir], '')
+
+    def test_common_prelude(self):
+        self.assertEqual(['<common.h>', '<other.h>', '"local.h"'],
+                         pch.leading_includes(self.path('a.h')))
+        self.assertEqual(['<common.h>'], pch.common_prelude(
+            [self.path('a.h'), self.path('b.h')]))
+        self.assertEqual(['<common.h>', '<other.h>'],
+                         pch.common_prelude([self.path('a.h')]))
+
+    def test_reused(self):
+        index = clang_parser.get_index()
+        options = clang_parser.PARSE_OPTIONS
+        prelude = pch.Prelude(['common.h'], self.pch_dir)
+        pch_args = prelude.args(index, self.args, options)
+        self.assertEqual('-include-pch', pch_args[0])
+        self.assertEqual([self.path('common.h')],
+                         prelude.dependencies(self.args))
+        os.utime(pch_args[1], (0, 0))
+
+        # Another run uses the PCH as long as the prelude didn't change
+        prelude = pch.Prelude(['common.h'], self.pch_dir)
+        self.assertEqual(pch_args, prelude.args(index, self.args, options))
+        self.assertEqual(0, os.path.getmtime(pch_args[1]))
+        self.write('common.h', 'typedef long common_t;\n')
+        prelude = pch.Prelude(['common.h'], self.pch_dir)
+        self.assertEqual(pch_args, prelude.args(index, self.args, options))
+        self.assertNotEqual(0, os.path.getmtime(pch_args[1]))
+
+    def test_broken(self):
+        prelude = pch.Prelude(['missing.h'], self.pch_dir)
+        diagnostics = DiagnosticSet()
+        items = clang_parser.parse(self.path('b.h'), [self.tmp_dir], '',
+                                   prelude=prelude, diagnostics=diagnostics)
+        self.assertIn('b', [item.name for item in items])
+        self.assertIn("'missing.h' file not found",
+                      [diag.spelling for diag in diagnostics.errors()])
+        self.assertEqual([], prelude.args(None, self.args, 0))
+        self.assertEqual([], [name for name in os.listdir(self.pch_dir)
+                              if not name.endswith('.h')])
+
+    def test_default_dir(self):
+        index = clang_parser.get_index()
+        options = clang_parser.PARSE_OPTIONS
+        with mock.patch.object(tempfile, 'gettempdir',
+                               return_value=self.tmp_dir):
+            pch_dir = pch.default_pch_dir()
+            self.assertTrue(pch_dir.startswith(self.tmp_dir))
+            prelude = pch.Prelude(['common.h'])
+            self.assertEqual(pch_dir, prelude.pch_dir)
+            self.assertTrue(prelude.args(index, self.args, options))
+            self.assertEqual(0, os.stat(pch_dir).st_mode & 0o077)
+
+            # a directory others can write to isn't trusted
+            os.chmod(pch_dir, 0o777)
+            prelude = pch.Prelude(['common.h'])
+            self.assertEqual([], prelude.args(index, self.args, options))
+
+    def test_prepare_config(self):
+        clang = frontends.get_frontend('clang')
+        config = Config('clang', [File(self.path('a.h')),
+                                  File(self.path('b.h'))],
+                        include_dirs=[self.tmp_dir], pch='auto',
+                        pch_dir=self.pch_dir)
+        prepared = clang.prepare_config(config)
+        self.assertEqual(['<common.h>'], prepared.metadata['pch'])
+        self.assertEqual('auto', config.metadata['pch'])
+        # the workers find the PCH built already
+        self.assertEqual(1, len([name for name in os.listdir(self.pch_dir)
+                                 if name.endswith('.pch')]))
+
+
+class TestHeaderScope(unittest.TestCase):
+
+    convert = TestFiles.convert
+
+    def setUp(self):
+        self.frontend = frontends.get_frontend('clang')
+        self.filename = os.path.join(curdir, 'data', 'scope', 'main.h')
+
+    def test_all(self):
+        result = self.convert(self.filename)
+        self.assertIn('ctypedef int included_t', result)
+        self.assertIn('int included_function()', result)
+        self.assertIn('int main_function(included_t x)', result)
+
+    def test_main(self):
+        result = self.convert(self.filename, header_scope='main')
+        self.assertNotIn('ctypedef int included_t', result)
+        self.assertNotIn('int included_function()', result)
+        self.assertIn('int main_function(included_t x)', result)
+
+    def test_glob(self):
+        result = self.convert(self.filename, header_scope=['scope/incl*.h'])
+        self.assertIn('ctypedef int included_t', result)
+        self.assertIn('int included_function()', result)
+        self.assertNotIn('int main_function(included_t x)', result)
+
+    def test_exclude(self):
+        result = self.convert(self.filename, header_scope=['!included.h'])
+        self.assertNotIn('ctypedef int included_t', result)
+        self.assertNotIn('int included_function()', result)
+        self.assertIn('int main_function(included_t x)', result)
+
+        result = self.convert(self.filename,
+                              header_scope=['scope/*.h', '!main.h'])
+        self.assertIn('ctypedef int included_t', result)
+        self.assertNotIn('int main_function(included_t x)', result)
+
+
+class TestCursorTable(unittest.TestCase):
+
+    def test_children(self):
+        filename = os.path.join(curdir, 'data', 'union_in_struct.h')
+        tu = clang_parser.get_index().parse(filename)
+        table = CursorTable(tu)
+
+        # Every row has to have the same children as its cursor
+        for row, cursor in enumerate(table.cursors):
+            expected = list(cursor.get_children())
+            children = table.children(row)
+            self.assertEqual([c.hash for c in expected],
+                             [c.hash for c in children])
+            for expected_child, child in zip(expected, children):
+                self.assertEqual(row, table.parents[child._row])
+                location = expected_child.location
+                if location.file is not None:
+                    self.assertEqual((location.file.name, location.line),
+                                     table.location(child._row))
+
+
+class TestTypeCache(unittest.TestCase):
+
+    def test_shared_types(self):
+        filename = os.path.join(curdir, 'data', 'types', 'shared.h')
+        items = clang_parser.parse(filename, [], '')
+        struct = [item for item in items if item.name == 'shared'][0]
+        a, b, c, d = struct.members
+        self.assertIs(a.typ, b.typ)
+        self.assertIs(c.typ, d.typ)
+        self.assertIsNot(a.typ, c.typ)
+
+
+class TestDiagnostics(unittest.TestCase):
+
+    def test_deduplication(self):
+        filename = os.path.join(curdir, 'data', 'diagnostics', 'error.h')
+        diagnostics = DiagnosticSet()
+        clang_parser.parse(filename, [], '', diagnostics=diagnostics)
+        errors = diagnostics.errors()
+        self.assertTrue(errors)
+        self.assertEqual(os.path.abspath(filename),
+                         os.path.abspath(errors[0].filename))
+        self.assertEqual(1, errors[0].line)
+
+        # Parsing the same header again doesn't add new diagnostics
+        count = len(diagnostics)
+        clang_parser.parse(filename, [], '', diagnostics=diagnostics)
+        self.assertEqual(count, len(diagnostics))
+        self.assertEqual(2, diagnostics.count(errors[0]))
+
+
+class TestDispatch(unittest.TestCase):
+
+    def test_parser_visitors(self):
+        class Parser(clang_parser.ClangParser):
+            def visit_STRUCT_DECL(self, cursor, level):
+                pass
+
+        base = clang_parser.ClangParser()
+        parser = Parser()
+        struct = CursorKind.STRUCT_DECL.value
+        self.assertIs(clang_parser.ClangParser.visit_STRUCT_DECL,
+                      base.visitors[struct])
+        self.assertIs(Parser.visit_STRUCT_DECL, parser.visitors[struct])
+        self.assertIs(clang_parser.ClangParser.visit_FUNCTION_DECL,
+                      base.visitors[CursorKind.CXX_METHOD.value])
+        # kinds unknown to the bindings aren't handled
+        self.assertIs(clang_parser.ClangParser.unhandled_element,
+                      base.visitors[100000])
+
+
+class TestNodes(unittest.TestCase):
+
+    # slots which stay unset until a later stage assigns them
+    optional = set(['typedef_name', 'const', 'volatile'])
+
+    def node_classes(self, module, base):
+        return [cls for name, cls in sorted(vars(module).items())
+                if isinstance(cls, type) and issubclass(cls, base) and
+                cls is not base]
+
+    def check_nodes(self, module, base):
+        for cls in self.node_classes(module, base):
+            self.assertIn('__slots__', cls.__dict__, cls.__name__)
+            slots = set()
+            for klass in cls.__mro__:
+                slots.update(klass.__dict__.get('__slots__', ()))
+            params = list(inspect.signature(cls).parameters)
+            args = [object() for param in params]
+            node = cls(*args)
+            self.assertFalse(hasattr(node, '__dict__'), cls.__name__)
+            self.assertRaises(AttributeError, setattr, node, 'missing', 1)
+            # every argument is stored in the slot of the same name and
+            # all other slots have their defaults
+            for param, arg in zip(params, args):
+                if param in slots:
+                    self.assertIs(arg, getattr(node, param))
+            for slot in slots - set(params) - self.optional:
+                self.assertTrue(hasattr(node, slot),
+                                '%s.%s' % (cls.__name__, slot))
+
+    def test_c_ast(self):
+        self.check_nodes(c_ast, c_ast.C_ASTNode)
+        self.check_nodes(gccxml_c_ast, gccxml_c_ast.C_ASTNode)
+        pointer = c_ast.PointerType(c_ast.FundamentalType('int'), 8, 8)
+        self.assertEqual((None, ''), (pointer.location, pointer.name))
+        struct = c_ast.Struct('s')
+        self.assertEqual(([], None), (struct.members, struct.context))
+        self.assertFalse(hasattr(struct, 'typedef_name'))
+
+    def test_cw_ast(self):
+        validation = cw_ast.set_validation(False)
+        try:
+            self.check_nodes(cw_ast, cw_ast.CWAN)
+        finally:
+            cw_ast.set_validation(validation)
+
+    def test_intern(self):
+        name = ''.join(['common', '_t'])
+        self.assertIsNot(name, 'common_t')
+        typedef = c_ast.Typedef(name, None, None)
+        field = c_ast.Field(''.join(['common_', 't']), None, None)
+        self.assertIs(typedef.name, field.name)
+        self.assertIs(sys.intern(name), typedef.name)
+        self.assertIsNone(c_ast.intern_name(None))
+        self.assertIs(gccxml_c_ast.intern_name(name), typedef.name)
+
+
+class TestValidation(unittest.TestCase):
+
+    def tearDown(self):
+        cw_ast.set_validation(True)
+
+    def test_switch(self):
+        self.assertRaises(AssertionError, cw_ast.Name, 3, cw_ast.Param)
+        self.assertTrue(cw_ast.set_validation(False))
+        name = cw_ast.Name(3, cw_ast.Param)
+        field = cw_ast.CName(cw_ast.TypeName(name), 'field')
+        tree = cw_ast.Module([cw_ast.StructDef('s', [cw_ast.Expr(field)])])
+        self.assertRaises(AssertionError, cw_ast.validate, tree)
+        name.id = 'int'
+        cw_ast.validate(tree)
+
+    def test_no_leak(self):
+        def names():
+            yield cw_ast.Name(3, cw_ast.Param)
+            yield cw_ast.Name(4, cw_ast.Param)
+
+        unchecked = cw_ast.validating(False, names)
+        next(unchecked)
+        # the suspended generator doesn't turn the checks off for others
+        self.assertRaises(AssertionError, cw_ast.Name, 3, cw_ast.Param)
+        thread_errors = []
+        thread = threading.Thread(target=lambda: thread_errors.append(
+            self.assertRaises(AssertionError, cw_ast.Name, 3, cw_ast.Param)))
+        thread.start()
+        thread.join()
+        self.assertEqual(1, len(thread_errors))
+        self.assertEqual(4, next(unchecked).id)
+
+        checked = cw_ast.validating(True, names)
+        cw_ast.set_validation(False)
+        self.assertRaises(AssertionError, next, checked)
+        cw_ast.set_validation(True)
+
+        files = [File(os.path.join(curdir, 'data', name))
+                 for name in ('enum.h', 'function.h')]
+        asts = Config('clang', files).generate_asts()
+        next(asts)
+        self.assertRaises(AssertionError, cw_ast.Name, 3, cw_ast.Param)
+        self.assertEqual(1, len(list(asts)))
+
+
+class TestStreamingRenderer(unittest.TestCase):
+
+    def test_chunks(self):
+        fields = [cw_ast.Expr(cw_ast.CName(
+                    cw_ast.TypeName(cw_ast.Name('int', cw_ast.Param)), name))
+                  for name in ('a', 'b')]
+        body = [cw_ast.CTypedefDecl(cw_ast.StructDef('s%d' % i, fields))
+                for i in range(3)]
+        module = cw_ast.Module([cw_ast.CdefDecl([],
+                                                cw_ast.ExternFrom('s.h', body))])
+        ast_renderer = renderer.ASTRenderer()
+        expected = ast_renderer.render(module)
+        chunks = list(ast_renderer.iter_render(module))
+        self.assertTrue(len(chunks) > len(body))
+        self.assertEqual(expected, ''.join(chunks))
+        sink = io.StringIO()
+        ast_renderer.render_to(module, sink)
+        self.assertEqual(expected, sink.getvalue())
+
+
+class TestAtomicFile(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.out_path = self.path('out.pxd')
+
+    def write_out(self, contents, only_if_changed=True):
+        with AtomicFile(self.out_path, only_if_changed) as f:
+            f.write(contents)
+        self.assertEqual([os.path.basename(self.out_path)],
+                         os.listdir(self.tmp_dir))
+        return f.changed
+
+    def test_if_changed(self):
+        self.assertTrue(self.write_out('a'))
+        self.assertFalse(self.write_out('a'))
+        self.assertTrue(self.write_out('a', only_if_changed=False))
+        self.assertTrue(self.write_out('b'))
+        with open(self.out_path) as f:
+            self.assertEqual('b', f.read())
+
+    def test_discard(self):
+        self.write_out('a')
+        try:
+            with AtomicFile(self.out_path) as f:
+                f.write('b')
+                raise ValueError
+        except ValueError:
+            pass
+        with open(self.out_path) as f:
+            self.assertEqual('a', f.read())
+        self.assertEqual(['out.pxd'], os.listdir(self.tmp_dir))
+
+
+class TestDepfile(TempDirTestCase):
+
+    def test_depfile(self):
+        header = self.write('my header.h', 'int foo(void);\n')
+        target = self.path('_test.pxd')
+        dependencies = []
+        clang_parser.parse(header, [], '', dependencies=dependencies)
+        self.assertEqual([header], dependencies)
+
+        path = depfile_path(target)
+        self.assertEqual(self.path('_test.d'), path)
+        missing = self.path('missing.h')
+        self.assertTrue(write_depfile(path, target, [header, missing], True))
+        self.assertFalse(write_depfile(path, target, [header], True))
+        escaped = header.replace(' ', '\\ ')
+        with open(path) as f:
+            self.assertEqual('%s: \\\n  %s\n\n%s:\n' % (target, escaped,
+                                                       escaped), f.read())
+
+
+class TestDependencyGraph(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('common.h', 'typedef int common_t;\n')
+        self.write('a.h', '#include "common.h"\ncommon_t a(void);\n')
+        self.write('b.h', 'int b(void);\n')
+        self.files = [File(self.path(name))
+                      for name in ('a.h', 'b.h')]
+        self.graph_path = self.path('graph.json')
+
+    def generate(self):
+        config = Config('clang', self.files, self.tmp_dir,
+                        dep_graph=self.graph_path)
+        config.generate()
+        return DependencyGraph.load(self.graph_path, options_key(config))
+
+    def test_incremental(self):
+        graph = self.generate()
+        self.assertEqual([], graph.dirty_files(self.files, self.tmp_dir))
+        header = graph.headers[self.files[0].path]
+        self.assertEqual(['_a.pxd'], header['outputs'])
+
+        # Only the header including the changed file is generated again
+        self.write('common.h', 'typedef long common_t;\n')
+        b_pxd = self.path('_b.pxd')
+        os.utime(b_pxd, (0, 0))
+        graph = DependencyGraph.load(self.graph_path, graph.key)
+        self.assertEqual([self.files[0]],
+                         graph.dirty_files(self.files, self.tmp_dir))
+        self.generate()
+        self.assertEqual(0, os.path.getmtime(b_pxd))
+        with open(self.path('_a.pxd')) as f:
+            self.assertIn('long', f.read())
+
+        # A missing output is generated again
+        os.remove(b_pxd)
+        graph = self.generate()
+        self.assertTrue(os.path.exists(b_pxd))
+        self.assertEqual([], graph.dirty_files(self.files, self.tmp_dir))
+
+        # Other options invalidate the graph
+        config = Config('clang', self.files, self.tmp_dir,
+                        dep_graph=self.graph_path, language='c')
+        graph = DependencyGraph.load(self.graph_path, options_key(config))
+        self.assertEqual(self.files,
+                         graph.dirty_files(self.files, self.tmp_dir))
+
+    def test_options(self):
+        self.generate()
+        # Options which don't change the code keep the headers clean
+        config = Config('clang', self.files, self.tmp_dir,
+                        dep_graph=self.graph_path, stats=True,
+                        validate_ast=True, write_if_changed=True)
+        self.assertEqual(options_key(config), self.generate().key)
+        report = config.generate()
+        self.assertEqual({}, report.headers)
+
+        # The options of a File only invalidate its header
+        files = [File(self.files[0].path, extern_name='_x'), self.files[1]]
+        graph = self.generate()
+        self.assertEqual([files[0]], graph.dirty_files(files, self.tmp_dir))
+
+
+class TestWatcher(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('common.h', 'typedef int common_t;\n')
+        self.write('a.h', '#include "common.h"\ncommon_t a(void);\n')
+        self.write('b.h', 'int b(void);\n')
+        files = [File(self.path(name))
+                 for name in ('a.h', 'b.h')]
+        self.watcher = Watcher(Config('clang', files, self.tmp_dir))
+
+    def render(self, ast_containers):
+        ast_renderer = renderer.ASTRenderer()
+        return dict((ast_container.filename,
+                     ast_renderer.render(ast_container.module))
+                    for ast_container in ast_containers)
+
+    def test_reparse(self):
+        self.assertEqual(['_a.pxd', '_b.pxd'],
+                         sorted(self.render(self.watcher.start())))
+        self.assertEqual({}, self.render(self.watcher.poll()))
+
+        self.write('common.h', 'typedef long common_t;\n')
+        code = self.render(self.watcher.poll())
+        self.assertEqual(['_a.pxd'], list(code))
+        self.assertIn('long', code['_a.pxd'])
+        self.assertEqual({}, self.render(self.watcher.poll()))
+
+        self.write('b.h', 'int b(void);\nint b2(void);\n')
+        code = self.render(self.watcher.poll())
+        self.assertEqual(['_b.pxd'], list(code))
+        self.assertIn('b2', code['_b.pxd'])
+
+    def test_saved_while_parsing(self):
+        self.render(self.watcher.start())
+        tu = self.watcher.headers[0].tu
+        reparse = tu.reparse
+
+        def reparse_and_save():
+            reparse()
+            self.write('common.h', 'typedef short common_t;\n')
+        tu.reparse = reparse_and_save
+
+        self.write('common.h', 'typedef long common_t;\n')
+        code = self.render(self.watcher.poll())
+        self.assertIn('long', code['_a.pxd'])
+        del tu.reparse
+        code = self.render(self.watcher.poll())
+        self.assertEqual(['_a.pxd'], list(code))
+        self.assertIn('short', code['_a.pxd'])
+
+
+class TestServer(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.socket_path = self.path('cwrap.sock')
+        self.header = self.write('a.h', 'int a(void);\n')
+
+    def test_config_dict(self):
+        config = Config('clang', [File(self.header, extern_name='_x')],
+                        self.tmp_dir, 2, include_dirs=['inc'])
+        copy = Config.from_dict(json.loads(json.dumps(config.to_dict())))
+        self.assertEqual(config.to_dict(), copy.to_dict())
+        self.assertEqual('_x', copy.files[0].metadata['extern_name'])
+
+    def serve(self, srv):
+        thread = threading.Thread(target=srv.serve)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(srv.shutdown)
+
+    def test_generate(self):
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        self.assertIsNone(server.ping(self.socket_path))
+        self.assertFalse(server.generate(config, self.socket_path))
+
+        srv = server.Server(self.socket_path)
+        self.serve(srv)
+        self.assertEqual({'pid': os.getpid(),
+                          'version': version.source_digest()},
+                         server.ping(self.socket_path))
+        self.assertTrue(server.generate(config, self.socket_path))
+        self.assertTrue(os.path.exists(
+            self.path('_a.pxd')))
+        with server.Client(self.socket_path) as client:
+            self.assertRaises(server.ServerError, client.call, 'missing')
+            self.assertTrue(client.call('shutdown'))
+        self.doCleanups()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_output(self):
+        self.write('a.h', 'int a(void)\n')
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        self.serve(server.Server(self.socket_path))
+        # the messages are written at the levels of the client
+        with trace.capture('info') as output:
+            self.assertTrue(server.generate(config, self.socket_path))
+        messages = output.getvalue()
+        self.assertIn('%s:1:12: error:' % self.header, messages)
+        self.assertIn('Rendering', messages)
+        with trace.capture('off') as output:
+            self.assertTrue(server.generate(config, self.socket_path))
+        self.assertEqual('', output.getvalue())
+        # the diagnostics of a header which isn't parsed again as well
+        with trace.capture('warning') as output:
+            self.assertTrue(server.generate(config, self.socket_path))
+        self.assertIn('%s:1:12: error:' % self.header, output.getvalue())
+
+    def test_warm(self):
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        pxd = self.path('_a.pxd')
+        self.serve(server.Server(self.socket_path))
+        with mock.patch.object(clang_parser, 'parse_tu',
+                               wraps=clang_parser.parse_tu) as parse_tu:
+            self.assertTrue(server.generate(config, self.socket_path))
+            self.assertEqual(1, parse_tu.call_count)
+
+            # the same request again only writes the kept code
+            os.remove(pxd)
+            self.assertTrue(server.generate(config, self.socket_path))
+            self.assertEqual(1, parse_tu.call_count)
+            with open(pxd) as f:
+                self.assertIn('int a()', f.read())
+
+            # a changed header is reparsed
+            self.write('a.h', 'int changed(int x);\n')
+            self.assertTrue(server.generate(config, self.socket_path))
+            self.assertEqual(2, parse_tu.call_count)
+            with open(pxd) as f:
+                self.assertIn('int changed(int x)', f.read())
+
+    def test_ping_fails(self):
+        class StoppingServer(server.Server):
+            def rpc_ping(self):
+                raise RuntimeError('stopping')
+
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        self.serve(StoppingServer(self.socket_path))
+        self.assertFalse(server.generate(config, self.socket_path))
+
+    def test_frontend_fails(self):
+        clang = frontends.get_frontend('clang')
+        with mock.patch.object(clang, 'init_worker',
+                               side_effect=OSError('no libclang')):
+            self.assertRaises(OSError, server.Server, self.socket_path)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_timeout(self):
+        # a socket nobody answers on
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(self.socket_path)
+        sock.listen(1)
+        with server.Client(self.socket_path, timeout=0.1) as client:
+            self.assertRaises(socket.timeout, client.call, 'ping')
+
+    def test_other_version(self):
+        class OldServer(server.Server):
+            def rpc_ping(self):
+                return os.getpid()
+
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        self.serve(OldServer(self.socket_path))
+        self.assertFalse(server.generate(config, self.socket_path))
+        self.assertFalse(os.path.exists(
+            self.path('_a.pxd')))
+
+
+class TestDeclarationStore(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('common.h', 'struct outer { struct inner { int a; } in; };\n'
+                   'typedef struct { int q; } anon_t;\n'
+                   'typedef struct named { int z; } named_t;\n'
+                   'enum e { E1, E2 };\n'
+                   'int shared(named_t *n, enum e value);\n')
+        self.files = []
+        for name in ('a', 'b'):
+            self.write(name + '.h', '#include "common.h"\nint %s(void);\n'
+                       % name)
+            self.files.append(File(self.path(name + '.h')))
+
+    def render(self, **options):
+        config = Config('clang', self.files, self.tmp_dir, **options)
+        return list(config.render())
+
+    def test_same_code(self):
+        self.assertEqual(self.render(), self.render(share_declarations=True))
+
+    def test_reused(self):
+        store = DeclarationStore()
+        first = clang_parser.parse(self.files[0].path, [], '', store=store)
+        self.assertEqual(0, store.hits)
+        second = clang_parser.parse(self.files[1].path, [], '', store=store)
+        shared = set(id(node) for node in first) & \
+            set(id(node) for node in second)
+        names = [node.name for node in second if id(node) in shared]
+        for name in ('e', 'named', 'named_t', 'shared'):
+            self.assertIn(name, names)
+        # The struct with a nested struct is flattened, so it's not shared
+        self.assertNotIn('outer', names)
+        self.assertEqual(len(names), store.hits)
+
+
+class TestIRCache(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = self.path('cache')
+        self.header = self.write(
+            'a.h', 'struct outer { struct inner { int a; } in; };\n'
+                   'typedef struct { int q; } anon_t;\n'
+                   'int a(struct outer *o, anon_t t);\n')
+
+    def render(self, **options):
+        config = Config('clang', [File(self.header)], self.tmp_dir, **options)
+        return list(config.render())
+
+    def test_same_code(self):
+        code = self.render()
+        self.assertEqual(code, self.render(ir_cache_dir=self.cache_dir))
+        self.assertEqual(code, self.render(ir_cache_dir=self.cache_dir))
+
+    def test_load(self):
+        cache = IRCache(self.cache_dir, c_ast)
+        self.assertIsNone(cache.load(self.header, []))
+        items = clang_parser.parse(self.header, [], '')
+        trans_items = ast_transforms.apply_c_ast_transformations(items)
+        cache.store(self.header, [], trans_items, [self.header])
+        self.assertIsNone(cache.load(self.header, ['-DX']))
+        loaded, dependencies = cache.load(self.header, [])
+        self.assertEqual([self.header], dependencies)
+        self.assertEqual([item.name for item in trans_items],
+                         [item.name for item in loaded])
+        self.assertEqual(1, cache.hits)
+
+        self.write('a.h', 'int b(void);\n')
+        self.assertIsNone(cache.load(self.header, []))
+
+    def test_round_trip(self):
+        items = ast_transforms.apply_c_ast_transformations(
+            clang_parser.parse(self.header, [], ''))
+        loaded = ir_cache.loads(ir_cache.dumps(items, c_ast), c_ast)
+        self.assertEqual(c_ast.count_nodes(items), c_ast.count_nodes(loaded))
+        function = [item for item in loaded if item.name == 'a'][0]
+        self.assertEqual(['o', 't'], [arg.name for arg in function.arguments])
+        self.assertEqual(items[0].location, loaded[0].location)
+        self.assertIsInstance(loaded[0].location, tuple)
+
+    def test_untrusted(self):
+        cache = IRCache(self.cache_dir, c_ast)
+        cache.store(self.header, [], [c_ast.FundamentalType('int')], [])
+        manifest_path = cache._manifest_path(cache._key(self.header, []))
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for nodes in ([['Pickler', {}]], [['FundamentalType', {'x': 1}]]):
+            data = zlib.compress(json.dumps(
+                {'nodes': nodes, 'items': [{'n': 0}]}).encode('utf-8'))
+            self.assertRaises(ValueError, ir_cache.loads, data, c_ast)
+            manifest['items'] = hashlib.sha1(data).hexdigest()
+            with open(cache._items_path(manifest['items']), 'wb') as f:
+                f.write(data)
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f)
+            self.assertIsNone(cache.load(self.header, []))
+
+    def test_moved(self):
+        # a checkout at another place uses the same entries
+        first = self.path('first')
+        os.mkdir(first)
+        self.write('first/common.h', 'typedef int common_t;\n')
+        self.write('first/b.h', '#include "common.h"\ncommon_t b(void);\n')
+        second = self.path('second')
+        shutil.copytree(first, second)
+
+        cache = IRCache(self.cache_dir, c_ast, first)
+        header = os.path.join(first, 'b.h')
+        dependencies = []
+        items = ast_transforms.apply_c_ast_transformations(
+            clang_parser.parse(header, [first], '',
+                               dependencies=dependencies))
+        cache.store(header, [cache.relative(first)], items, dependencies)
+
+        cache = IRCache(self.cache_dir, c_ast, second)
+        loaded, dependencies = cache.load(os.path.join(second, 'b.h'),
+                                          [cache.relative(second)])
+        self.assertEqual([item.name for item in items],
+                         [item.name for item in loaded])
+        self.assertEqual(set([os.path.join(second, 'b.h'),
+                              os.path.join(second, 'common.h')]),
+                         set(dependencies))
+
+    def test_frontend_changed(self):
+        schema = ir_cache.schema_key(c_ast)
+        with mock.patch.object(ir_cache, 'source_digest',
+                               return_value='other'):
+            self.assertNotEqual(schema, ir_cache.schema_key(c_ast))
+
+
+class TestUmbrella(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.files = []
+        for name, contents in [
+                ('common.h', 'struct common { int c; };\n'),
+                ('a.h', '#include "common.h"\n'
+                        'struct outer { struct inner { int i; } in; };\n'
+                        'int a(struct common *c, struct outer *o);\n'),
+                ('b.h', '#include "common.h"\n'
+                        'typedef struct { int q; } anon_t;\n'
+                        'void b(struct common *c, anon_t t);\n')]:
+            path = self.write(name, contents)
+            if name != 'common.h':
+                self.files.append(File(path))
+
+    def render(self, **options):
+        config = Config('clang', self.files, self.tmp_dir, **options)
+        return list(config.render())
+
+    def test_same_code(self):
+        code = self.render(header_scope='main')
+        self.assertEqual(code, self.render(umbrella=True))
+
+    def test_scope(self):
+        code = dict(self.render(umbrella=True, header_scope=['!*/b.h']))
+        self.assertIn('int a(', code['_a.pxd'])
+        self.assertNotIn('void b(', code['_b.pxd'])
+        code = dict(self.render(umbrella=True, header_scope=['!*.h']))
+        self.assertNotIn('int a(', code['_a.pxd'])
+        self.assertEqual(dict(self.render(umbrella=True)),
+                         dict(self.render(umbrella=True,
+                                          header_scope='nosystem')))
+
+    def test_partition(self):
+        source = umbrella.umbrella_source(self.files)
+        name = self.path(umbrella.UMBRELLA_NAME)
+        items = clang_parser.parse([(name, source)], [], '')
+        a_items, b_items = umbrella.partition(items, self.files)
+        self.assertEqual(['outer', 'a'], [item.name for item in a_items])
+        self.assertIn('b', [item.name for item in b_items])
+        self.assertNotIn('common', [item.name for item in b_items])
+
+
+class TestPipeline(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        data_dir = os.path.join(curdir, 'data')
+        self.files = [File(os.path.join(data_dir, name))
+                      for name in sorted(os.listdir(data_dir))
+                      if name.endswith('.h')]
+
+    def test_same_files(self):
+        sync_dir = self.path('sync')
+        async_dir = self.path('async')
+        os.mkdir(sync_dir)
+        os.mkdir(async_dir)
+        Config('clang', self.files, sync_dir).generate()
+        config = Config('clang', self.files, async_dir, depfiles=True)
+        asyncio.run(config.generate_async(queue_size=1))
+        names = sorted(os.listdir(sync_dir))
+        self.assertEqual(names, sorted(name for name in os.listdir(async_dir)
+                                       if not name.endswith('.d')))
+        for name in names:
+            with open(os.path.join(sync_dir, name)) as f:
+                code = f.read()
+            with open(os.path.join(async_dir, name)) as f:
+                self.assertEqual(code, f.read())
+
+    def test_error(self):
+        save_dir = self.path('missing')
+        config = Config('clang', self.files, save_dir)
+        self.assertRaises(IOError, asyncio.run, config.generate_async())
+
+
+class TestStats(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.header = self.write(
+            'a.h', 'struct outer { struct inner { int a; } in; };\n'
+                   'int a(struct outer *o);\n')
+
+    def test_generate(self):
+        path = self.path('stats.json')
+        config = Config('clang', [File(self.header)], self.tmp_dir,
+                        stats=path, ir_cache_dir=self.tmp_dir)
+        report = config.generate()
+        header = report.headers[self.header]
+        self.assertEqual(set(['ir_cache', 'parse', 'walk', 'transform',
+                              'translate', 'render', 'write']),
+                         set(header.phases))
+        counters = header.counters
+        self.assertEqual(1, counters['ir_cache_misses'])
+        self.assertEqual(os.path.getsize(
+            self.path('_a.pxd')), counters['bytes'])
+        for name in ['cursors', 'c_ast_nodes', 'cw_ast_nodes']:
+            self.assertTrue(counters[name] > 0)
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(counters, data['totals']['counters'])
+
+        report = config.generate()
+        self.assertEqual(1, report.headers[self.header].counters[
+            'ir_cache_hits'])
+
+    def test_off(self):
+        self.assertIsNone(stats.active())
+        config = Config('clang', [File(self.header)], self.tmp_dir)
+        self.assertIsNone(config.generate())
+        with stats.collect() as report:
+            list(config.generate_asts())
+        self.assertIsNone(stats.active())
+        self.assertIn('walk', report.headers[self.header].phases)
+
+
+class TestCallAccounting(unittest.TestCase):
+
+    def test_calls(self):
+        filename = os.path.join(curdir, 'data', 'enum.h')
+        config = Config('clang', [File(filename)], ffi_stats=True)
+        with stats.collect() as report:
+            list(config.generate_asts())
+        phases = dict((name, phase) for phase, name in report.calls)
+        self.assertEqual('walk', phases['clang_visitChildren'])
+        self.assertIn('clang_parseTranslationUnit', phases)
+        self.assertIn('calls', report.to_dict())
+
+        lib = cindex.conf.lib
+        self.assertIs(lib._registered_functions['clang_hashCursor'],
+                      lib.clang_hashCursor)
+
+
+class TestIncludeProfile(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('big.h', ''.join('int big%d(int a);\n' % i
+                                    for i in range(50)))
+        self.write('small.h', 'int small(void);\n')
+        self.write('a.h', '#include "big.h"\n#include "small.h"\n'
+                          'int a(void);\n')
+        self.write('b.h', '#include "big.h"\nint b(void);\n')
+
+    def test_profile(self):
+        files = [File(self.path('a.h')), File(self.path('b.h'))]
+        profile = profile_includes(Config('clang', files))
+        big = profile.files[self.path('big.h')]
+        self.assertEqual((2, 2), (big.headers, big.direct))
+        self.assertEqual(100, big.declarations)
+        self.assertEqual(set(['"big.h"']), big.spellings)
+        self.assertEqual(1, profile.files[self.path('small.h')].headers)
+        self.assertEqual(big, profile.top(1, 'cursors')[0])
+        self.assertTrue(all(cost.parse_time >= 0
+                            for cost in profile.files.values()))
+
+        recommendations = profile.recommend()
+        self.assertEqual([], recommendations['pch'])
+        self.assertEqual([self.path('big.h')], recommendations['exclude'])
+        self.assertEqual(['!' + self.path('big.h')],
+                         recommendations['header_scope'])
+        self.assertIn('!' + self.path('big.h'), profile.format())
+
+        # The recommended scope leaves out big.h but keeps the rest
+        config = Config('clang', [File(self.path('a.h'))],
+                        header_scope=recommendations['header_scope'])
+        container, = frontends.get_frontend('clang').generate_asts(config)
+        code = renderer.ASTRenderer().render(container.module)
+        self.assertIn('int a()', code)
+        self.assertIn('int small()', code)
+        self.assertNotIn('int big0(', code)
+
+
+class TestTimeline(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.headers = [os.path.join(curdir, 'data', name)
+                        for name in ['enum.h', 'function.h']]
+
+    def load(self, path):
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        spans = [event for event in events if event['ph'] == 'X']
+        names = set(event['name'] for event in events if event['ph'] == 'M')
+        return spans, names
+
+    def test_generate(self):
+        path = self.path('timeline.json')
+        config = Config('clang', [File(header) for header in self.headers],
+                        self.tmp_dir, timeline=path)
+        self.assertIsNone(config.generate())
+        spans, names = self.load(path)
+        self.assertEqual(set(['thread_name', 'process_name']), names)
+        phases = set((event['name'], event['args']['header'])
+                     for event in spans if 'args' in event)
+        for header in self.headers:
+            for name in ['parse', 'walk', 'transform', 'translate',
+                         'render', 'write']:
+                self.assertIn((name, header), phases)
+        self.assertEqual(1, len([event for event in spans
+                                 if event['name'] == 'generate']))
+
+    def test_workers(self):
+        path = self.path('timeline.json')
+        config = Config('clang', [File(header) for header in self.headers],
+                        self.tmp_dir, jobs=2, timeline=path)
+        config.generate()
+        spans, names = self.load(path)
+        walks = [event for event in spans if event['name'] == 'walk']
+        self.assertEqual(2, len(walks))
+        self.assertNotIn(os.getpid(), [event['pid'] for event in walks])
+
+
 if __name__ == '__main__':
     unittest.main()
 